@@ -1,44 +1,91 @@
 from langgraph.graph import StateGraph, END, START
-from langchain_core.rate_limiters import InMemoryRateLimiter
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from langgraph.prebuilt import ToolNode
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from tools import get_rendered_html, download_file, post_request, run_code, add_dependencies
+from tools import get_rendered_html, download_file, post_request, run_code, get_run_output, add_dependencies
 from typing import TypedDict, Annotated, List
 from langchain.chat_models import init_chat_model
-from langgraph.graph.message import add_messages
+from history import CHARS_PER_TOKEN, advance_segment, append_messages, compact_messages, estimate_tokens, next_quiz_url
+from langchain_core.messages import HumanMessage, ToolMessage, messages_from_dict, messages_to_dict
+from prefetch import prefetch_message, prefetch_quiz
+from llm_cache import get_llm_cache
+from llm_retry import call_with_retry, quiz_deadline
+from rate_limiter import async_http_client, get_limiter
+from tracing import TIER_CATEGORIES, format_breakdown, quiz_breakdown, span, trace_context, trace_tools
+from contextlib import asynccontextmanager
+import asyncio
+import logging
 import os
+import time
+import uuid
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 EMAIL = os.getenv("MY_EMAIL")
 SECRET = os.getenv("MY_SECRET")
 RECURSION_LIMIT = 5000
+CHECKPOINT_DB = os.getenv("CHECKPOINT_DB", os.path.join("LLMFiles", "checkpoints.sqlite3"))
 
 # -------------------------------------------------
 # STATE
 # -------------------------------------------------
 class AgentState(TypedDict):
-    messages: Annotated[List, add_messages]
+    messages: Annotated[List, append_messages]
+    # Index of the first message of the quiz being solved and one summary
+    # line per earlier submission, so compaction only scans the current quiz
+    segment_start: int
+    summary_lines: List[str]
+    # time.time() when the current quiz started, for its answer deadline
+    quiz_started: float
+    # URL of the quiz being solved, set by prefetch; tags the trace spans
+    quiz_url: str
+
 
+# Every tool call runs in a span, see tracing.py
+TOOLS = trace_tools([run_code, get_run_output, get_rendered_html, download_file, post_request, add_dependencies])
 
-TOOLS = [run_code, get_rendered_html, download_file, post_request, add_dependencies]
+
+def trace_attributes(state: AgentState, start: int = None) -> dict:
+    """Quiz URL and submission attempt for the spans of the current step"""
+    if start is None:
+        start = state.get("segment_start", 0)
+    submissions = sum(
+        1 for m in state["messages"][start:]
+        if isinstance(m, ToolMessage) and m.name == "post_request"
+    )
+    return {"quiz_url": state.get("quiz_url"), "attempt": submissions + 1}
 
 
 # -------------------------------------------------
 # GROQ LLM (Llama 4 Maverick)
 # -------------------------------------------------
-rate_limiter = InMemoryRateLimiter(
-    requests_per_second=30/60,  # Groq: 30 requests per minute
-    check_every_n_seconds=1,
-    max_bucket_size=30
-)
-llm = init_chat_model(
-   model_provider="groq",
-   model="meta-llama/llama-4-maverick-17b-128e-instruct",
-   temperature=1,
-   rate_limiter=rate_limiter
-).bind_tools(TOOLS)
+# Requests are paced by the shared limiter in rate_limiter.py (RPM + TPM,
+# shared with the solver and across workers); its HTTP client feeds Groq's
+# x-ratelimit-* headers back into it
+MODEL = "meta-llama/llama-4-maverick-17b-128e-instruct"
+# Smaller, faster model used when a quiz is close to its deadline
+FALLBACK_MODEL = os.getenv("AGENT_FALLBACK_MODEL", "llama-3.1-8b-instant")
+TEMPERATURE = 1
+# Completion tokens reserved per call before the real count is known
+EXPECTED_OUTPUT_TOKENS = 1024
+
+
+def build_llm(model: str):
+    # Retries are handled by llm_retry, which knows the quiz deadline
+    return init_chat_model(
+       model_provider="groq",
+       model=model,
+       temperature=TEMPERATURE,
+       max_retries=0,
+       http_async_client=async_http_client()
+    ).bind_tools(TOOLS, parallel_tool_calls=True)
+
+
+llm = build_llm(MODEL)
+fallback_llm = build_llm(FALLBACK_MODEL)
 
 
 # -------------------------------------------------
@@ -81,6 +128,17 @@ AUTHENTICATION:
   include the required email and secret credentials in the payload.
 - You do not need to manually add these fields - they are injected automatically.
 
+PREFETCHED PAGES:
+- Before your first turn on each quiz you may get a "Prefetched quiz page" message with the
+  decoded question, the submit_url and the data_links found on the page.
+- Trust it and start solving right away; only render the page yourself if the summary
+  looks incomplete or the task needs something it does not show.
+
+JS-RENDERED DATA:
+- When a page builds its content from scripts or fetch/XHR calls, call get_rendered_html with
+  capture_data=true. The data responses and scripts it loaded are saved in LLMFiles and listed
+  under "Captured responses"; read those files instead of downloading the same URLs again.
+
 YOUR JOB:
 - Follow pages exactly.
 - Extract data reliably.
@@ -96,14 +154,114 @@ prompt = ChatPromptTemplate.from_messages([
 ])
 
 llm_with_prompt = prompt | llm
+MODELS = {MODEL: llm_with_prompt, FALLBACK_MODEL: prompt | fallback_llm}
 
 
 # -------------------------------------------------
 # AGENT NODE
 # -------------------------------------------------
-def agent_node(state: AgentState):
-    result = llm_with_prompt.invoke({"messages": state["messages"]})
-    return {"messages": state["messages"] + [result]}
+async def agent_node(state: AgentState):
+    # Send a bounded view of the history: finished quizzes are summarized
+    # and large tool outputs cut down, the state itself keeps everything
+    start, lines = advance_segment(
+        state["messages"], state.get("segment_start", 0), state.get("summary_lines", [])
+    )
+    messages = compact_messages(state["messages"], start=start, summary_lines=lines)
+
+    # A new segment means the previous quiz was submitted and its 180 s clock starts
+    quiz_started = state.get("quiz_started")
+    if quiz_started is None or start != state.get("segment_start", 0):
+        quiz_started = time.time()
+
+    limiter = get_limiter()
+    expected = (
+        len(SYSTEM_PROMPT) // CHARS_PER_TOKEN
+        + sum(estimate_tokens(m) for m in messages)
+        + EXPECTED_OUTPUT_TOKENS
+    )
+
+    # The cache is SQLite with a 30 s busy timeout; its reads and writes run in threads
+    cache = await asyncio.to_thread(get_llm_cache, TEMPERATURE)
+
+    async def invoke(model: str):
+        if cache is not None:
+            key = cache.make_key(
+                model,
+                {"temperature": TEMPERATURE, "tools": [t.name for t in TOOLS]},
+                [{"role": "system", "content": SYSTEM_PROMPT}, *messages]
+            )
+            cached = await asyncio.to_thread(cache.get, key)
+            if cached is not None:
+                result = messages_from_dict(cached)[0]
+                # Let the reducer give the replayed message a fresh id
+                result.id = None
+                return result
+
+        charged = await limiter.acquire(model, expected)
+        with span("llm.call", "llm", model=model, expected_tokens=expected) as current:
+            result = await MODELS[model].ainvoke({"messages": messages})
+            usage = getattr(result, "usage_metadata", None) or {}
+            current.set(total_tokens=usage.get("total_tokens") or 0, tool_calls=len(getattr(result, "tool_calls", None) or []))
+        await asyncio.to_thread(limiter.record_usage, model, charged, usage.get("total_tokens"))
+        if cache is not None:
+            await asyncio.to_thread(cache.put, key, model, messages_to_dict([result]))
+        return result
+
+    # 429/5xx are retried with backoff instead of ending the whole chain
+    with trace_context(**trace_attributes(state, start)), span("agent.turn", "turn", messages=len(messages)):
+        result = await call_with_retry(invoke, MODEL, FALLBACK_MODEL, quiz_deadline(quiz_started), what="Agent LLM call")
+
+    # Return only the new message; the reducer appends it to the history
+    return {"messages": [result], "segment_start": start, "summary_lines": lines, "quiz_started": quiz_started}
+
+
+# -------------------------------------------------
+# PREFETCH NODE
+# -------------------------------------------------
+def quiz_url_to_prefetch(messages: list):
+    """The quiz URL the agent is about to start on, if the last step handed one out"""
+    if len(messages) == 1 and isinstance(messages[0], HumanMessage):
+        return messages[0].content.strip()
+    # Results of the latest tool turn, which may hold a post_request with the next URL
+    for message in reversed(messages):
+        if not isinstance(message, ToolMessage):
+            break
+        url = next_quiz_url(message)
+        if url:
+            return url
+    return None
+
+
+async def prefetch_node(state: AgentState):
+    # Decode the new quiz page without the LLM, so the agent's first turn
+    # on it can go straight to solving
+    url = quiz_url_to_prefetch(state["messages"])
+    if not url:
+        return {}
+    # The quiz clock starts now, agent_node sets quiz_started on its next turn
+    with trace_context(quiz_url=url, attempt=1), span("prefetch", "other") as current:
+        summary = await prefetch_quiz(url, deadline=quiz_deadline(time.time()))
+        current.set(decoded=summary is not None)
+        # File the time under what the fetch actually did, not under "render"
+        if summary is not None:
+            current.set(tier=summary["fetched_via"], category=TIER_CATEGORIES[summary["fetched_via"]])
+    if summary is None:
+        return {"quiz_url": url}
+    return {"messages": [prefetch_message(url, summary)], "quiz_url": url}
+
+
+# -------------------------------------------------
+# TOOLS NODE
+# -------------------------------------------------
+# All tools are coroutines, so when the graph runs via ainvoke the ToolNode
+# executes every tool call from a single LLM turn concurrently.
+tool_node = ToolNode(TOOLS)
+
+
+async def tools_node(state: AgentState, config):
+    # The tool spans inherit the quiz URL and attempt of this turn
+    with trace_context(**trace_attributes(state)):
+        return await tool_node.ainvoke(state, config)
 
 
 # -------------------------------------------------
@@ -135,11 +293,14 @@ def route(state):
 
 graph = StateGraph(AgentState)
 
+graph.add_node("prefetch", prefetch_node)
 graph.add_node("agent", agent_node)
-graph.add_node("tools", ToolNode(TOOLS))
+graph.add_node("tools", tools_node)
 
-graph.add_edge(START, "agent")
-graph.add_edge("tools", "agent")
+# Tool results pass through prefetch, which only acts when they hold a new quiz URL
+graph.add_edge(START, "prefetch")
+graph.add_edge("prefetch", "agent")
+graph.add_edge("tools", "prefetch")
 graph.add_conditional_edges(
     "agent",
     route
@@ -148,13 +309,61 @@ graph.add_conditional_edges(
 app = graph.compile()
 
 
+@asynccontextmanager
+async def checkpointing(path: str = CHECKPOINT_DB):
+    """
+    Save the graph state to SQLite after every step while the context is open
+
+    Each quiz chain is a thread keyed by its job ID, so a chain interrupted
+    by a restart can continue from its last completed step. The saver
+    writes the whole message list on every step, so this costs time linear
+    in the chain's length (see bench_history.py).
+    """
+    global app
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    async with AsyncSqliteSaver.from_conn_string(path) as saver:
+        app = graph.compile(checkpointer=saver)
+        try:
+            yield saver
+        finally:
+            app = graph.compile()
+
+
 # -------------------------------------------------
 # RUN AGENT
 # -------------------------------------------------
-def run_agent(url: str) -> str:
-    """Run the agent to solve quiz chain starting from the given URL"""
-    app.invoke(
-        {"messages": [{"role": "user", "content": url}]},
-        config={"recursion_limit": RECURSION_LIMIT},
-    )
+async def run_agent(url: str, job_id: str = None, resume: bool = False) -> str:
+    """
+    Run the agent to solve quiz chain starting from the given URL
+
+    Args:
+        url: First quiz URL
+        job_id: Checkpoint thread ID; a random one is used when omitted
+        resume: Continue the checkpointed thread of ``job_id`` if it has
+            unfinished steps, so only the interrupted step is redone
+    """
+    thread_id = job_id or uuid.uuid4().hex
+    config = {
+        "recursion_limit": RECURSION_LIMIT,
+        "configurable": {"thread_id": thread_id}
+    }
+    inputs = {"messages": [{"role": "user", "content": url}]}
+    if resume and app.checkpointer is not None:
+        snapshot = await app.aget_state(config)
+        if snapshot.next:
+            logger.info(f"Resuming job {job_id} at {', '.join(snapshot.next)}")
+            inputs = None
+        elif snapshot.values:
+            logger.info(f"Job {job_id} had already finished before the restart")
+            return
+
+    with trace_context(job_id=thread_id), span("job", "job", start_url=url, resumed=inputs is None):
+        await app.ainvoke(inputs, config=config)
+    breakdown = format_breakdown(quiz_breakdown(job_id=thread_id))
+    if breakdown:
+        logger.info(f"Latency breakdown of job {thread_id}:\n{breakdown}")
+
+    # The chain is done, its checkpoints are no longer needed
+    if app.checkpointer is not None:
+        await app.checkpointer.adelete_thread(thread_id)
     print("Tasks completed successfully")
@@ -0,0 +1,171 @@
+"""
+Token reduction of the compact extraction on saved pages
+
+Usage: uv run python bench_extract.py [DIR_OR_FILES...]
+Without arguments it measures the pages get_rendered_html has cached
+(CACHE_DIR), or a built-in corpus of quiz-like pages when the cache holds
+none. Token counts use tiktoken when it is installed and a 4 chars/token
+estimate otherwise.
+"""
+
+from cache import CACHE_DIR
+from extractor import compact_html
+import base64
+import glob
+import os
+import sqlite3
+import sys
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except ImportError:
+    _encoding = None
+
+
+def count_tokens(text: str) -> int:
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4
+
+
+# -------------------------------------------------
+# PAGES
+# -------------------------------------------------
+def _read(path: str) -> str:
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def collect(paths: list) -> list:
+    """(name, html) for every HTML file in ``paths``; missing paths are skipped"""
+    pages = []
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(glob.glob(os.path.join(path, "**", "*.htm*"), recursive=True))
+        elif os.path.isfile(path):
+            files = [path]
+        else:
+            print(f"Skipping {path}: not found")
+            continue
+        pages += [(os.path.basename(f), _read(f)) for f in files]
+    return pages
+
+
+def cached_pages(root: str = CACHE_DIR) -> list:
+    """(url, html) of the rendered pages in the content cache"""
+    index = os.path.join(root, "index.sqlite3")
+    if not os.path.exists(index):
+        return []
+    db = sqlite3.connect(f"file:{index}?mode=ro", uri=True)
+    try:
+        rows = db.execute("SELECT url, digest FROM entries WHERE content_type = 'text/html'").fetchall()
+    finally:
+        db.close()
+    pages = {}
+    for url, digest in rows:
+        blob = os.path.join(root, "blobs", digest[:2], digest)
+        if os.path.exists(blob):
+            # Raw and compact renders of one URL hold the same page
+            pages.setdefault(url, _read(blob))
+    return sorted(pages.items())
+
+
+_STYLE = "<style>" + "".join(
+    f".c{i} {{ margin: {i % 7}px; padding: {i % 5}px {i % 3}px; color: #{i * 4099 % 0xFFFFFF:06x}; }}\n" for i in range(300)
+) + "</style>"
+_BUNDLE = "<script>" + "".join(
+    f"function m{i}(e,t){{var n=e[{i}]||{{}};return t.push(n),n.k{i}=t.length,n}}\n" for i in range(400)
+) + "</script>"
+_NAV = "<nav><ul>" + "".join(f'<li class="nav-item"><a href="/docs/{i}">Section {i}</a></li>' for i in range(8)) + "</ul></nav>"
+_ICON = '<svg viewBox="0 0 24 24" width="16" height="16"><path d="M12 2L2 7l10 5 10-5-10-5zm0 13l-10-5v6l10 5 10-5v-6z"/></svg>'
+
+
+def _page(title: str, body: str, head: str = "") -> str:
+    return (
+        f'<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><title>{title}</title>'
+        f'<meta name="viewport" content="width=device-width, initial-scale=1">{head}</head>'
+        f'<body><header>{_NAV}</header><main class="container">{body}</main>'
+        f'<footer>{_ICON}<p>&copy; Quiz platform</p></footer></body></html>'
+    )
+
+
+def fixture_pages() -> list:
+    """Quiz-like pages: atob payloads, script-only data, a data table, docs with code, an SPA shell"""
+    quiz = base64.b64encode(
+        b"<p>Q834. Download <a href='https://quiz.example.com/data.csv'>file</a>. "
+        b"What is the sum of the value column?</p><pre>{\"email\": \"you@example.com\", \"answer\": 0}</pre>"
+    ).decode()
+    rows = "".join(
+        f'<tr class="row-{i % 2}"><td class="id" style="text-align:right">{i}</td>'
+        f'<td class="city">City {i}</td><td class="value" style="font-weight:bold">{i * 37 % 1000}</td></tr>'
+        for i in range(60)
+    )
+    return [
+        ("atob-quiz (rendered)", _page(
+            "Quiz 834",
+            f'<div id="result">{base64.b64decode(quiz).decode()}</div>'
+            f'<script>document.querySelector("#result").innerHTML = atob(`{quiz}`);</script>',
+            _STYLE
+        )),
+        ("script-only scrape", _page(
+            "Scrape",
+            '<div id="question"></div><script src="/demo-scrape.js"></script>'
+            '<p>Get the secret code from <a href="/demo-scrape-data?email=you@example.com">this page</a>.</p>',
+            _STYLE + _BUNDLE
+        )),
+        ("data table", _page(
+            "Cities",
+            f'<h1>Population sample</h1><table class="table table-striped"><thead><tr><th>id</th><th>city</th>'
+            f'<th>value</th></tr></thead><tbody>{rows}</tbody></table><p>POST the total to /submit.</p>',
+            _STYLE
+        )),
+        ("docs with code", _page(
+            "API docs",
+            "<h1>Submitting answers</h1>" + "".join(
+                f'<section><h2>{_ICON}Step {i}</h2><p>Call <code>/api/v{i}</code> with your token.</p>'
+                f'<pre>curl -X POST https://quiz.example.com/api/v{i} -d \'{{"step": {i}}}\'</pre></section>'
+                for i in range(6)
+            ),
+            _STYLE
+        )),
+        ("spa shell", _page(
+            "App",
+            '<div id="app" data-reactroot=""><div class="spinner"></div><p>Question: what is 12 * 34?</p></div>'
+            + _BUNDLE + '<script src="/static/js/main.4f2a.js"></script>',
+            _STYLE
+        )),
+    ]
+
+
+def main():
+    if sys.argv[1:]:
+        pages, source = collect(sys.argv[1:]), "files"
+    else:
+        pages, source = cached_pages(), f"render cache ({CACHE_DIR})"
+        if not pages:
+            pages, source = fixture_pages(), "built-in fixture corpus"
+    if not pages:
+        print("No saved pages found")
+        return
+
+    print(f"pages: {source}")
+    print(f"{'page':<40} | {'raw tokens':>10} | {'compact':>8} | {'saved':>6}")
+    print("-" * 74)
+    total_raw = total_compact = 0
+    for name, html in pages:
+        raw = count_tokens(html)
+        compact = count_tokens(compact_html(html))
+        total_raw += raw
+        total_compact += compact
+        saved = 100 * (1 - compact / raw) if raw else 0
+        print(f"{name[:40]:<40} | {raw:>10} | {compact:>8} | {saved:>5.1f}%")
+
+    saved = 100 * (1 - total_compact / total_raw) if total_raw else 0
+    print("-" * 74)
+    print(f"{'total':<40} | {total_raw:>10} | {total_compact:>8} | {saved:>5.1f}%")
+    print(f"tokenizer: {'tiktoken cl100k_base' if _encoding else '4 chars/token estimate'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Micro-benchmark for per-turn message handling in the agent graph
+
+Compares the old pattern (node returns the whole history, merged with
+add_messages, then compacted from scratch) against the delta path
+(append_messages plus incremental compaction) as a chain grows to
+thousands of messages, then measures a whole graph step with and without
+the SQLite checkpointer run_agent uses for crash recovery.
+Run with: uv run python bench_history.py
+"""
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import add_messages
+from history import advance_segment, append_messages, compact_messages
+from typing import Annotated, List, TypedDict
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+CHECKPOINTS = [100, 500, 1000, 2000, 4000]
+TURNS_PER_SAMPLE = 50
+
+
+def make_turn(n: int) -> list:
+    """One LLM turn plus its tool result; every 10th turn finishes a quiz"""
+    if n % 10 == 9:
+        call = {"name": "post_request", "args": {"url": "https://example.com/submit", "payload": {"answer": n}}, "id": f"call-{n}"}
+        result = json.dumps({"correct": True, "url": f"https://example.com/quiz-{n}"})
+    else:
+        call = {"name": "run_code", "args": {"code": "print(1)"}, "id": f"call-{n}"}
+        result = "x" * 2000
+    return [
+        AIMessage(content="", tool_calls=[call], id=f"run-{n}"),
+        ToolMessage(content=result, tool_call_id=f"call-{n}", name=call["name"])
+    ]
+
+
+def old_turn(messages: list, n: int) -> list:
+    compact_messages(messages)
+    ai, tool = make_turn(n)
+    messages = add_messages(messages, messages + [ai])
+    return add_messages(messages, [tool])
+
+
+def new_turn(state: dict, n: int) -> dict:
+    start, lines = advance_segment(state["messages"], state["segment_start"], state["summary_lines"])
+    compact_messages(state["messages"], start=start, summary_lines=lines)
+    ai, tool = make_turn(n)
+    messages = append_messages(state["messages"], [ai])
+    messages = append_messages(messages, [tool])
+    return {"messages": messages, "segment_start": start, "summary_lines": lines}
+
+
+def grow(n_messages: int) -> list:
+    messages = [HumanMessage(content="https://example.com/quiz-0", id="start")]
+    turn = 0
+    while len(messages) < n_messages:
+        messages.extend(make_turn(turn))
+        turn += 1
+    return messages
+
+
+def per_turn_ms(step, state, start_turn: int) -> float:
+    began = time.perf_counter()
+    for i in range(TURNS_PER_SAMPLE):
+        state = step(state, start_turn + i)
+    return (time.perf_counter() - began) * 1000 / TURNS_PER_SAMPLE
+
+
+class BenchState(TypedDict):
+    messages: Annotated[List, append_messages]
+
+
+def turn_node(state: BenchState):
+    return {"messages": make_turn(len(state["messages"]))}
+
+
+async def graph_run_seconds(history: list, steps: int, checkpointer=None) -> float:
+    """One run that loads ``history`` and then appends ``steps`` turns, like an agent chain"""
+    target = len(history) + 2 * steps
+    graph = StateGraph(BenchState)
+    graph.add_node("turn", turn_node)
+    graph.add_edge(START, "turn")
+    graph.add_conditional_edges("turn", lambda state: END if len(state["messages"]) >= target else "turn")
+    app = graph.compile(checkpointer=checkpointer)
+    config = {"configurable": {"thread_id": f"bench-{len(history)}-{steps}"}, "recursion_limit": steps + 10}
+    began = time.perf_counter()
+    await app.ainvoke({"messages": list(history)}, config)
+    return time.perf_counter() - began
+
+
+async def graph_step_ms(history: list, checkpointer=None) -> float:
+    """Mean cost of one more graph step on top of ``history``; loading the input is subtracted"""
+    one = await graph_run_seconds(history, 1, checkpointer)
+    many = await graph_run_seconds(history, TURNS_PER_SAMPLE + 1, checkpointer)
+    return (many - one) * 1000 / TURNS_PER_SAMPLE
+
+
+async def checkpoint_table():
+    path = os.path.join(tempfile.mkdtemp(), "bench.sqlite3")
+    print(f"\n{'messages':>9} | {'graph ms/step':>14} | {'+ sqlite ms/step':>17}")
+    print("-" * 46)
+    async with AsyncSqliteSaver.from_conn_string(path) as saver:
+        for size in CHECKPOINTS:
+            history = grow(size)
+            plain = await graph_step_ms(history)
+            saved = await graph_step_ms(history, saver)
+            print(f"{size:>9} | {plain:>14.3f} | {saved:>17.3f}")
+
+
+def main():
+    print(f"{'messages':>9} | {'old ms/turn':>12} | {'new ms/turn':>12}")
+    print("-" * 40)
+    for size in CHECKPOINTS:
+        history = grow(size)
+        turn = len(history) // 2
+        old = per_turn_ms(old_turn, list(history), turn)
+        start, lines = advance_segment(history, 0, [])
+        state = {"messages": list(history), "segment_start": start, "summary_lines": lines}
+        new = per_turn_ms(new_turn, state, turn)
+        print(f"{size:>9} | {old:>12.3f} | {new:>12.3f}")
+    asyncio.run(checkpoint_table())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Browser render latency of the wait strategies on a local fixture site
+
+Usage: uv run python bench_render.py [REPEATS]
+Serves a few quiz-like pages from 127.0.0.1 (static, atob payload, data
+loaded by fetch, a page with a never-ending long poll next to its content,
+and one with slow images, fonts and stylesheets) and renders each with the
+old wait (networkidle plus a fixed 2 s sleep) and with every strategy of
+browser.load_page, and once more with "quiet" but no resource blocking.
+Reports the median render time, whether the expected text made it into
+the HTML, and the bytes served to the browser.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import asyncio
+import base64
+import statistics
+import sys
+import threading
+import time
+
+from browser import WAIT_STRATEGIES, load_page
+from browser_pool import get_pool, shutdown_pool
+from resource_policy import ALLOW_ALL
+
+QUIZ = base64.b64encode(b"<p>Q834. Download <a href='/data.csv'>file</a>. What is the sum?</p>").decode()
+
+PAGES = {
+    "/static": "<html><body><h1>Q1</h1><p>What is the answer to everything?</p></body></html>",
+    "/atob": f'<html><body><div id="result"></div><script>document.querySelector("#result").innerHTML = atob(`{QUIZ}`);</script></body></html>',
+    "/xhr": """<html><body><div id="result">Loading...</div><script>
+        fetch("/api/secret").then(r => r.text()).then(t => { document.querySelector("#result").textContent = t; });
+    </script></body></html>""",
+    "/long-poll": """<html><body><p>Scrape the secret code below.</p><div id="code"></div><script>
+        document.querySelector("#code").textContent = "secret 4242";
+        fetch("/poll");
+    </script></body></html>""",
+    "/heavy": "<html><head>"
+              + "".join(f'<link rel="stylesheet" href="/asset/{i}.css">' for i in range(3))
+              + "<style>@font-face { font-family: q; src: url(/asset/q.woff2); } body { font-family: q; }</style>"
+              + "</head><body><p>Count the rows in the table: 12.</p>"
+              + "".join(f'<img src="/asset/{i}.png">' for i in range(12))
+              + "</body></html>",
+}
+EXPECTED = {
+    "/static": "answer to everything", "/atob": "Q834", "/xhr": "secret 9001",
+    "/long-poll": "secret 4242", "/heavy": "Count the rows"
+}
+ASSET_BYTES = 200_000
+served = {"bytes": 0}
+
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == "/api/secret":
+            time.sleep(0.4)
+            body = b"secret 9001"
+        elif self.path.startswith("/asset/"):
+            # Images, fonts and stylesheets from a slow CDN
+            time.sleep(0.3)
+            body = b"\0" * ASSET_BYTES
+        elif self.path == "/poll":
+            # Analytics / long polling: answers long after the page is usable
+            time.sleep(40)
+            body = b"{}"
+        else:
+            body = PAGES.get(self.path, "").encode()
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            served["bytes"] += len(body)
+        except OSError:
+            pass
+
+
+async def legacy(page, url):
+    """The old wait: networkidle, then always 2 more seconds"""
+    await page.goto(url, wait_until="networkidle", timeout=30000)
+    await page.wait_for_timeout(2000)
+    return "networkidle+2s"
+
+
+def strategy(name, policy=None):
+    async def wait(page, url):
+        return (await load_page(page, url, strategy=name, policy=policy))["wait"]
+    return wait
+
+
+async def render(url, wait) -> tuple:
+    async def run(page):
+        started = time.perf_counter()
+        try:
+            outcome = await wait(page, url)
+        except Exception as e:
+            outcome = f"error: {type(e).__name__}"
+        return time.perf_counter() - started, outcome, await page.content()
+    return await get_pool().run(run)
+
+
+async def main(repeats: int):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    waits = {
+        "networkidle+2s": legacy,
+        **{name: strategy(name) for name in WAIT_STRATEGIES},
+        "quiet/no-block": strategy("quiet", ALLOW_ALL)
+    }
+    # Warm the browser so the first row does not pay for the launch
+    await render(base + "/static", strategy("load"))
+
+    print(f"{'page':<11} {'wait':<15} {'median s':>9} {'ok':>4} {'KB served':>10}  outcome")
+    for path in PAGES:
+        for label, wait in waits.items():
+            served["bytes"] = 0
+            runs = [await render(base + path, wait) for _ in range(repeats)]
+            median = statistics.median(seconds for seconds, _, _ in runs)
+            ok = sum(EXPECTED[path] in html for _, _, html in runs)
+            kb = served["bytes"] / repeats / 1024
+            print(f"{path:<11} {label:<15} {median:>9.2f} {ok:>2}/{repeats} {kb:>10.0f}  {runs[-1][1]}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 3))
+    finally:
+        shutdown_pool()
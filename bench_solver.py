@@ -0,0 +1,63 @@
+"""
+Single-shot vs multi-candidate solving against the live Groq API
+
+Usage: uv run python bench_solver.py [K ...]
+Runs a few self-contained questions with known answers once per K
+(default: 1 and SOLVER_CANDIDATES) and reports wall time, tokens per
+question and hit rate. A miss is retried with the runner-up answer, then
+with a feedback round, the way the quiz loop would. A solve that fails
+outright is counted as a miss and reported under "failed".
+"""
+
+from solver import CANDIDATES, SolverStats, answer_key, solve_with_candidates
+import asyncio
+import sys
+
+QUESTIONS = [
+    ("What is the sum of all primes below 1000? Print only the number.", 76127),
+    ("How many Sundays fell on the first of the month during 1901-2000? Print only the number.", 171),
+    ("What is the 25th Fibonacci number, with F(1) = F(2) = 1? Print only the number.", 75025),
+    ("How many distinct letters are in the word 'abracadabra'? Print only the number.", 5),
+    ("What is the median of [3, 9, 1, 7, 4, 10]? Print only the number.", 5.5),
+]
+
+
+async def run(k: int) -> dict:
+    stats = SolverStats()
+    for question, expected in QUESTIONS:
+        details = {"raw_html": "", "decoded_html": ""}
+        try:
+            result = await solve_with_candidates(question, details, k=k, stats=stats)
+        except Exception as e:
+            print(f"  k={k} failed: {e}")
+            stats.record_failure()
+            continue
+        tries = [result["answer"]] + result["alternatives"]
+        for answer in tries:
+            correct = answer_key(answer) == answer_key(expected)
+            stats.record_submission(correct)
+            if correct:
+                break
+        else:
+            feedback = f"The answer {tries[-1]!r} is wrong."
+            try:
+                retry = await solve_with_candidates(question, details, feedback, k=k, stats=stats)
+            except Exception as e:
+                print(f"  k={k} retry failed: {e}")
+                stats.record_failure(retry=True)
+                continue
+            stats.record_submission(answer_key(retry["answer"]) == answer_key(expected))
+    return stats.summary()
+
+
+async def main():
+    ks = [int(arg) for arg in sys.argv[1:]] or sorted({1, CANDIDATES})
+    print(f"{'k':>3} | {'wall s/q':>8} | {'tokens/q':>8} | {'submits/q':>9} | {'hit rate':>8} | {'failed':>6}")
+    print("-" * 59)
+    for k in ks:
+        s = await run(k)
+        print(f"{k:>3} | {s['avg_wall_seconds']:>8} | {s['avg_tokens']:>8} | {s['submissions_per_question']:>9} | {s['hit_rate']:>8.0%} | {s['failures']:>6}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -3,57 +3,196 @@ Browser Automation Module using Playwright
 Handles JavaScript-rendered pages and content extraction
 """
 
-from playwright.async_api import async_playwright
+from browser_pool import get_pool
+from extractor import decode_atob_payloads
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from resource_policy import DEFAULT_POLICY
 import logging
-import base64
+import os
+import time
 
 logger = logging.getLogger(__name__)
 
+# -------------------------------------------------
+# WAIT STRATEGIES
+# -------------------------------------------------
+# "quiet": DOMContentLoaded, then no DOM mutations and no fresh fetch/XHR for RENDER_QUIET_MS
+# "load" / "networkidle": DOMContentLoaded, then Playwright's load state of that name
+WAIT_STRATEGIES = ("quiet", "load", "networkidle")
+RENDER_WAIT_STRATEGY = os.getenv("RENDER_WAIT_STRATEGY", "quiet")
+RENDER_QUIET_MS = int(os.getenv("RENDER_QUIET_MS", "300"))
+# Cap on navigation plus waiting for one render
+RENDER_MAX_WAIT = float(os.getenv("RENDER_MAX_WAIT_SECONDS", "15"))
+# Time left before the quiz deadline that a render must never eat into
+RENDER_DEADLINE_RESERVE = float(os.getenv("RENDER_DEADLINE_RESERVE_SECONDS", "30"))
+MIN_RENDER_WAIT = 2.0
+# Requests older than this (long polling, analytics beacons) no longer hold up "quiet"
+REQUEST_GRACE_MS = 3000
+
+# Installed before navigation: remembers when each pending fetch/XHR started
+TRACK_REQUESTS_JS = """
+(() => {
+    const pending = new Map();
+    let next = 0;
+    window.__renderPending = pending;
+    const track = () => {
+        const id = next++;
+        pending.set(id, performance.now());
+        return () => pending.delete(id);
+    };
+    if (window.fetch) {
+        const fetch = window.fetch;
+        window.fetch = function (...args) {
+            const done = track();
+            return fetch.apply(this, args).finally(done);
+        };
+    }
+    const send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function (...args) {
+        this.addEventListener("loadend", track());
+        return send.apply(this, args);
+    };
+})();
+"""
+
+# Resolves "quiet" once the DOM has not changed for quietMs while no recent
+# request is pending, or "cap" after maxMs
+QUIESCENCE_JS = """
+([quietMs, maxMs, graceMs]) => new Promise(resolve => {
+    const started = performance.now();
+    let last = started;
+    const observer = new MutationObserver(() => { last = performance.now(); });
+    observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+    const check = () => {
+        const now = performance.now();
+        const pending = [...(window.__renderPending || new Map()).values()];
+        const busy = pending.some(t => now - t < graceMs);
+        if (!busy && now - last >= quietMs) {
+            observer.disconnect();
+            resolve("quiet");
+        } else if (now - started >= maxMs) {
+            observer.disconnect();
+            resolve("cap");
+        } else {
+            setTimeout(check, 50);
+        }
+    };
+    setTimeout(check, 50);
+})
+"""
 
-async def get_page_content(url: str, timeout: int = 30000) -> str:
+
+def wait_budget(deadline: float = None, max_wait: float = RENDER_MAX_WAIT) -> float:
     """
-    Fetch and render page content using headless browser
+    Seconds one render may spend navigating and waiting
 
     Args:
-        url: The URL to visit
-        timeout: Timeout in milliseconds (default 30s)
+        deadline: time.time() by which the quiz must be answered (optional)
+        max_wait: Cap when the deadline is far away
 
     Returns:
-        Rendered HTML content as string
+        ``max_wait``, shortened so RENDER_DEADLINE_RESERVE seconds stay
+        before the deadline, but never below MIN_RENDER_WAIT
     """
-    logger.info(f"Fetching page content from: {url}")
+    budget = max_wait
+    if deadline is not None:
+        budget = min(budget, deadline - time.time() - RENDER_DEADLINE_RESERVE)
+    return max(MIN_RENDER_WAIT, budget)
 
-    async with async_playwright() as p:
-        try:
-            # Launch headless browser
-            browser = await p.chromium.launch(headless=True)
-            context = await browser.new_context(
-                # Set user agent to avoid bot detection
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-            )
-            page = await context.new_page()
 
-            # Navigate to URL
-            await page.goto(url, timeout=timeout, wait_until="networkidle")
+async def load_page(page, url: str, strategy: str = None, wait_for: str = None, deadline: float = None, max_wait: float = RENDER_MAX_WAIT, policy=None) -> dict:
+    """
+    Navigate ``page`` to ``url`` and wait until it has rendered
 
-            # Wait a bit for any dynamic content to load
-            await page.wait_for_timeout(2000)
+    Navigation only waits for DOMContentLoaded. After that the page is
+    ready when ``wait_for`` matches, or else when ``strategy`` says so.
+    Waiting stops at the budget from wait_budget and the page is read as
+    it is; only a failed navigation raises.
 
-            # Get the rendered HTML
-            content = await page.content()
+    Args:
+        page: Playwright page
+        url: Page URL
+        strategy: One of WAIT_STRATEGIES (default RENDER_WAIT_STRATEGY)
+        wait_for: Playwright selector the page must contain, e.g. ``"#result"``
+            or ``"text=Submit your answer"``
+        deadline: Quiz deadline that caps the total wait
+        max_wait: Cap in seconds when the deadline is far away
+        policy: resource_policy.ResourcePolicy deciding which requests are
+            aborted (default DEFAULT_POLICY)
 
-            # Also get the text content of the body for easier parsing
-            text_content = await page.evaluate("() => document.body.innerText")
+    Returns:
+        Dict with ``wait`` (how waiting ended: "selector", the strategy
+        name, or "cap" when the budget ran out first) and the request and
+        byte counts of BlockStats.as_dict
+    """
+    strategy = strategy or RENDER_WAIT_STRATEGY
+    if strategy not in WAIT_STRATEGIES:
+        raise ValueError(f"Unknown wait strategy {strategy!r}, expected one of {WAIT_STRATEGIES}")
+
+    ends = time.monotonic() + wait_budget(deadline, max_wait)
+
+    def left_ms() -> float:
+        return max(1.0, (ends - time.monotonic()) * 1000)
+
+    stats = await (policy or DEFAULT_POLICY).install(page)
+    if strategy == "quiet" and not wait_for:
+        await page.add_init_script(TRACK_REQUESTS_JS)
+    await page.goto(url, wait_until="domcontentloaded", timeout=left_ms())
+
+    try:
+        if wait_for:
+            await page.wait_for_selector(wait_for, state="attached", timeout=left_ms())
+            waited = "selector"
+        elif strategy == "quiet":
+            waited = await page.evaluate(QUIESCENCE_JS, [RENDER_QUIET_MS, left_ms(), REQUEST_GRACE_MS])
+        else:
+            await page.wait_for_load_state(strategy, timeout=left_ms())
+            waited = strategy
+    except PlaywrightTimeoutError:
+        logger.info(f"Render wait for {url} hit its cap ({wait_for or strategy}), reading the page as is")
+        waited = "cap"
+    return {"wait": waited, **stats.as_dict()}
+
+
+async def get_page_content(url: str, timeout: int = 30000, strategy: str = None, wait_for: str = None, deadline: float = None, policy=None) -> str:
+    """
+    Fetch and render page content using a pooled headless browser
 
-            await browser.close()
+    Args:
+        url: The URL to visit
+        timeout: Cap on the whole render in milliseconds (default 30s)
+        strategy: Wait strategy, see load_page
+        wait_for: Selector or ``text=...`` predicate to wait for, see load_page
+        deadline: Quiz deadline that shortens the cap
+        policy: Resource blocking policy, see load_page
+
+    Returns:
+        Rendered HTML content as string
+    """
+    logger.info(f"Fetching page content from: {url}")
+
+    async def load(page):
+        # Navigate and wait only as long as the page keeps changing
+        # Images, fonts, stylesheets and trackers are never downloaded
+        await load_page(page, url, strategy, wait_for, deadline, max_wait=timeout / 1000, policy=policy)
+
+        # Get the rendered HTML
+        return await page.content()
 
-            logger.info(f"Successfully fetched {len(content)} bytes from {url}")
+    try:
+        content = await get_pool().run(
+            load,
+            # Set user agent to avoid bot detection
+            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+        )
 
-            return content
+        logger.info(f"Successfully fetched {len(content)} bytes from {url}")
 
-        except Exception as e:
-            logger.error(f"Error fetching page content: {e}")
-            raise
+        return content
+
+    except Exception as e:
+        logger.error(f"Error fetching page content: {e}")
+        raise
 
 
 async def extract_quiz_details(html_content: str) -> dict:
@@ -76,26 +215,10 @@ async def extract_quiz_details(html_content: str) -> dict:
     # Example: document.querySelector("#result").innerHTML = atob(`...`);
 
     # Try to find base64-encoded content
-    scripts = soup.find_all('script')
-    decoded_content = None
-
-    for script in scripts:
-        if script.string and 'atob' in script.string:
-            # Extract the base64 string
-            try:
-                # Find content between backticks after atob(
-                script_text = script.string
-                start = script_text.find('atob(`') + 6
-                end = script_text.find('`)', start)
-                b64_string = script_text[start:end].strip()
-
-                # Decode base64
-                decoded_bytes = base64.b64decode(b64_string)
-                decoded_content = decoded_bytes.decode('utf-8')
-                logger.info("Successfully decoded base64 quiz content")
-                break
-            except Exception as e:
-                logger.warning(f"Failed to decode base64: {e}")
+    payloads = decode_atob_payloads(soup)
+    decoded_content = payloads[0] if payloads else None
+    if decoded_content:
+        logger.info("Successfully decoded base64 quiz content")
 
     # If we found decoded content, parse it
     if decoded_content:
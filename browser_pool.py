@@ -0,0 +1,250 @@
+"""
+Shared Chromium Pool
+Keeps a few long-lived headless browsers alive and hands out a fresh,
+isolated browser context for every page load
+"""
+
+from playwright.async_api import async_playwright
+import asyncio
+import atexit
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+MAX_PAGES_PER_BROWSER = int(os.getenv("BROWSER_MAX_PAGES", "4"))
+RECYCLE_AFTER_PAGES = int(os.getenv("BROWSER_RECYCLE_AFTER_PAGES", "100"))
+RECYCLE_RSS_MB = int(os.getenv("BROWSER_RECYCLE_RSS_MB", "1024"))
+
+
+def _process_rss_bytes(pid: int) -> int:
+    """Resident memory of a process in bytes (Linux only, 0 elsewhere)"""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0
+
+
+class _Slot:
+    """One long-lived Chromium instance and its bookkeeping"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.browser = None
+        self.active = 0
+        self.served = 0
+        self.retiring = False
+
+
+class BrowserPool:
+    """
+    Process-wide pool of headless Chromium browsers
+
+    All Playwright objects live on a dedicated event loop thread, so the pool
+    can be used both from async code (``await pool.run(fn)``) and from
+    synchronous tools (``pool.run_sync(fn)``). Every call gets a brand new
+    browser context, which keeps cookies and storage isolated per request.
+
+    Browsers are recycled once they have served ``recycle_after`` pages or
+    their process tree grows past ``recycle_rss_mb`` megabytes.
+    """
+
+    def __init__(
+        self,
+        size: int = POOL_SIZE,
+        max_pages: int = MAX_PAGES_PER_BROWSER,
+        recycle_after: int = RECYCLE_AFTER_PAGES,
+        recycle_rss_mb: int = RECYCLE_RSS_MB
+    ):
+        self.size = max(1, size)
+        self.max_pages = max(1, max_pages)
+        self.recycle_after = recycle_after
+        self.recycle_rss_mb = recycle_rss_mb
+
+        self._slots = [_Slot(i) for i in range(self.size)]
+        self._cond = asyncio.Condition()
+        self._launch_lock = asyncio.Lock()
+        self._playwright = None
+
+        self._loop = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+
+    # -------------------------------------------------
+    # PUBLIC API
+    # -------------------------------------------------
+    async def run(self, fn, **context_options):
+        """
+        Run ``await fn(page)`` on a pooled browser from any event loop
+
+        Args:
+            fn: Coroutine function receiving a fresh Playwright page
+            **context_options: Passed to ``browser.new_context`` (user_agent, ...)
+
+        Returns:
+            Whatever ``fn`` returns
+        """
+        future = self._submit(lambda: self._run(fn, context_options))
+        return await asyncio.wrap_future(future)
+
+    def run_sync(self, fn, **context_options):
+        """Blocking variant of :meth:`run` for synchronous callers"""
+        return self._submit(lambda: self._run(fn, context_options)).result()
+
+    def shutdown(self, timeout: float = 10):
+        """Close every browser, stop Playwright and the pool thread"""
+        with self._start_lock:
+            self._closed = True
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+
+        if loop is None:
+            return
+
+        future = asyncio.run_coroutine_threadsafe(self._close_all(), loop)
+        try:
+            future.result(timeout)
+        except Exception as e:
+            logger.warning(f"Error while closing browser pool: {e}")
+
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        loop.close()
+        logger.info("Browser pool shut down")
+
+    # -------------------------------------------------
+    # POOL LOOP
+    # -------------------------------------------------
+    def _submit(self, make_coro):
+        with self._start_lock:
+            if self._closed:
+                raise RuntimeError("Browser pool has been shut down")
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="browser-pool", daemon=True)
+                thread.start()
+                self._loop, self._thread = loop, thread
+            loop = self._loop
+        return asyncio.run_coroutine_threadsafe(make_coro(), loop)
+
+    async def _run(self, fn, context_options: dict):
+        slot = await self._checkout()
+        context = None
+        try:
+            await self._ensure_browser(slot)
+            context = await slot.browser.new_context(**context_options)
+            page = await context.new_page()
+            return await fn(page)
+        finally:
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception as e:
+                    logger.warning(f"Error closing browser context: {e}")
+            await self._checkin(slot)
+
+    def _pick(self):
+        candidates = [s for s in self._slots if not s.retiring and s.active < self.max_pages]
+        if not candidates:
+            return None
+        # Prefer browsers that are already running, then the least busy one
+        return min(candidates, key=lambda s: (s.browser is None, s.active))
+
+    async def _checkout(self) -> _Slot:
+        async with self._cond:
+            while True:
+                slot = self._pick()
+                if slot is not None:
+                    slot.active += 1
+                    return slot
+                await self._cond.wait()
+
+    async def _checkin(self, slot: _Slot):
+        recycle = slot.served + 1 >= self.recycle_after
+        if not recycle and slot.browser is not None:
+            recycle = await self._browser_rss_mb(slot.browser) >= self.recycle_rss_mb
+
+        async with self._cond:
+            slot.active -= 1
+            slot.served += 1
+            if recycle and not slot.retiring:
+                logger.info(f"Recycling browser #{slot.index} after {slot.served} pages")
+                slot.retiring = True
+            close_now = slot.retiring and slot.active == 0
+            self._cond.notify_all()
+
+        if close_now:
+            await self._close_slot(slot)
+
+    async def _ensure_browser(self, slot: _Slot):
+        async with self._launch_lock:
+            if slot.browser is not None and slot.browser.is_connected():
+                return
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            slot.browser = await self._playwright.chromium.launch(headless=True)
+            slot.served = 0
+            logger.info(f"Launched pooled browser #{slot.index}")
+
+    async def _close_slot(self, slot: _Slot):
+        browser, slot.browser = slot.browser, None
+        if browser is not None:
+            try:
+                await browser.close()
+            except Exception as e:
+                logger.warning(f"Error closing browser #{slot.index}: {e}")
+        async with self._cond:
+            slot.retiring = False
+            slot.served = 0
+            self._cond.notify_all()
+
+    async def _close_all(self):
+        for slot in self._slots:
+            await self._close_slot(slot)
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def _browser_rss_mb(self, browser) -> float:
+        """Sum the resident memory of every process belonging to a browser"""
+        try:
+            session = await browser.new_browser_cdp_session()
+            info = await session.send("SystemInfo.getProcessInfo")
+            await session.detach()
+        except Exception:
+            return 0.0
+        total = sum(_process_rss_bytes(p.get("id", 0)) for p in info.get("processInfo", []))
+        return total / (1024 * 1024)
+
+
+# -------------------------------------------------
+# PROCESS-WIDE POOL
+# -------------------------------------------------
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> BrowserPool:
+    """Return the shared browser pool, creating it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+        return _pool
+
+
+def shutdown_pool():
+    """Shut down the shared browser pool if it was ever started"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+atexit.register(shutdown_pool)
@@ -0,0 +1,302 @@
+"""
+Content-Addressed Cache
+On-disk cache for downloaded files and rendered pages under LLMFiles/.cache
+
+Entries are keyed by URL plus the request headers that change the response.
+Bodies are stored once per SHA-256 digest, so the same file fetched from two
+URLs only takes space once. The index is a SQLite database, which keeps it
+safe to share between uvicorn workers.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: plain copies only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join("LLMFiles", ".cache"))
+CACHE_TTL = float(os.getenv("CACHE_TTL_SECONDS", "3600"))
+RENDER_CACHE_TTL = float(os.getenv("RENDER_CACHE_TTL_SECONDS", "300"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_MB", "512")) * 1024 * 1024
+
+# Request headers that can change the response body
+VARY_HEADERS = ("accept", "accept-language", "authorization", "cookie", "range")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    content_type TEXT,
+    ttl REAL NOT NULL,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+)
+"""
+
+
+class ContentCache:
+    """
+    LRU, TTL-bounded, content-addressed file cache
+
+    Every public method is safe to call from several threads; callers on an
+    event loop should wrap the ones that copy bodies in ``asyncio.to_thread``.
+    """
+
+    def __init__(self, root: str = CACHE_DIR, ttl: float = CACHE_TTL, max_bytes: int = CACHE_MAX_BYTES):
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(root, "index.sqlite3"),
+            check_same_thread=False,
+            isolation_level=None,
+            timeout=30
+        )
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(_SCHEMA)
+
+    # -------------------------------------------------
+    # KEYS AND LOOKUPS
+    # -------------------------------------------------
+    @staticmethod
+    def make_key(url: str, kind: str = "download", headers: dict = None) -> str:
+        """Cache key for ``url`` fetched as ``kind`` with the given request headers"""
+        vary = sorted(
+            (name.lower(), str(value))
+            for name, value in (headers or {}).items()
+            if name.lower() in VARY_HEADERS
+        )
+        raw = json.dumps([kind, url, vary], separators=(",", ":"))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def lookup(self, key: str):
+        """
+        Find an entry
+
+        Returns:
+            Dict with the stored metadata, ``path`` to the body and a ``fresh``
+            flag, or None when the key is unknown or the body went missing
+            or was modified after it was stored
+        """
+        with self._lock:
+            row = self._db.execute("SELECT * FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            entry = dict(row)
+            entry["path"] = self._blob_path(entry["digest"])
+            try:
+                stat = os.stat(entry["path"])
+                # Blobs are written before their entry; a later mtime means
+                # something wrote to it, so check the digest
+                intact = stat.st_size == entry["size"] and (
+                    stat.st_mtime <= entry["stored_at"] or _file_digest(entry["path"]) == entry["digest"]
+                )
+            except OSError:
+                intact = False
+            if not intact:
+                # A body that was changed on disk must not be served again
+                logger.warning(f"Cache entry {key[:12]} is missing or was modified, dropping it")
+                self._db.execute("DELETE FROM entries WHERE digest = ?", (entry["digest"],))
+                try:
+                    os.unlink(entry["path"])
+                except OSError:
+                    pass
+                return None
+            now = time.time()
+            self._db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        entry["fresh"] = now - entry["stored_at"] < entry["ttl"]
+        return entry
+
+    @staticmethod
+    def validators(entry) -> dict:
+        """Conditional request headers for revalidating a stale entry"""
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def refresh(self, key: str):
+        """Mark an entry fresh again, e.g. after a 304 Not Modified"""
+        now = time.time()
+        with self._lock:
+            self._db.execute("UPDATE entries SET stored_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+
+    # -------------------------------------------------
+    # STORING
+    # -------------------------------------------------
+    def temp_path(self, suffix: str = ".part") -> str:
+        """Path of a new empty file on the same filesystem as the blobs"""
+        fd, path = tempfile.mkstemp(dir=os.path.join(self.root, "blobs"), suffix=suffix)
+        os.close(fd)
+        return path
+
+    def put_bytes(self, key: str, url: str, data: bytes, headers: dict = None, ttl: float = None):
+        """Store a response body; ``headers`` are the response headers"""
+        tmp_path = self.temp_path()
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        return self.put_file(key, url, tmp_path, headers, ttl, digest=hashlib.sha256(data).hexdigest())
+
+    def put_file(self, key: str, url: str, path: str, headers: dict = None, ttl: float = None, digest: str = None):
+        """
+        Move a downloaded file into the cache
+
+        ``path`` is consumed: it is renamed into the blob store (or removed if
+        an identical blob already exists).
+        """
+        if digest is None:
+            digest = _file_digest(path)
+        blob = self._blob_path(digest)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        if os.path.exists(blob) and _file_digest(blob) == digest:
+            os.unlink(path)
+        else:
+            os.replace(path, blob)
+            # Blobs are never handed out directly (see materialize); the mode
+            # bit only guards against accidental writes by non-root users
+            os.chmod(blob, 0o444)
+
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+        now = time.time()
+        entry = {
+            "key": key,
+            "url": url,
+            "digest": digest,
+            "size": os.path.getsize(blob),
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "content_type": headers.get("content-type"),
+            "ttl": self.ttl if ttl is None else ttl,
+            "stored_at": now,
+            "accessed_at": now
+        }
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES "
+                "(:key, :url, :digest, :size, :etag, :last_modified, :content_type, :ttl, :stored_at, :accessed_at)",
+                entry
+            )
+        self._evict()
+        entry["path"] = blob
+        entry["fresh"] = True
+        return entry
+
+    # -------------------------------------------------
+    # READING
+    # -------------------------------------------------
+    @staticmethod
+    def materialize(entry, dest: str):
+        """
+        Write a private copy of the cached body to ``dest``
+
+        The copy never shares the blob's inode, so code that edits the file
+        (even as root, which ignores the read-only mode bit) cannot corrupt
+        the cache. On filesystems with reflinks (btrfs, XFS) the copy is a
+        copy-on-write clone and costs no extra space.
+        """
+        if os.path.lexists(dest):
+            # Replace rather than overwrite: dest may be a link to something else
+            os.unlink(dest)
+        tmp = f"{dest}.{os.getpid()}.part"
+        try:
+            clone_file(entry["path"], tmp)
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, dest)
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+        return dest
+
+    @staticmethod
+    def read_text(entry) -> str:
+        with open(entry["path"], encoding="utf-8", errors="replace") as f:
+            return f.read()
+
+    # -------------------------------------------------
+    # EVICTION
+    # -------------------------------------------------
+    def _evict(self):
+        with self._lock:
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            rows = self._db.execute("SELECT key, digest, size FROM entries ORDER BY accessed_at").fetchall()
+            for row in rows:
+                if total <= self.max_bytes:
+                    break
+                self._db.execute("DELETE FROM entries WHERE key = ?", (row["key"],))
+                total -= row["size"]
+                still_used = self._db.execute(
+                    "SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (row["digest"],)
+                ).fetchone()
+                if not still_used:
+                    try:
+                        os.unlink(self._blob_path(row["digest"]))
+                    except OSError:
+                        pass
+                logger.info(f"Evicted cache entry {row['key'][:12]} ({row['size']} bytes)")
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, "blobs", digest[:2], digest)
+
+
+# ioctl(FICLONE) from linux/fs.h
+_FICLONE = 0x40049409
+
+
+def clone_file(src: str, dest: str):
+    """Copy ``src`` to ``dest``, as a reflink when the filesystem supports it"""
+    with open(src, "rb") as fsrc, open(dest, "wb") as fdst:
+        if fcntl is not None:
+            try:
+                fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+                return
+            except OSError:
+                pass
+        shutil.copyfileobj(fsrc, fdst, 1024 * 1024)
+
+
+def _file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# -------------------------------------------------
+# PROCESS-WIDE CACHE
+# -------------------------------------------------
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> ContentCache:
+    """Return the shared cache, creating it on first use"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ContentCache()
+        return _cache
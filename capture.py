@@ -0,0 +1,196 @@
+"""
+Response Capture for Browser Renders
+Keeps the bodies of the data responses a page loads while it renders
+(JSON and text from fetch/XHR, CSV files, scripts) and stores them in the
+download cache, so the agent can read what the browser already fetched
+instead of downloading it again
+
+Captured bodies are cached under the same key download_file uses, so a
+later download of the same URL is served from the cache as well. API
+responses are often dynamic, so they are only cached when their
+Cache-Control allows it, and never for longer than RENDER_CAPTURE_TTL_SECONDS.
+"""
+
+from urllib.parse import urlsplit
+import asyncio
+import hashlib
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_MAX_BYTES = int(float(os.getenv("RENDER_CAPTURE_MAX_MB", "5")) * 1024 * 1024)
+CAPTURE_MAX_ITEMS = int(os.getenv("RENDER_CAPTURE_MAX_ITEMS", "30"))
+# Longest time a captured body answers download_file for its URL
+CAPTURE_TTL = float(os.getenv("RENDER_CAPTURE_TTL_SECONDS", "60"))
+# Seconds to wait for bodies still being read when the render is done
+COLLECT_TIMEOUT = 5.0
+# Bodies up to this size are also shown inline in the manifest
+INLINE_MAX_BYTES = 500
+DOWNLOAD_DIR = "LLMFiles"
+
+CAPTURE_CONTENT_TYPES = re.compile(r"json|csv|javascript|ecmascript|text/plain|tab-separated-values|xml")
+CAPTURE_EXTENSIONS = (".json", ".csv", ".tsv", ".js", ".mjs", ".txt", ".xml")
+# Resource types whose responses can carry data; documents and styles never do
+CAPTURE_RESOURCE_TYPES = {"fetch", "xhr", "script", "other"}
+
+
+def wants(resource_type: str, url: str, content_type: str) -> bool:
+    """True for a response worth keeping: data or script, not the page itself"""
+    if resource_type not in CAPTURE_RESOURCE_TYPES or not url.startswith("http"):
+        return False
+    content_type = (content_type or "").lower()
+    if CAPTURE_CONTENT_TYPES.search(content_type):
+        return True
+    return "html" not in content_type and urlsplit(url).path.lower().endswith(CAPTURE_EXTENSIONS)
+
+
+class ResponseCapture:
+    """Collects matching response bodies of one page"""
+
+    def __init__(self, max_bytes: int = CAPTURE_MAX_BYTES, max_items: int = CAPTURE_MAX_ITEMS):
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self.items = []
+        self.skipped = 0
+        self._tasks = []
+
+    def attach(self, page):
+        page.on("response", self._on_response)
+
+    def _on_response(self, response):
+        headers = response.headers
+        if not wants(response.request.resource_type, response.url, headers.get("content-type")):
+            return
+        if response.status >= 300 or len(self._tasks) >= self.max_items:
+            self.skipped += 1
+            return
+        try:
+            if int(headers.get("content-length", 0)) > self.max_bytes:
+                self.skipped += 1
+                return
+        except ValueError:
+            pass
+        self._tasks.append(asyncio.ensure_future(self._read(response)))
+
+    async def _read(self, response):
+        try:
+            body = await response.body()
+        except Exception as e:
+            # Redirects and responses of closed frames have no body
+            logger.debug(f"Could not read captured response {response.url}: {e}")
+            self.skipped += 1
+            return
+        if len(body) > self.max_bytes:
+            self.skipped += 1
+            return
+        self.items.append({
+            "url": response.url,
+            "resource_type": response.request.resource_type,
+            "content_type": response.headers.get("content-type", ""),
+            "headers": dict(response.headers),
+            "body": body
+        })
+
+    async def collect(self, timeout: float = COLLECT_TIMEOUT) -> list:
+        """
+        Wait for bodies still being read; call before the page closes
+
+        Returns:
+            List of dicts with ``url``, ``resource_type``, ``content_type``,
+            ``headers`` and ``body`` (bytes), in the order they were read
+        """
+        if self._tasks:
+            _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            self.skipped += len(pending)
+        if self.skipped:
+            logger.info(f"Captured {len(self.items)} responses, skipped {self.skipped}")
+        return self.items
+
+
+def cache_ttl(headers: dict):
+    """
+    Seconds a captured response may be served from the download cache
+
+    Returns:
+        None when Cache-Control (or Pragma) forbids reusing it, otherwise
+        its max-age capped at CAPTURE_TTL
+    """
+    headers = {k.lower(): v for k, v in (headers or {}).items()}
+    directives = {}
+    for part in headers.get("cache-control", "").lower().split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name] = value.strip('" ')
+    if {"no-store", "no-cache", "private"} & directives.keys() or "no-cache" in headers.get("pragma", "").lower():
+        return None
+    for name in ("s-maxage", "max-age"):
+        if name in directives:
+            try:
+                age = float(directives[name])
+            except ValueError:
+                return None
+            return min(age, CAPTURE_TTL) if age > 0 else None
+    return CAPTURE_TTL
+
+
+def _filename(url: str, digest: str, taken: dict) -> str:
+    name = re.sub(r"[^A-Za-z0-9._-]", "_", os.path.basename(urlsplit(url).path)) or "response"
+    if name.startswith("."):
+        name = "response" + name
+    # Two URLs with the same file name must not overwrite each other
+    if taken.get(name, digest) != digest:
+        name = f"{digest[:8]}_{name}"
+    taken[name] = digest
+    return name
+
+
+def store_captures(items: list, cache, directory: str = DOWNLOAD_DIR) -> list:
+    """
+    Save captured bodies to ``directory`` and, where allowed, the download cache
+
+    Bodies whose Cache-Control permits it are cached under the download key
+    for at most CAPTURE_TTL, so a download_file of the same URL right after
+    the render is not fetched again. Blocking; call through
+    asyncio.to_thread from a loop.
+
+    Args:
+        items: ResponseCapture.collect results
+        cache: cache.ContentCache
+        directory: Where download_file saves files, so code can open them by name
+
+    Returns:
+        Manifest: one dict per response with ``url``, ``content_type``,
+        ``bytes``, ``filename`` (relative to ``directory``), ``path`` and,
+        for small bodies, their ``text``
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest = []
+    taken = {}
+    for item in items:
+        body = item["body"]
+        filename = _filename(item["url"], hashlib.sha256(body).hexdigest(), taken)
+        path = os.path.join(directory, filename)
+        ttl = cache_ttl(item["headers"])
+        if ttl is not None:
+            entry = cache.put_bytes(cache.make_key(item["url"]), item["url"], body, item["headers"], ttl)
+            cache.materialize(entry, path)
+        else:
+            if os.path.lexists(path):
+                os.unlink(path)
+            with open(path, "wb") as f:
+                f.write(body)
+        record = {
+            "url": item["url"],
+            "content_type": item["content_type"].split(";")[0],
+            "bytes": len(body),
+            "filename": filename,
+            "path": os.path.abspath(path)
+        }
+        if len(body) <= INLINE_MAX_BYTES:
+            record["text"] = body.decode("utf-8", errors="replace")
+        manifest.append(record)
+    return manifest
@@ -0,0 +1,151 @@
+"""
+HTML Extraction
+Turns rendered pages into compact, LLM-friendly text
+"""
+
+from bs4 import BeautifulSoup, NavigableString
+from urllib.parse import urljoin
+import base64
+import binascii
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# atob(`...`), atob('...') or atob("...")
+ATOB_PATTERN = re.compile(r"atob\(\s*([`'\"])(.*?)\1\s*\)", re.DOTALL)
+
+NON_VISIBLE_TAGS = ["script", "style", "noscript", "template", "svg", "head"]
+
+
+def decode_atob_payloads(html) -> list:
+    """
+    Decode every base64 literal passed to ``atob(...)`` in the page's scripts
+
+    Args:
+        html: Raw HTML string or an already parsed BeautifulSoup tree
+
+    Returns:
+        List of decoded strings, in document order
+    """
+    soup = html if isinstance(html, BeautifulSoup) else BeautifulSoup(html, "html.parser")
+    payloads = []
+    for script in soup.find_all("script"):
+        text = script.string or ""
+        if "atob" not in text:
+            continue
+        for match in ATOB_PATTERN.finditer(text):
+            b64_string = re.sub(r"\s+", "", match.group(2))
+            try:
+                decoded = base64.b64decode(b64_string + "=" * (-len(b64_string) % 4))
+                payloads.append(decoded.decode("utf-8", errors="replace"))
+            except (binascii.Error, ValueError) as e:
+                logger.warning(f"Failed to decode base64: {e}")
+    return payloads
+
+
+def table_to_markdown(table) -> str:
+    """Render an HTML table as a markdown table"""
+    rows = []
+    for tr in table.find_all("tr"):
+        cells = [" ".join(c.get_text(" ", strip=True).split()).replace("|", "\\|") for c in tr.find_all(["th", "td"])]
+        if cells:
+            rows.append(cells)
+    if not rows:
+        return ""
+    width = max(len(r) for r in rows)
+    rows = [r + [""] * (width - len(r)) for r in rows]
+    lines = ["| " + " | ".join(rows[0]) + " |", "|" + " --- |" * width]
+    lines += ["| " + " | ".join(r) + " |" for r in rows[1:]]
+    return "\n".join(lines)
+
+
+def _visible_text(soup) -> str:
+    lines = (line.strip() for line in soup.get_text("\n").splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def _compact_fragment(soup, base_url: str) -> dict:
+    """Pull tables, code blocks, links and visible text out of a parsed tree"""
+    for tag in soup.find_all(NON_VISIBLE_TAGS):
+        tag.decompose()
+
+    tables = []
+    for table in soup.find_all("table"):
+        markdown = table_to_markdown(table)
+        if markdown:
+            tables.append(markdown)
+        table.decompose()
+
+    code_blocks = []
+    for pre in soup.find_all("pre"):
+        code_blocks.append(pre.get_text().strip("\n"))
+        pre.decompose()
+    for code in soup.find_all("code"):
+        code.replace_with(NavigableString(f"`{code.get_text()}`"))
+
+    links = []
+    for a in soup.find_all("a", href=True):
+        href = urljoin(base_url, a["href"]) if base_url else a["href"]
+        text = a.get_text(" ", strip=True)
+        links.append(f"- [{text or href}]({href})")
+
+    return {
+        "text": _visible_text(soup),
+        "tables": tables,
+        "code_blocks": code_blocks,
+        "links": links
+    }
+
+
+def compact_html(html: str, base_url: str = None) -> str:
+    """
+    Reduce a rendered page to the parts an LLM actually needs
+
+    Keeps visible text, links with absolute URLs, ``<pre>`` blocks, tables as
+    markdown, script ``src`` references and the decoded content of any
+    ``atob(...)`` payloads. Styles, inline script bodies and markup are dropped.
+
+    Args:
+        html: Raw or rendered HTML
+        base_url: Page URL used to resolve relative links
+
+    Returns:
+        Markdown-ish text
+    """
+    soup = BeautifulSoup(html, "html.parser")
+
+    title = soup.title.get_text(strip=True) if soup.title else ""
+    script_srcs = [urljoin(base_url, s["src"]) if base_url else s["src"] for s in soup.find_all("script", src=True)]
+    payloads = decode_atob_payloads(soup)
+
+    parts = [_compact_fragment(soup, base_url)]
+    for payload in payloads:
+        part = _compact_fragment(BeautifulSoup(payload, "html.parser"), base_url)
+        # A rendered page usually already shows the decoded payload
+        if part["text"] and part["text"] in parts[0]["text"]:
+            continue
+        parts.append(part)
+
+    sections = []
+    if title:
+        sections.append(f"# {title}")
+    if base_url:
+        sections.append(f"URL: {base_url}")
+
+    for i, part in enumerate(parts):
+        heading = "## Page text" if i == 0 else f"## Decoded atob() payload {i}"
+        if part["text"]:
+            sections.append(f"{heading}\n{part['text']}")
+        for block in part["code_blocks"]:
+            sections.append(f"```\n{block}\n```")
+        for table in part["tables"]:
+            sections.append(table)
+
+    links = [link for part in parts for link in part["links"]]
+    if links:
+        sections.append("## Links\n" + "\n".join(dict.fromkeys(links)))
+    if script_srcs:
+        sections.append("## Script sources\n" + "\n".join(f"- {src}" for src in dict.fromkeys(script_srcs)))
+
+    return "\n\n".join(sections)
@@ -0,0 +1,202 @@
+"""
+Tiered Page Fetcher
+Loads pages with the shared pooled HTTP/2 client first and only escalates to the
+Chromium pool when the response looks like it needs JavaScript
+
+Every fetch is appended to a JSONL log with the tier used, the reason for
+escalating and the latency of each tier, so the heuristics in
+``needs_render`` can be tuned against real traffic.
+"""
+
+from bs4 import BeautifulSoup
+from urllib.parse import urlsplit
+import asyncio
+import httpx
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from browser import load_page
+from browser_pool import get_pool
+from capture import ResponseCapture
+from extractor import NON_VISIBLE_TAGS, decode_atob_payloads
+from http_client import async_client
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+HTTP_TIMEOUT = float(os.getenv("FETCH_HTTP_TIMEOUT_SECONDS", "10"))
+STATS_PATH = os.getenv("FETCH_STATS_PATH", os.path.join("LLMFiles", "fetch_stats.jsonl"))
+# Pages with less visible text than this and some scripts are treated as JS apps
+MIN_TEXT_CHARS = 40
+
+# Inline script code that builds the page on the client
+DOM_WRITE_PATTERN = re.compile(r"innerHTML|document\.write|appendChild|insertAdjacentHTML|textContent\s*=|fetch\(|XMLHttpRequest")
+SPA_ROOT_IDS = ("root", "app", "__next", "__nuxt")
+
+
+def needs_render(html: str, content_type: str = "text/html", decodes_atob: bool = True):
+    """
+    Decide whether a plain HTTP response has to be rendered in a browser
+
+    Args:
+        html: Response body
+        content_type: Response Content-Type; only HTML is ever rendered
+        decodes_atob: True when the caller decodes ``atob(...)`` payloads
+            itself (compact extraction does), so they alone do not require
+            a browser
+
+    Returns:
+        Short reason string, or None when the HTTP response is enough
+    """
+    if "html" not in (content_type or "html"):
+        return None
+    if not html.strip():
+        return "empty body"
+
+    soup = BeautifulSoup(html, "html.parser")
+    scripts = soup.find_all("script")
+    external_scripts = any(s.get("src") for s in scripts)
+    inline_code = "\n".join(s.string or "" for s in scripts if not s.get("src"))
+    if decode_atob_payloads(soup):
+        return None if decodes_atob else "atob payload"
+
+    spa_root = any(soup.find(id=root_id) is not None for root_id in SPA_ROOT_IDS)
+    for tag in soup.find_all(NON_VISIBLE_TAGS):
+        tag.decompose()
+    text = soup.get_text(" ", strip=True)
+
+    if not scripts:
+        return None
+    if not text:
+        return "script-only page"
+    if len(text) < MIN_TEXT_CHARS and (spa_root or external_scripts):
+        return "app shell"
+    if DOM_WRITE_PATTERN.search(inline_code):
+        return "inline DOM writes"
+    return None
+
+
+# -------------------------------------------------
+# TIERS
+# -------------------------------------------------
+async def _render(url: str, wait_for: str = None, deadline: float = None, policy=None, capture: bool = False):
+    """Render ``url`` in the browser pool; returns the HTML and the load_page report"""
+    async def render(page):
+        responses = ResponseCapture() if capture else None
+        if responses is not None:
+            responses.attach(page)
+        report = await load_page(page, url, wait_for=wait_for, deadline=deadline, policy=policy)
+        html = await page.content()
+        # Bodies can only be read while the page is still open
+        report["captured"] = await responses.collect() if responses is not None else []
+        return html, report
+    return await get_pool().run(render, user_agent=USER_AGENT)
+
+
+async def fetch_page(url: str, decodes_atob: bool = True, force_render: bool = False, wait_for: str = None, deadline: float = None, policy=None, capture: bool = False) -> dict:
+    """
+    Fetch a page with the cheapest tier that gives usable HTML
+
+    Args:
+        url: Page URL
+        decodes_atob: Passed to needs_render
+        force_render: Skip the HTTP tier
+        wait_for: Selector the rendered page must contain, see
+            browser.load_page; implies a render, since only a browser can
+            wait for it
+        deadline: Quiz deadline that caps how long a render may wait
+        policy: Resource blocking policy for renders, see browser.load_page
+        capture: Keep the data responses (JSON, CSV, JS, text) a render
+            loads, see capture.ResponseCapture
+
+    Returns:
+        Dict with ``html``, ``tier`` ("http" or "browser"), ``reason`` for
+        escalating (None if not escalated), ``status``, ``seconds`` and,
+        for renders, ``wait`` (how waiting ended) and ``blocked`` (blocked
+        request and byte counts). ``responses`` holds the captured responses
+        with their bodies (``captured`` counts them); it is empty unless a
+        capturing render ran.
+    """
+    started = time.perf_counter()
+    record = {"url": url, "host": urlsplit(url).hostname, "tier": "http", "reason": None, "status": None}
+    html = None
+    responses = []
+
+    if force_render or wait_for:
+        record["reason"] = "forced" if force_render else "wait_for"
+    else:
+        try:
+            response = await async_client().get(url, headers={"User-Agent": USER_AGENT}, timeout=HTTP_TIMEOUT)
+            record["status"] = response.status_code
+            record["http_version"] = response.http_version
+            html = response.text
+            content_type = response.headers.get("content-type", "")
+            if response.status_code >= 400:
+                # Error pages are often bot checks that a real browser gets through
+                record["reason"] = f"HTTP {response.status_code}"
+            else:
+                record["reason"] = await asyncio.to_thread(needs_render, html, content_type, decodes_atob)
+        except httpx.HTTPError as e:
+            record["reason"] = f"http error: {type(e).__name__}"
+        record["http_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    if record["reason"] is not None:
+        record["tier"] = "browser"
+        render_started = time.perf_counter()
+        # Comparing http_chars with chars shows renders that barely changed the page
+        record["http_chars"] = len(html or "")
+        html, report = await _render(url, wait_for, deadline, policy, capture)
+        record["wait"] = report.pop("wait")
+        responses = report.pop("captured", [])
+        record["captured"] = len(responses)
+        record["blocked"] = report
+        record["render_ms"] = round((time.perf_counter() - render_started) * 1000, 1)
+    record["chars"] = len(html)
+    record["seconds"] = round(time.perf_counter() - started, 3)
+    # Appending to the stats log is file I/O, keep it off the event loop
+    await asyncio.to_thread(_record, record)
+    logger.info(f"Fetched {url} via {record['tier']} in {record['seconds']}s" + (f" ({record['reason']})" if record["reason"] else ""))
+    return {**record, "html": html, "responses": responses}
+
+
+# -------------------------------------------------
+# STATS
+# -------------------------------------------------
+_stats_lock = threading.Lock()
+_totals = {}
+
+
+def _record(record: dict):
+    """Add a fetch to the per-tier totals and the JSONL log; blocking"""
+    record = {**record, "ts": time.time()}
+    with _stats_lock:
+        tier = _totals.setdefault(record["tier"], {"count": 0, "seconds": 0.0, "blocked": 0, "blocked_bytes": 0})
+        tier["count"] += 1
+        tier["seconds"] += record["seconds"]
+        if "blocked" in record:
+            tier["blocked"] += record["blocked"]["blocked"]
+            tier["blocked_bytes"] += record["blocked"]["blocked_bytes_estimate"]
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(STATS_PATH)), exist_ok=True)
+            with open(STATS_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            logger.debug(f"Could not write fetch stats: {e}")
+
+
+def fetch_stats() -> dict:
+    """Per-tier fetch counts, mean latency and blocked requests of this process"""
+    with _stats_lock:
+        return {
+            tier: {
+                "count": t["count"],
+                "mean_seconds": round(t["seconds"] / t["count"], 3),
+                "blocked_requests": t["blocked"],
+                "blocked_bytes_estimate": t["blocked_bytes"]
+            }
+            for tier, t in _totals.items()
+        }
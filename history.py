@@ -0,0 +1,225 @@
+"""
+Message History Compaction
+Keeps the prompt sent to the LLM bounded however long a quiz chain runs
+"""
+
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage, ToolMessage, convert_to_messages
+from langgraph.graph.message import add_messages
+import json
+import logging
+import os
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Rough chars-per-token ratio, good enough for budgeting Llama/GPT prompts
+CHARS_PER_TOKEN = 4
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "24000"))
+TOOL_OUTPUT_MAX_CHARS = int(os.getenv("TOOL_OUTPUT_MAX_CHARS", "6000"))
+LATEST_TOOL_OUTPUT_MAX_CHARS = int(os.getenv("LATEST_TOOL_OUTPUT_MAX_CHARS", "24000"))
+SQUEEZED_TOOL_OUTPUT_MAX_CHARS = 800
+
+
+def _text(content) -> str:
+    return content if isinstance(content, str) else json.dumps(content, default=str)
+
+
+def estimate_tokens(message) -> int:
+    """Approximate the prompt tokens a message costs"""
+    size = len(_text(message.content))
+    for call in getattr(message, "tool_calls", None) or []:
+        size += len(call.get("name", "")) + len(json.dumps(call.get("args", {}), default=str))
+    return size // CHARS_PER_TOKEN + 4
+
+
+def digest(text: str, limit: int) -> str:
+    """Cut ``text`` to about ``limit`` chars, keeping its head and tail"""
+    if len(text) <= limit:
+        return text
+    head = limit * 3 // 4
+    tail = limit - head
+    omitted = len(text) - head - tail
+    return f"{text[:head]}\n... [{omitted} chars omitted] ...\n{text[-tail:]}"
+
+
+def next_quiz_url(message):
+    """Return the new quiz URL if ``message`` is a post_request result that carries one"""
+    if not isinstance(message, ToolMessage) or message.name != "post_request":
+        return None
+    try:
+        data = json.loads(_text(message.content))
+    except ValueError:
+        return None
+    url = data.get("url") if isinstance(data, dict) else None
+    return url if isinstance(url, str) and url else None
+
+
+def segment_start(messages: list, start: int = 0) -> int:
+    """
+    Index of the first message of the quiz currently being solved
+
+    A quiz segment ends with the post_request result that hands out the next
+    URL. The new segment starts at the first non-tool message after it, so
+    parallel tool results of the same turn are never split from their call.
+    """
+    boundary = None
+    for i in range(len(messages) - 1, start - 1, -1):
+        if next_quiz_url(messages[i]):
+            boundary = i
+            break
+    if boundary is None:
+        return start
+    i = boundary + 1
+    while i < len(messages) and isinstance(messages[i], ToolMessage):
+        i += 1
+    return i
+
+
+def summarize_segments(messages: list) -> list:
+    """
+    One line per answer submitted in ``messages``
+
+    Returns:
+        List of strings like ``"<submit url>: answer 42 -> correct"``
+    """
+    calls = {}
+    lines = []
+    for message in messages:
+        if isinstance(message, AIMessage):
+            for call in message.tool_calls or []:
+                if call.get("name") == "post_request":
+                    calls[call.get("id")] = call.get("args", {})
+        elif isinstance(message, ToolMessage) and message.tool_call_id in calls:
+            args = calls.pop(message.tool_call_id)
+            payload = args.get("payload") or {}
+            answer = payload.get("answer") if isinstance(payload, dict) else payload
+            try:
+                result = json.loads(_text(message.content))
+            except ValueError:
+                result = {}
+            if not isinstance(result, dict):
+                result = {}
+            verdict = "correct" if result.get("correct") else f"incorrect ({result.get('reason', 'no reason')})"
+            lines.append(f"{args.get('url')}: answer {json.dumps(answer, default=str)[:200]} -> {verdict}")
+    return lines
+
+
+def summary_message(lines: list, next_url: str) -> HumanMessage:
+    body = "\n".join(f"- {line}" for line in lines) or "- (no answers recorded)"
+    return HumanMessage(content=(
+        "Earlier quiz steps were compacted. Submissions so far:\n"
+        f"{body}\n\n"
+        f"The last submission returned the next quiz URL: {next_url}\n"
+        "Continue solving from that URL."
+    ))
+
+
+def next_quiz_url_before(messages: list, start: int):
+    """The quiz URL handed out by the last boundary before ``start``"""
+    for i in range(start - 1, -1, -1):
+        url = next_quiz_url(messages[i])
+        if url:
+            return url
+    return None
+
+
+def append_messages(left: list, right) -> list:
+    """
+    State reducer that appends new messages without touching the old ones
+
+    ``add_messages`` converts every stored message and rebuilds an ID index
+    over the whole history on each update, which makes a long chain O(n^2).
+    Nodes in this graph only ever add messages, so new ones are given an ID
+    and appended; ``RemoveMessage`` updates still go through ``add_messages``.
+
+    The result is still a new list (one O(n) copy of references): LangGraph
+    hands the current list to running nodes and checkpoints, so it must not
+    be extended in place.
+    """
+    if not isinstance(right, list):
+        right = [right]
+    right = convert_to_messages(right)
+    if any(isinstance(m, RemoveMessage) for m in right):
+        return add_messages(left, right)
+    for message in right:
+        if message.id is None:
+            message.id = str(uuid.uuid4())
+    return left + right
+
+
+def advance_segment(messages: list, start: int, lines: list):
+    """
+    Move the current-quiz marker past any quiz finished since ``start``
+
+    Only ``messages[start:]`` is scanned, so the per-turn cost depends on
+    the length of the current quiz rather than of the whole chain.
+
+    Returns:
+        Tuple of (new segment start, summary lines including new submissions)
+    """
+    new_start = segment_start(messages, start)
+    if new_start > start:
+        lines = lines + summarize_segments(messages[start:new_start])
+    return new_start, lines
+
+
+def compact_messages(messages: list, budget: int = HISTORY_TOKEN_BUDGET, start: int = None, summary_lines: list = None) -> list:
+    """
+    Build the message list actually sent to the LLM
+
+    ``start`` and ``summary_lines`` come from :func:`advance_segment`; when
+    omitted they are recomputed from the full history.
+
+    1. Finished quiz segments are replaced by a short summary message.
+    2. Tool outputs are cut to a bounded digest (the newest one gets more room).
+    3. If the prompt is still over ``budget`` tokens, older tool outputs are
+       squeezed further and then the oldest turns of the current quiz dropped.
+
+    The agent state itself is never modified.
+    """
+    if start is None:
+        start, summary_lines = advance_segment(messages, 0, [])
+    if start > 0:
+        head = [summary_message(summary_lines, next_quiz_url_before(messages, start))]
+    else:
+        head = []
+    current = list(messages[start:])
+
+    last_tool = max((i for i, m in enumerate(current) if isinstance(m, ToolMessage)), default=None)
+    for i, message in enumerate(current):
+        if isinstance(message, ToolMessage):
+            limit = LATEST_TOOL_OUTPUT_MAX_CHARS if i == last_tool else TOOL_OUTPUT_MAX_CHARS
+            current[i] = _with_content(message, limit)
+
+    used = sum(estimate_tokens(m) for m in head + current)
+    if used > budget:
+        for i, message in enumerate(current):
+            if isinstance(message, ToolMessage) and i != last_tool:
+                before = estimate_tokens(message)
+                current[i] = _with_content(message, SQUEEZED_TOOL_OUTPUT_MAX_CHARS)
+                used -= before - estimate_tokens(current[i])
+
+    # Drop whole turns (an AI message plus its tool results), oldest first,
+    # but always keep the opening message of the segment and the latest turn
+    while used > budget:
+        first_ai = next((i for i, m in enumerate(current) if i > 0 and isinstance(m, AIMessage)), None)
+        if first_ai is None:
+            break
+        end = first_ai + 1
+        while end < len(current) and isinstance(current[end], ToolMessage):
+            end += 1
+        if end >= len(current):
+            break
+        used -= sum(estimate_tokens(m) for m in current[first_ai:end])
+        del current[first_ai:end]
+
+    compacted = head + current
+    logger.debug(f"Compacted {len(messages)} messages to {len(compacted)} (~{used} tokens)")
+    return compacted
+
+
+def _with_content(message: ToolMessage, limit: int) -> ToolMessage:
+    text = _text(message.content)
+    if len(text) <= limit:
+        return message
+    return message.model_copy(update={"content": digest(text, limit)})
@@ -0,0 +1,350 @@
+"""
+Shared HTTP Client
+One pooled httpx client per event loop (plus one for synchronous code),
+so repeated calls to the same quiz host reuse a keep-alive or HTTP/2
+connection instead of paying for a TCP and TLS handshake every time
+
+On top of httpx's global pool limits this adds a per-host cap on
+concurrent requests and a small DNS cache. Every request is counted per
+host, together with the connections, TLS handshakes and DNS lookups it
+needed, so connection reuse can be checked with ``http_stats()``.
+"""
+
+import asyncio
+import atexit
+import httpcore
+import httpx
+import ipaddress
+import logging
+import os
+import socket
+import threading
+import time
+import weakref
+
+logger = logging.getLogger(__name__)
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT_SECONDS", "30"))
+MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "30"))
+# Concurrent requests per host; HTTP/2 multiplexes them over one connection
+MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "8"))
+DNS_TTL = float(os.getenv("HTTP_DNS_TTL_SECONDS", "300"))
+
+try:
+    import h2  # noqa: F401
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+LIMITS = httpx.Limits(
+    max_connections=MAX_CONNECTIONS,
+    max_keepalive_connections=MAX_KEEPALIVE,
+    keepalive_expiry=KEEPALIVE_EXPIRY
+)
+
+
+# -------------------------------------------------
+# METRICS
+# -------------------------------------------------
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def _count(host: str, field: str, amount: float = 1):
+    with _stats_lock:
+        host_stats = _stats.setdefault(host, {
+            "requests": 0, "connections": 0, "tls_handshakes": 0,
+            "dns_lookups": 0, "dns_hits": 0, "slot_wait_ms": 0.0
+        })
+        host_stats[field] += amount
+
+
+def _with_reuse(counts: dict) -> dict:
+    counts = dict(counts)
+    counts["slot_wait_ms"] = round(counts["slot_wait_ms"], 1)
+    requests = counts["requests"]
+    counts["reuse_ratio"] = round(1 - counts["connections"] / requests, 3) if requests else None
+    return counts
+
+
+def http_stats() -> dict:
+    """
+    Request, connection, TLS and DNS counts of this process
+
+    Returns:
+        Dict with ``hosts`` (per-host counts) and ``total``; ``reuse_ratio``
+        is the share of requests that went over an existing connection
+    """
+    with _stats_lock:
+        hosts = {host: dict(counts) for host, counts in _stats.items()}
+    total = {}
+    for counts in hosts.values():
+        for field, value in counts.items():
+            total[field] = total.get(field, 0) + value
+    return {
+        "hosts": {host: _with_reuse(counts) for host, counts in hosts.items()},
+        "total": _with_reuse(total) if total else {}
+    }
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def _trace_event(host: str, name: str):
+    if name == "connection.connect_tcp.complete":
+        _count(host, "connections")
+    elif name == "connection.start_tls.complete":
+        _count(host, "tls_handshakes")
+
+
+# -------------------------------------------------
+# DNS CACHE
+# -------------------------------------------------
+_dns_lock = threading.Lock()
+_dns = {}
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+def _cached_address(host: str):
+    with _dns_lock:
+        cached = _dns.get(host)
+    if cached and cached[1] > time.monotonic():
+        _count(host, "dns_hits")
+        return cached[0]
+    return None
+
+
+def _remember(host: str, infos: list) -> str:
+    address = infos[0][4][0]
+    with _dns_lock:
+        _dns[host] = (address, time.monotonic() + DNS_TTL)
+    _count(host, "dns_lookups")
+    return address
+
+
+def forget_address(host: str):
+    """Drop a cached address, e.g. after connecting to it failed"""
+    with _dns_lock:
+        _dns.pop(host, None)
+
+
+class _CachingAsyncBackend(httpcore.AsyncNetworkBackend):
+    """Network backend that resolves hostnames through the DNS cache; TLS still verifies the hostname"""
+
+    def __init__(self, backend):
+        self._backend = backend
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        address = host if _is_ip(host) else _cached_address(host)
+        if address is None:
+            infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            address = _remember(host, infos)
+        try:
+            return await self._backend.connect_tcp(address, port, timeout, local_address, socket_options)
+        except Exception:
+            forget_address(host)
+            raise
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._backend.connect_unix_socket(path, timeout, socket_options)
+
+    async def sleep(self, seconds):
+        await self._backend.sleep(seconds)
+
+
+class _CachingSyncBackend(httpcore.NetworkBackend):
+    def __init__(self, backend):
+        self._backend = backend
+
+    def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        address = host if _is_ip(host) else _cached_address(host)
+        if address is None:
+            address = _remember(host, socket.getaddrinfo(host, port, type=socket.SOCK_STREAM))
+        try:
+            return self._backend.connect_tcp(address, port, timeout, local_address, socket_options)
+        except Exception:
+            forget_address(host)
+            raise
+
+    def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return self._backend.connect_unix_socket(path, timeout, socket_options)
+
+    def sleep(self, seconds):
+        self._backend.sleep(seconds)
+
+
+def _install_dns_cache(transport, backend_cls):
+    # httpx does not expose the connection pool's network backend
+    pool = getattr(transport, "_pool", None)
+    if pool is None or not hasattr(pool, "_network_backend"):
+        logger.debug("httpx transport has no network backend to wrap, DNS cache disabled")
+        return
+    pool._network_backend = backend_cls(pool._network_backend)
+
+
+# -------------------------------------------------
+# TRANSPORTS
+# -------------------------------------------------
+class _ReleasingAsyncStream(httpx.AsyncByteStream):
+    """Response body that frees the host slot once the response is closed"""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class _ReleasingSyncStream(httpx.SyncByteStream):
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+
+def _once(fn):
+    done = []
+
+    def call():
+        if not done:
+            done.append(True)
+            fn()
+    return call
+
+
+class _AsyncTransport(httpx.AsyncHTTPTransport):
+    """Pooled transport with a per-host request cap and request/connection counting"""
+
+    def __init__(self, max_per_host: int = MAX_PER_HOST, **kwargs):
+        super().__init__(**kwargs)
+        self._max_per_host = max_per_host
+        self._slots = {}
+        _install_dns_cache(self, _CachingAsyncBackend)
+
+    async def handle_async_request(self, request):
+        host = request.url.host
+        slot = self._slots.setdefault(host, asyncio.Semaphore(self._max_per_host))
+        started = time.perf_counter()
+        await slot.acquire()
+        _count(host, "slot_wait_ms", (time.perf_counter() - started) * 1000)
+        _count(host, "requests")
+        release = _once(slot.release)
+
+        async def trace(name, info):
+            _trace_event(host, name)
+        request.extensions.setdefault("trace", trace)
+
+        try:
+            response = await super().handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+        response.stream = _ReleasingAsyncStream(response.stream, release)
+        return response
+
+
+class _SyncTransport(httpx.HTTPTransport):
+    def __init__(self, max_per_host: int = MAX_PER_HOST, **kwargs):
+        super().__init__(**kwargs)
+        self._max_per_host = max_per_host
+        self._slots = {}
+        self._slots_lock = threading.Lock()
+        _install_dns_cache(self, _CachingSyncBackend)
+
+    def handle_request(self, request):
+        host = request.url.host
+        with self._slots_lock:
+            slot = self._slots.setdefault(host, threading.BoundedSemaphore(self._max_per_host))
+        started = time.perf_counter()
+        slot.acquire()
+        _count(host, "slot_wait_ms", (time.perf_counter() - started) * 1000)
+        _count(host, "requests")
+        release = _once(slot.release)
+        request.extensions.setdefault("trace", lambda name, info: _trace_event(host, name))
+
+        try:
+            response = super().handle_request(request)
+        except BaseException:
+            release()
+            raise
+        response.stream = _ReleasingSyncStream(response.stream, release)
+        return response
+
+
+# -------------------------------------------------
+# SHARED CLIENTS
+# -------------------------------------------------
+# One async client per event loop; httpx connections cannot move between loops
+_async_clients = weakref.WeakKeyDictionary()
+_sync_client = None
+_sync_lock = threading.Lock()
+
+
+def _client_options() -> dict:
+    return {"timeout": HTTP_TIMEOUT, "follow_redirects": True}
+
+
+def async_client() -> httpx.AsyncClient:
+    """Shared pooled AsyncClient of the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        transport = _AsyncTransport(MAX_PER_HOST, http2=HTTP2, limits=LIMITS, retries=1)
+        client = httpx.AsyncClient(transport=transport, **_client_options())
+        _async_clients[loop] = client
+    return client
+
+
+def sync_client() -> httpx.Client:
+    """Shared pooled Client for synchronous code; safe to use from several threads"""
+    global _sync_client
+    with _sync_lock:
+        if _sync_client is None or _sync_client.is_closed:
+            transport = _SyncTransport(MAX_PER_HOST, http2=HTTP2, limits=LIMITS, retries=1)
+            _sync_client = httpx.Client(transport=transport, **_client_options())
+        return _sync_client
+
+
+async def close_async_client():
+    """Close the shared client of the running loop"""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def close_sync_client():
+    global _sync_client
+    with _sync_lock:
+        client, _sync_client = _sync_client, None
+    if client is not None:
+        client.close()
+
+
+atexit.register(close_sync_client)
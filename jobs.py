@@ -0,0 +1,325 @@
+"""
+Quiz Job Scheduler
+Bounded in-process queue with a fixed pool of workers that run quiz chains
+
+Jobs are also written to a small SQLite table, so chains that were queued
+or running when the process died are picked up again on the next start.
+"""
+
+from collections import OrderedDict
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = int(os.getenv("QUIZ_QUEUE_SIZE", "20"))
+WORKERS = int(os.getenv("QUIZ_WORKERS", "2"))
+JOB_HISTORY = int(os.getenv("QUIZ_JOB_HISTORY", "200"))
+JOBS_DB = os.getenv("JOBS_DB", os.path.join("LLMFiles", "jobs.sqlite3"))
+# Running jobs are touched this often; a job whose owner has been silent for
+# three intervals is considered orphaned and may be resumed by another process
+HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "15"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    owner TEXT,
+    heartbeat_at REAL
+)
+"""
+
+
+class QueueFullError(Exception):
+    """Raised when the scheduler cannot accept another job"""
+
+
+class Job:
+    """A single quiz chain submitted through POST /quiz"""
+
+    def __init__(self, url: str, job_id: str = None):
+        self.id = job_id or uuid.uuid4().hex
+        self.url = url
+        self.status = "queued"
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # Set for jobs recovered after a restart: continue from the checkpoint
+        self.resume = False
+
+    @classmethod
+    def from_row(cls, row) -> "Job":
+        job = cls(row["url"], row["id"])
+        for field in ("status", "error", "created_at", "started_at", "finished_at"):
+            setattr(job, field, row[field])
+        return job
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed", "cancelled")
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "url": self.url,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+
+class JobStore:
+    """SQLite table of jobs shared by every worker process"""
+
+    def __init__(self, path: str = JOBS_DB):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(_SCHEMA)
+
+    def save(self, job: Job, owner: str):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.id, job.url, job.status, job.error, job.created_at,
+                 job.started_at, job.finished_at, owner, time.time())
+            )
+
+    def load(self, job_id: str):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row else None
+
+    def heartbeat(self, job_ids: list, owner: str):
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND owner = ?",
+                [(now, job_id, owner) for job_id in job_ids]
+            )
+
+    def release(self, job_ids: list, owner: str):
+        """Make unfinished jobs claimable right away instead of after the heartbeat timeout"""
+        with self._lock:
+            self._db.executemany(
+                "UPDATE jobs SET heartbeat_at = 0 WHERE id = ? AND owner = ?",
+                [(job_id, owner) for job_id in job_ids]
+            )
+
+    def claim_orphans(self, owner: str, stale_after: float) -> list:
+        """
+        Take over unfinished jobs whose owner stopped sending heartbeats
+
+        Returns:
+            The claimed jobs, oldest first
+        """
+        cutoff = time.time() - stale_after
+        claimed = []
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM jobs WHERE status IN ('queued', 'running') AND heartbeat_at < ? ORDER BY created_at",
+                (cutoff,)
+            ).fetchall()
+            for row in rows:
+                # Only one process wins each job, even if several start at once
+                taken = self._db.execute(
+                    "UPDATE jobs SET owner = ?, heartbeat_at = ? WHERE id = ? AND owner IS ? AND heartbeat_at < ?",
+                    (owner, time.time(), row["id"], row["owner"], cutoff)
+                ).rowcount
+                if taken:
+                    claimed.append(Job.from_row(row))
+        return claimed
+
+
+class JobScheduler:
+    """
+    Run quiz chains with bounded concurrency
+
+    Jobs wait in a bounded FIFO queue and are picked up by ``workers``
+    long-running tasks. A URL that is already queued or running is not
+    started twice; the existing job is returned instead.
+
+    With a ``store``, every status change is persisted and ``start`` resumes
+    the jobs a dead process left unfinished. Store reads and writes are
+    SQLite calls that can wait on other processes, so they run in threads.
+    """
+
+    def __init__(self, runner, workers: int = WORKERS, queue_size: int = QUEUE_SIZE, history: int = JOB_HISTORY, store: JobStore = None):
+        """
+        Args:
+            runner: Coroutine function called as
+                ``await runner(url, job_id=..., resume=...)``
+            workers: Number of chains allowed to run at the same time
+            queue_size: Maximum number of jobs waiting to start
+            history: Number of finished jobs kept for status lookups
+            store: Optional JobStore for persistence and recovery
+        """
+        self._runner = runner
+        self._workers = max(1, workers)
+        self._history = history
+        self._store = store
+        self._owner = uuid.uuid4().hex
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._jobs = OrderedDict()
+        self._in_flight = {}
+        self._tasks = []
+        # Status writes run in threads; the lock keeps them in the order they were made
+        self._writes = asyncio.Lock()
+
+    def start(self):
+        """Start the worker tasks on the running event loop and resume orphaned jobs"""
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"quiz-worker-{i}")
+            for i in range(self._workers)
+        ]
+        if self._store is not None:
+            # Orphaned jobs are resumed by the heartbeat task's first round
+            self._tasks.append(asyncio.create_task(self._heartbeat(), name="quiz-heartbeat"))
+        logger.info(f"Started {self._workers} quiz workers")
+
+    async def stop(self):
+        """
+        Cancel the workers, including any chain that is still running
+
+        Unfinished jobs are released in the store, so the next process to
+        start resumes them straight away.
+        """
+        unfinished = [job.id for job in self._in_flight.values()]
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._store is not None:
+            await asyncio.to_thread(self._store.release, unfinished, self._owner)
+
+    async def submit(self, url: str):
+        """
+        Queue a quiz chain
+
+        Returns:
+            Tuple of (job, created). ``created`` is False when the URL was
+            already in flight and the existing job is returned.
+
+        Raises:
+            QueueFullError: If the queue has no free slot
+        """
+        existing = self._in_flight.get(url)
+        if existing is not None:
+            return existing, False
+
+        job = Job(url)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Job queue is full ({self._queue.maxsize} waiting)")
+
+        self._jobs[job.id] = job
+        self._in_flight[url] = job
+        self._prune()
+        await self._persist(job)
+        logger.info(f"Queued job {job.id} for {url}")
+        return job, True
+
+    async def get(self, job_id: str):
+        """Return the job with the given ID, or None"""
+        job = self._jobs.get(job_id)
+        if job is None and self._store is not None:
+            # Finished before a restart, or owned by another worker process
+            job = await asyncio.to_thread(self._store.load, job_id)
+        return job
+
+    def stats(self) -> dict:
+        return {
+            "workers": self._workers,
+            "queued": self._queue.qsize(),
+            "running": sum(1 for job in self._in_flight.values() if job.status == "running")
+        }
+
+    async def _worker(self, index: int):
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            job.started_at = job.started_at or time.time()
+            await self._persist(job)
+            logger.info(f"Worker {index} {'resuming' if job.resume else 'running'} job {job.id}")
+            try:
+                await self._runner(job.url, job_id=job.id, resume=job.resume)
+                job.status = "completed"
+            except asyncio.CancelledError:
+                job.status = "cancelled"
+                raise
+            except Exception as e:
+                logger.exception(f"Job {job.id} failed")
+                job.status = "failed"
+                job.error = str(e)
+            finally:
+                job.finished_at = time.time()
+                self._in_flight.pop(job.url, None)
+                # A cancelled job stays "running" on disk so the next start resumes it
+                if job.status != "cancelled":
+                    await self._persist(job)
+                self._queue.task_done()
+
+    async def _recover(self):
+        for job in await asyncio.to_thread(self._store.claim_orphans, self._owner, 3 * HEARTBEAT_SECONDS):
+            existing = self._in_flight.get(job.url)
+            if existing is not None:
+                # Finish the orphan, or it would be claimed again on every heartbeat
+                job.status = "cancelled"
+                job.error = f"Duplicate of job {existing.id}, already running this URL"
+                job.finished_at = time.time()
+                await self._persist(job)
+                continue
+            job.resume = True
+            try:
+                self._queue.put_nowait(job)
+            except asyncio.QueueFull:
+                job.status = "failed"
+                job.error = "Could not resume after restart: job queue is full"
+                await self._persist(job)
+                continue
+            self._jobs[job.id] = job
+            self._in_flight[job.url] = job
+            logger.info(f"Resuming job {job.id} for {job.url} after restart")
+
+    async def _heartbeat(self):
+        while True:
+            try:
+                await asyncio.to_thread(self._store.heartbeat, [job.id for job in self._in_flight.values()], self._owner)
+                # Jobs of a process that died recently only become orphans later
+                await self._recover()
+            except sqlite3.Error as e:
+                logger.warning(f"Job heartbeat failed: {e}")
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+
+    async def _persist(self, job: Job):
+        if self._store is None:
+            return
+        try:
+            async with self._writes:
+                await asyncio.to_thread(self._store.save, job, self._owner)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not persist job {job.id}: {e}")
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self._history)]:
+            del self._jobs[job_id]
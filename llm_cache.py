@@ -0,0 +1,175 @@
+"""
+LLM Response Cache
+Optional SQLite cache in front of the agent and solver completions, so a
+replayed quiz chain answers from disk instead of waiting on Groq
+
+Keys hash the model, the sampling parameters and a normalized copy of the
+messages: ids, run ids, timings and other values that change between
+otherwise identical runs are dropped first. Entries expire after a TTL and
+the least recently used ones are evicted above a size cap.
+
+Sampled calls (temperature > 0) bypass the cache unless LLM_CACHE_SAMPLED
+is set, because serving them from the cache replaces a fresh sample with
+an old one. Both the agent and the solver sample at temperature 1, so
+replaying a chain needs LLM_CACHE=1 together with LLM_CACHE_SAMPLED=1.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from cache import CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("LLM_CACHE", "0") == "1"
+CACHE_SAMPLED = os.getenv("LLM_CACHE_SAMPLED", "0") == "1"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(CACHE_DIR, "llm.sqlite3"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_MB", "64")) * 1024 * 1024
+
+# Fields of tool results that differ between runs of the same quiz
+VOLATILE_KEYS = {
+    "run_id", "seconds", "elapsed_seconds", "throughput_mb_s", "source", "resumed", "delay"
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+def _strip_volatile(value):
+    if isinstance(value, dict):
+        return {k: _strip_volatile(v) for k, v in value.items() if k not in VOLATILE_KEYS}
+    if isinstance(value, list):
+        return [_strip_volatile(v) for v in value]
+    return value
+
+
+def _normalize_text(text):
+    if not isinstance(text, str):
+        return _strip_volatile(text)
+    stripped = text.strip()
+    if stripped[:1] in ("{", "["):
+        try:
+            return _strip_volatile(json.loads(stripped))
+        except ValueError:
+            pass
+    return " ".join(stripped.split())
+
+
+def normalize_message(message) -> dict:
+    """Role, content and tool calls of a message object or dict, without ids"""
+    if isinstance(message, dict):
+        role = message.get("role") or message.get("type")
+        content = message.get("content")
+        tool_calls = message.get("tool_calls") or []
+        name = message.get("name")
+    else:
+        role = message.type
+        content = message.content
+        tool_calls = getattr(message, "tool_calls", None) or []
+        name = getattr(message, "name", None)
+    normalized = {"role": {"user": "human", "assistant": "ai"}.get(role, role), "content": _normalize_text(content)}
+    if tool_calls:
+        normalized["tool_calls"] = [
+            {"name": call.get("name"), "args": call.get("args")} for call in tool_calls
+        ]
+    if role == "tool" and name:
+        normalized["name"] = name
+    return normalized
+
+
+class LLMCache:
+    """TTL- and size-bounded response cache; safe to share between threads and processes"""
+
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl: float = LLM_CACHE_TTL, max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(_SCHEMA)
+
+    @staticmethod
+    def make_key(model: str, params: dict, messages: list) -> str:
+        raw = json.dumps(
+            [model, params, [normalize_message(m) for m in messages]],
+            sort_keys=True, separators=(",", ":"), default=str
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """Return the stored JSON value, or None if missing or expired"""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] >= self.ttl:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._db.execute("UPDATE responses SET accessed_at = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def put(self, key: str, model: str, value):
+        data = json.dumps(value, default=str)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, value, size, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, data, len(data), now, now)
+            )
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            self._db.execute("DELETE FROM responses WHERE stored_at < ?", (time.time() - self.ttl,))
+            rows = self._db.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+            total = sum(size for _, size in rows)
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                total -= size
+
+
+# -------------------------------------------------
+# PROCESS-WIDE CACHE
+# -------------------------------------------------
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache(temperature: float = 0):
+    """
+    Return the shared cache if it should serve a call at ``temperature``
+
+    Returns:
+        LLMCache, or None when caching is off or the call samples and
+        LLM_CACHE_SAMPLED is not set
+    """
+    global _cache
+    if not ENABLED or (temperature > 0 and not CACHE_SAMPLED):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache(LLM_CACHE_PATH)
+        return _cache
@@ -0,0 +1,109 @@
+"""
+Retry Layer for Groq Calls
+Retries rate limits (429), server errors (5xx) and dropped connections with
+jittered exponential backoff, honouring ``retry-after``. Each call can carry
+the deadline of the quiz it serves; when little time is left, it switches
+to a smaller, faster fallback model instead of waiting for the main one.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+
+from rate_limiter import parse_duration
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "6"))
+BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "1"))
+BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "20"))
+# Each quiz must be answered within this many seconds
+QUIZ_TIME_BUDGET = float(os.getenv("QUIZ_TIME_BUDGET_SECONDS", "180"))
+# Switch to the fallback model once less than this is left before the deadline
+FALLBACK_MARGIN = float(os.getenv("LLM_FALLBACK_MARGIN_SECONDS", "45"))
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+# Raised by the groq SDK (also used by ChatGroq) and httpx for network failures
+RETRYABLE_ERRORS = {
+    "APIConnectionError", "APITimeoutError",
+    "ConnectError", "ReadError", "ReadTimeout", "RemoteProtocolError", "ConnectTimeout", "WriteError"
+}
+
+
+def quiz_deadline(quiz_started: float) -> float:
+    """Wall-clock time by which the quiz started at ``quiz_started`` must be answered"""
+    return quiz_started + QUIZ_TIME_BUDGET
+
+
+def status_code(exc: Exception):
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status
+
+
+def is_retryable(exc: Exception) -> bool:
+    status = status_code(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(exc).__mro__)
+
+
+def retry_after(exc: Exception):
+    """Seconds the server asked us to wait, if it said so"""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    value = headers.get("retry-after")
+    return parse_duration(value) if value else None
+
+
+def backoff_delay(attempt: int, server_delay: float = None) -> float:
+    """Full-jitter exponential backoff, never shorter than ``server_delay``"""
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+    if server_delay:
+        delay = max(delay, server_delay + random.uniform(0, BACKOFF_BASE / 2))
+    return min(delay, max(BACKOFF_MAX, server_delay or 0))
+
+
+async def call_with_retry(call, model: str, fallback_model: str = None, deadline: float = None, max_attempts: int = MAX_ATTEMPTS, what: str = "LLM call"):
+    """
+    Run ``await call(model)`` until it succeeds
+
+    Args:
+        call: Coroutine function taking the model name to use
+        model: Preferred model
+        fallback_model: Smaller model used when the deadline is near
+        deadline: time.time() by which the answer is needed (optional)
+        max_attempts: Attempts before the last error is raised
+        what: Label for log messages
+
+    Returns:
+        Whatever ``call`` returns
+
+    Raises:
+        The last error when it is not retryable or attempts run out
+    """
+    attempt = 0
+    current = model
+    while True:
+        if fallback_model and deadline is not None and deadline - time.time() < FALLBACK_MARGIN:
+            if current != fallback_model:
+                logger.warning(f"{what}: {deadline - time.time():.0f}s left, falling back to {fallback_model}")
+            current = fallback_model
+        try:
+            return await call(current)
+        except Exception as e:
+            attempt += 1
+            if not is_retryable(e) or attempt >= max_attempts:
+                raise
+            delay = backoff_delay(attempt, retry_after(e))
+            left = deadline - time.time() if deadline is not None else None
+            if fallback_model and current != fallback_model and left is not None and left - delay < FALLBACK_MARGIN:
+                # The fallback has its own quota, so there is no reason to wait for the main model
+                logger.warning(f"{what} failed ({e}); {left:.0f}s left, retrying now with {fallback_model}")
+                current = fallback_model
+                delay = random.uniform(0, BACKOFF_BASE / 2)
+            else:
+                logger.warning(f"{what} failed ({e}), retry {attempt}/{max_attempts - 1} in {delay:.1f}s")
+            await asyncio.sleep(delay)
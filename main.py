@@ -1,9 +1,15 @@
-from fastapi import FastAPI, Request, BackgroundTasks
+from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from agent import run_agent
+from agent import checkpointing, run_agent
+from browser_pool import shutdown_pool
+from http_client import close_async_client, http_stats
+from jobs import JobScheduler, JobStore, QueueFullError
+from tools.code_pool import available, get_code_pool, shutdown_code_pool
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
+import asyncio
 import uvicorn
 import os
 import time
@@ -13,7 +19,26 @@ load_dotenv()
 EMAIL = os.getenv("MY_EMAIL")
 SECRET = os.getenv("MY_SECRET")
 
-app = FastAPI()
+# Jobs and graph checkpoints are persisted, so chains cut off by a restart resume
+scheduler = JobScheduler(run_agent, store=JobStore())
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with checkpointing():
+        scheduler.start()
+        if available():
+            # Warm the run_code workers before the first quiz arrives
+            await get_code_pool().start()
+        yield
+        await scheduler.stop()
+    await shutdown_code_pool()
+    await close_async_client()
+    # Close the shared Chromium pool so no browser processes outlive the server
+    await asyncio.to_thread(shutdown_pool)
+
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -29,11 +54,13 @@ def healthz():
     """Simple liveness check."""
     return {
         "status": "ok",
-        "uptime_seconds": int(time.time() - START_TIME)
+        "uptime_seconds": int(time.time() - START_TIME),
+        # Requests, new connections and reuse ratio of the shared HTTP client
+        "http": http_stats()["total"]
     }
 
 @app.post("/quiz")
-async def quiz(request: Request, background_tasks: BackgroundTasks):
+async def quiz(request: Request):
     try:
         data = await request.json()
     except Exception:
@@ -58,10 +85,26 @@ async def quiz(request: Request, background_tasks: BackgroundTasks):
     if email != EMAIL:
         raise HTTPException(status_code=403, detail="Invalid email")
 
-    print("Verified, starting the task...")
-    background_tasks.add_task(run_agent, url)
+    try:
+        job, created = await scheduler.submit(url)
+    except QueueFullError:
+        raise HTTPException(status_code=503, detail="Job queue is full, try again later")
+
+    print("Verified, queued the task..." if created else "Verified, task already in progress...")
+
+    content = {"status": "accepted", "job_id": job.id}
+    if not created:
+        content["duplicate"] = True
+    return JSONResponse(status_code=200, content=content)
+
 
-    return JSONResponse(status_code=200, content={"status": "accepted"})
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """Status of a quiz chain accepted by POST /quiz."""
+    job = await scheduler.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
 
 
 if __name__ == "__main__":
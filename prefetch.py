@@ -0,0 +1,106 @@
+"""
+Quiz Page Prefetch
+Reads each new quiz page before the agent's first turn on it, so the LLM
+starts from the decoded instructions instead of spending turns on loading
+and reading the page
+
+Pages are fetched through the tiered fetcher, so plain HTTP is tried
+first. Most quiz pages carry their instructions as an ``atob(...)``
+payload, which is decoded here without running any JavaScript.
+"""
+
+from bs4 import BeautifulSoup
+from langchain_core.messages import HumanMessage
+from urllib.parse import urljoin
+import asyncio
+import json
+import logging
+import os
+import re
+
+from browser import extract_quiz_details
+from extractor import NON_VISIBLE_TAGS, compact_html
+from fetcher import fetch_page
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_TIMEOUT = float(os.getenv("PREFETCH_TIMEOUT_SECONDS", "20"))
+MAX_DATA_LINKS = 20
+
+URL_PATTERN = re.compile(r"https?://[^\s\"'<>`)\]]+")
+PREFETCH_HEADER = "Prefetched quiz page"
+
+
+def _links(html: str, base_url: str) -> list:
+    soup = BeautifulSoup(html, "html.parser")
+    links = [a["href"] for a in soup.find_all("a", href=True)]
+    links += [s["src"] for s in soup.find_all(["script", "img", "audio", "source"], src=True)]
+    for tag in soup.find_all(NON_VISIBLE_TAGS):
+        tag.decompose()
+    links += URL_PATTERN.findall(soup.get_text(" "))
+    return [urljoin(base_url, link.rstrip(".,;")) for link in links if not link.startswith(("#", "javascript:", "mailto:"))]
+
+
+async def summarize_quiz(html: str, url: str) -> dict:
+    """
+    Structured summary of a quiz page
+
+    Returns:
+        Dict with ``question`` (compact page text, including decoded
+        payloads), ``submit_url`` and ``data_links`` (absolute URLs of
+        files, scripts and pages the question refers to)
+    """
+    details = await extract_quiz_details(html)
+    question = await asyncio.to_thread(compact_html, html, url)
+
+    # In a fixed order, so the prefetch message is the same on every run
+    links = []
+    decoded = details["decoded_html"]
+    for fragment in (html,) if not decoded or decoded == html else (html, decoded):
+        links += await asyncio.to_thread(_links, fragment, url)
+
+    submit_url = details.get("submit_url")
+    submit_url = urljoin(url, submit_url) if submit_url else next((link for link in links if "/submit" in link), None)
+
+    data_links = []
+    for link in links:
+        if link not in data_links and link not in (url, submit_url):
+            data_links.append(link)
+
+    return {
+        "question": question,
+        "submit_url": submit_url,
+        "data_links": data_links[:MAX_DATA_LINKS]
+    }
+
+
+async def prefetch_quiz(url: str, deadline: float = None):
+    """
+    Fetch and summarize a quiz page
+
+    Args:
+        url: Quiz page URL
+        deadline: Quiz deadline that caps how long a render may wait
+
+    Returns:
+        The summarize_quiz dict plus ``fetched_via``, or None if the page
+        could not be loaded in time; the agent then reads it itself
+    """
+    try:
+        page = await asyncio.wait_for(fetch_page(url, deadline=deadline), PREFETCH_TIMEOUT)
+        summary = await summarize_quiz(page["html"], url)
+    except Exception as e:
+        logger.warning(f"Prefetch of {url} failed, leaving it to the agent: {e!r}")
+        return None
+    summary["fetched_via"] = page["tier"]
+    logger.info(f"Prefetched {url} via {page['tier']}: submit_url={summary['submit_url']}, {len(summary['data_links'])} links")
+    return summary
+
+
+def prefetch_message(url: str, summary: dict) -> HumanMessage:
+    """Message handed to the agent before its first turn on a quiz"""
+    body = {k: summary[k] for k in ("question", "submit_url", "data_links")}
+    return HumanMessage(
+        content=f"{PREFETCH_HEADER} ({url}), already loaded and decoded for you:\n"
+                f"```json\n{json.dumps(body, indent=2)}\n```"
+    )
@@ -0,0 +1,267 @@
+"""
+Shared Groq Rate Limiter
+One request-per-minute and one token-per-minute bucket per model, kept in
+a small state file under LLMFiles so every uvicorn worker and every caller
+(agent and solver) draws from the same quota
+
+Buckets refill continuously. A caller that has to wait sleeps exactly
+until enough capacity is back instead of polling. The ``x-ratelimit-*``
+headers of each Groq response, and ``retry-after`` on a 429, correct the
+local estimate.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+from tracing import span
+
+try:
+    import fcntl
+except ImportError:  # Windows: the lock only covers this process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+REQUESTS_PER_MINUTE = float(os.getenv("GROQ_RPM", "30"))
+TOKENS_PER_MINUTE = float(os.getenv("GROQ_TPM", "6000"))
+STATE_PATH = os.getenv("GROQ_RATE_STATE", os.path.join("LLMFiles", ".groq_rate_limit.json"))
+# Extra sleep so processes woken for the same capacity do not all retry at once
+WAKE_JITTER = 0.02
+
+_DURATION = re.compile(r"([\d.]+)(ms|h|m|s)")
+_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value: str) -> float:
+    """Parse Groq reset values such as ``"2m59.56s"``, ``"7.66s"`` or ``"120ms"``"""
+    if not value:
+        return 0.0
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    return sum(float(n) * _UNITS[unit] for n, unit in _DURATION.findall(value))
+
+
+class GroqRateLimiter:
+    """
+    Cross-process RPM + TPM token buckets
+
+    Every method holds an exclusive ``flock`` on the state file only while
+    it reads and rewrites the few bytes of state, never while sleeping.
+    """
+
+    def __init__(self, path: str = STATE_PATH, rpm: float = REQUESTS_PER_MINUTE, tpm: float = TOKENS_PER_MINUTE):
+        self.path = path
+        self.rpm = rpm
+        self.tpm = tpm
+        self._thread_lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    # -------------------------------------------------
+    # ACQUIRING
+    # -------------------------------------------------
+    async def acquire(self, model: str, tokens: int = 0) -> float:
+        """
+        Wait until ``model`` has room for one request of about ``tokens`` tokens
+
+        An estimate above the bucket's capacity (e.g. a long history with the
+        default GROQ_TPM) is charged as one full bucket, so it waits for a
+        full minute's budget at most instead of forever.
+
+        Returns:
+            Tokens actually charged; pass them to ``record_usage`` as the
+            estimate once the real count is known
+        """
+        started = time.monotonic()
+        with span("rate_limiter.acquire", "rate_limit", model=model, tokens=tokens) as current:
+            while True:
+                # The state file is flock'ed and rewritten, keep that off the loop
+                wait, charged = await asyncio.to_thread(self._try_take, model, tokens)
+                if wait <= 0:
+                    waited = time.monotonic() - started
+                    current.set(waited_seconds=round(waited, 3), charged_tokens=charged)
+                    if waited > 0.5:
+                        logger.info(f"Rate limit for {model}: waited {waited:.1f}s")
+                    return charged
+                await asyncio.sleep(wait + random.uniform(0, WAKE_JITTER))
+
+    def _try_take(self, model: str, tokens: int) -> tuple:
+        """
+        Take capacity if there is enough
+
+        Returns:
+            Tuple of (seconds to wait, 0 if taken; tokens charged)
+        """
+        with self._locked() as state:
+            now = time.time()
+            bucket = self._refill(state, model, now)
+            tokens = min(tokens, bucket["tpm"])
+            waits = [
+                bucket["blocked_until"] - now,
+                (1 - bucket["requests"]) * 60 / bucket["rpm"],
+                (tokens - bucket["tokens"]) * 60 / bucket["tpm"],
+            ]
+            wait = max(waits)
+            if wait <= 0:
+                bucket["requests"] -= 1
+                bucket["tokens"] -= tokens
+            return wait, tokens
+
+    # -------------------------------------------------
+    # FEEDBACK FROM RESPONSES
+    # -------------------------------------------------
+    def record_usage(self, model: str, estimated: float, actual: int):
+        """
+        Charge the difference once the real token count of a request is known
+
+        Blocking (file lock); call through asyncio.to_thread from a loop.
+
+        Args:
+            estimated: What ``acquire`` returned, i.e. the clamped charge
+            actual: Real total token count, or None if unknown
+        """
+        if actual is None or actual == estimated:
+            return
+        with self._locked() as state:
+            bucket = self._refill(state, model, time.time())
+            bucket["tokens"] -= actual - estimated
+
+    def update_from_headers(self, model: str, status_code: int, headers):
+        """
+        Sync the buckets with what Groq reports
+
+        ``x-ratelimit-*-tokens`` describe the per-minute token budget and
+        ``x-ratelimit-*-requests`` the daily request budget.
+        """
+        headers = {k.lower(): v for k, v in headers.items()}
+        if not any(k.startswith("x-ratelimit-") or k == "retry-after" for k in headers):
+            return
+        with self._locked() as state:
+            now = time.time()
+            bucket = self._refill(state, model, now)
+            try:
+                if "x-ratelimit-limit-tokens" in headers:
+                    bucket["tpm"] = max(1.0, float(headers["x-ratelimit-limit-tokens"]))
+                if "x-ratelimit-remaining-tokens" in headers:
+                    bucket["tokens"] = min(bucket["tokens"], float(headers["x-ratelimit-remaining-tokens"]))
+                if headers.get("x-ratelimit-remaining-requests") == "0":
+                    reset = parse_duration(headers.get("x-ratelimit-reset-requests"))
+                    bucket["blocked_until"] = max(bucket["blocked_until"], now + reset)
+                if status_code == 429:
+                    retry_after = parse_duration(headers.get("retry-after")) or 1.0
+                    bucket["blocked_until"] = max(bucket["blocked_until"], now + retry_after)
+                    logger.warning(f"Groq returned 429 for {model}, pausing {retry_after:.1f}s")
+            except ValueError as e:
+                logger.debug(f"Ignoring malformed rate limit header: {e}")
+
+    def response_hook(self, response):
+        """httpx response event hook: feed rate limit headers back into the limiter"""
+        self.update_from_headers(_request_model(response.request), response.status_code, response.headers)
+
+    async def async_response_hook(self, response):
+        await asyncio.to_thread(self.response_hook, response)
+
+    # -------------------------------------------------
+    # STATE FILE
+    # -------------------------------------------------
+    def _refill(self, state: dict, model: str, now: float) -> dict:
+        bucket = state.setdefault(model, {
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "requests": self.rpm,
+            "tokens": self.tpm,
+            "blocked_until": 0.0,
+            "updated": now
+        })
+        elapsed = max(0.0, now - bucket["updated"])
+        bucket["requests"] = min(bucket["rpm"], bucket["requests"] + elapsed * bucket["rpm"] / 60)
+        bucket["tokens"] = min(bucket["tpm"], bucket["tokens"] + elapsed * bucket["tpm"] / 60)
+        bucket["updated"] = now
+        return bucket
+
+    def _locked(self):
+        return _LockedState(self.path, self._thread_lock)
+
+
+class _LockedState:
+    """Context manager yielding the state dict under an exclusive lock, written back on exit"""
+
+    def __init__(self, path: str, thread_lock: threading.Lock):
+        self.path = path
+        self.thread_lock = thread_lock
+        self.file = None
+
+    def __enter__(self) -> dict:
+        self.thread_lock.acquire()
+        try:
+            self.file = open(self.path, "a+", encoding="utf-8")
+            if fcntl is not None:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+            self.file.seek(0)
+            raw = self.file.read()
+            try:
+                self.state = json.loads(raw) if raw else {}
+            except ValueError:
+                logger.warning(f"Resetting corrupt rate limit state in {self.path}")
+                self.state = {}
+            return self.state
+        except BaseException:
+            self._close()
+            raise
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.file.seek(0)
+                self.file.truncate()
+                self.file.write(json.dumps(self.state))
+                self.file.flush()
+        finally:
+            self._close()
+
+    def _close(self):
+        try:
+            if self.file is not None:
+                if fcntl is not None:
+                    fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+                self.file.close()
+        finally:
+            self.file = None
+            self.thread_lock.release()
+
+
+def _request_model(request) -> str:
+    try:
+        return json.loads(request.content).get("model") or "default"
+    except Exception:
+        return "default"
+
+
+# -------------------------------------------------
+# PROCESS-WIDE LIMITER
+# -------------------------------------------------
+_limiter = None
+
+
+def get_limiter() -> GroqRateLimiter:
+    """Return the shared limiter, creating it on first use"""
+    global _limiter
+    if _limiter is None:
+        _limiter = GroqRateLimiter()
+    return _limiter
+
+
+def async_http_client():
+    """httpx.AsyncClient for Groq SDK / ChatGroq calls that reports headers to the limiter"""
+    import httpx
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(120, connect=10),
+        event_hooks={"response": [get_limiter().async_response_hook]}
+    )
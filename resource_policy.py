@@ -0,0 +1,170 @@
+"""
+Resource Blocking for Browser Renders
+Route interception that keeps Chromium from downloading what a render
+never reads: images, fonts, media, stylesheets and known trackers. Only
+the DOM and its text are used, so none of these change the result.
+
+Aborted requests never transfer a byte, so their size cannot be measured.
+Blocked bytes are estimated from typical per-type sizes, and from
+Content-Length where the same URL was already seen loading in this process.
+"""
+
+from urllib.parse import urlsplit
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def _csv(value: str) -> tuple:
+    return tuple(part.strip().lower() for part in value.split(",") if part.strip())
+
+
+# Playwright resource types; "document", "script", "xhr" and "fetch" carry the page itself
+BLOCK_TYPES = _csv(os.getenv("RENDER_BLOCK_TYPES", "image,font,media,stylesheet"))
+TRACKER_HOSTS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "facebook.net", "connect.facebook.com", "hotjar.com", "segment.io", "segment.com",
+    "mixpanel.com", "clarity.ms", "sentry.io", "newrelic.com", "nr-data.net", "plausible.io"
+)
+BLOCK_HOSTS = TRACKER_HOSTS + _csv(os.getenv("RENDER_BLOCK_HOSTS", ""))
+
+# Rough size of one request of each type, only used when nothing better is known
+TYPICAL_BYTES = {"image": 40_000, "font": 30_000, "media": 500_000, "stylesheet": 20_000}
+DEFAULT_BYTES = 10_000
+
+# Content-Length of URLs seen loading, so later blocks of the same URL are exact
+_known_sizes = {}
+_sizes_lock = threading.Lock()
+MAX_KNOWN_SIZES = 5000
+
+
+def _host_matches(host: str, patterns) -> bool:
+    return any(host == p or host.endswith("." + p) for p in patterns)
+
+
+class ResourcePolicy:
+    """
+    Which requests of a render are aborted, by resource type and host
+
+    A request is blocked when its host is in ``block_hosts`` or its type is
+    in ``block_types``, unless its host is in ``allow_hosts``. Hosts match
+    their subdomains too.
+    """
+
+    def __init__(self, block_types=BLOCK_TYPES, block_hosts=BLOCK_HOSTS, allow_hosts=()):
+        self.block_types = frozenset(block_types)
+        self.block_hosts = tuple(block_hosts)
+        self.allow_hosts = tuple(allow_hosts)
+
+    def override(self, block_types=(), allow_types=(), block_hosts=(), allow_hosts=()) -> "ResourcePolicy":
+        """Copy of this policy with types and hosts added to or taken out of the block lists"""
+        return ResourcePolicy(
+            block_types=(self.block_types | set(block_types)) - set(allow_types),
+            block_hosts=self.block_hosts + tuple(block_hosts),
+            allow_hosts=self.allow_hosts + tuple(allow_hosts)
+        )
+
+    def blocks(self, resource_type: str, url: str) -> bool:
+        host = (urlsplit(url).hostname or "").lower()
+        if _host_matches(host, self.allow_hosts):
+            return False
+        return resource_type in self.block_types or _host_matches(host, self.block_hosts)
+
+    async def install(self, page) -> "BlockStats":
+        """Route every request of ``page`` through this policy; returns the live counters"""
+        stats = BlockStats()
+
+        async def handle(route):
+            request = route.request
+            if request.url.startswith("data:") or not self.blocks(request.resource_type, request.url):
+                await route.continue_()
+                return
+            stats.block(request.resource_type, request.url)
+            logger.debug(f"Blocked {request.resource_type} {request.url}")
+            await route.abort("blockedbyclient")
+
+        def on_response(response):
+            stats.loaded(response.url, response.headers.get("content-length"))
+
+        await page.route("**/*", handle)
+        page.on("response", on_response)
+        return stats
+
+
+class BlockStats:
+    """Requests and bytes blocked or loaded during one render"""
+
+    def __init__(self):
+        self.requests = 0
+        self.blocked = 0
+        self.blocked_bytes = 0
+        self.loaded_bytes = 0
+        self.by_type = {}
+
+    def block(self, resource_type: str, url: str):
+        self.requests += 1
+        self.blocked += 1
+        self.by_type[resource_type] = self.by_type.get(resource_type, 0) + 1
+        with _sizes_lock:
+            size = _known_sizes.get(url)
+        self.blocked_bytes += size if size is not None else TYPICAL_BYTES.get(resource_type, DEFAULT_BYTES)
+
+    def loaded(self, url: str, content_length):
+        self.requests += 1
+        try:
+            size = int(content_length)
+        except (TypeError, ValueError):
+            return
+        self.loaded_bytes += size
+        with _sizes_lock:
+            if len(_known_sizes) < MAX_KNOWN_SIZES:
+                _known_sizes[url] = size
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "blocked": self.blocked,
+            "blocked_by_type": dict(self.by_type),
+            "blocked_bytes_estimate": self.blocked_bytes,
+            "loaded_bytes": self.loaded_bytes
+        }
+
+
+DEFAULT_POLICY = ResourcePolicy()
+# For renders that need every resource the page references
+ALLOW_ALL = ResourcePolicy(block_types=(), block_hosts=())
+
+RESOURCE_TYPES = (
+    "document", "stylesheet", "image", "media", "font", "script", "texttrack",
+    "xhr", "fetch", "eventsource", "websocket", "manifest", "other"
+)
+
+
+def allowing(allow: str, policy: ResourcePolicy = DEFAULT_POLICY) -> ResourcePolicy:
+    """
+    Policy for a render that needs some blocked resources after all
+
+    Args:
+        allow: Comma-separated resource types (e.g. "image,font") and/or
+            hosts (e.g. "cdn.example.com"); "all" turns blocking off
+        policy: Policy to relax
+
+    Returns:
+        ``policy`` itself when ``allow`` is empty
+
+    Raises:
+        ValueError: For an entry that is neither a resource type nor a host
+    """
+    entries = _csv(allow or "")
+    if not entries:
+        return policy
+    if "all" in entries:
+        return ALLOW_ALL
+    types = [e for e in entries if e in RESOURCE_TYPES]
+    hosts = [e for e in entries if e not in RESOURCE_TYPES]
+    unknown = [h for h in hosts if "." not in h and h != "localhost"]
+    if unknown:
+        raise ValueError(f"Unknown resource type {unknown[0]!r}, expected one of {', '.join(RESOURCE_TYPES)} or a host")
+    return policy.override(allow_types=types, allow_hosts=hosts)
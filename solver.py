@@ -2,11 +2,20 @@
 LLM-powered Solver that generates Python code to solve quiz questions
 """
 
-from groq import Groq
+from groq import AsyncGroq
+from llm_cache import get_llm_cache
+from llm_retry import call_with_retry
+from rate_limiter import async_http_client, get_limiter
+from tracing import span, traced
+import asyncio
 import os
 import logging
 import json
 import re
+import shutil
+import sys
+import tempfile
+import time
 from typing import Any
 
 logger = logging.getLogger(__name__)
@@ -18,6 +27,30 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 if not GROQ_API_KEY:
     raise ValueError("GROQ_API_KEY environment variable is not set")
 
+MODEL = "openai/gpt-oss-120b"
+TEMPERATURE = 1
+# Smaller, faster model used when a quiz is close to its deadline
+FALLBACK_MODEL = os.getenv("SOLVER_FALLBACK_MODEL", "openai/gpt-oss-20b")
+# Completion tokens reserved with the rate limiter before the real count is known
+EXPECTED_OUTPUT_TOKENS = 2048
+MAX_CONCURRENT_EXECUTIONS = int(os.getenv("SOLVER_MAX_CONCURRENT_EXEC", "4"))
+MAX_OUTPUT_BYTES = int(os.getenv("SOLVER_MAX_OUTPUT_BYTES", str(1024 * 1024)))
+# Code candidates generated and executed per question by solve_with_candidates
+CANDIDATES = int(os.getenv("SOLVER_CANDIDATES", "3"))
+
+_exec_semaphore = asyncio.Semaphore(MAX_CONCURRENT_EXECUTIONS)
+_client = None
+
+
+def get_client() -> AsyncGroq:
+    """Shared Groq client, so every call reuses the same connection pool"""
+    global _client
+    if _client is None:
+        # The client reports x-ratelimit-* headers to the shared limiter;
+        # retries are left to llm_retry, which knows the quiz deadline
+        _client = AsyncGroq(api_key=GROQ_API_KEY, http_client=async_http_client(), max_retries=0)
+    return _client
+
 
 SOLVER_SYSTEM_PROMPT = """You are an expert Python data analyst and automation engineer. Your task is to analyze quiz questions and write Python code to solve them.
 
@@ -127,14 +160,26 @@ print(f"data:image/png;base64,{img_base64}")
 Now, given the question below, write the complete Python code to solve it."""
 
 
-async def solve_with_llm(question: str, quiz_details: dict, feedback: str = None) -> str:
+@traced("solver.generate", "solve")
+async def solve_with_llm(question: str, quiz_details: dict, feedback: str = None, metrics: dict = None, deadline: float = None, sample: int = 0) -> str:
     """
     Use LLM to generate Python code that solves the quiz question
 
+    The completion is streamed and reading stops as soon as the first
+    Python code block is closed.
+
     Args:
         question: The quiz question text
         quiz_details: Additional context (HTML, URLs, etc.)
         feedback: Feedback from previous failed attempt (optional)
+        metrics: Optional dict filled with streaming timings
+            (time_to_first_token_ms, time_to_code_ms, chunks, early_stop)
+            and token counts (prompt_tokens, completion_tokens,
+            tokens_estimated), plus the model that answered
+        deadline: time.time() by which the quiz must be answered (optional);
+            see llm_retry.quiz_deadline
+        sample: Index of this sample among parallel candidates, which keeps
+            their entries apart in the LLM cache
 
     Returns:
         Python code as string
@@ -160,31 +205,96 @@ Generate the Python code to solve this question. Remember to:
 3. Process the data appropriately
 4. Print ONLY the final answer in the correct format"""
 
+    limiter = get_limiter()
+    expected = (len(SOLVER_SYSTEM_PROMPT) + len(user_prompt)) // 4 + EXPECTED_OUTPUT_TOKENS
+
+    messages = [
+        {"role": "system", "content": SOLVER_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
+    cache = await asyncio.to_thread(get_llm_cache, TEMPERATURE)
+
+    async def stream(model: str):
+        if cache is not None:
+            key = cache.make_key(model, {"temperature": TEMPERATURE, "sample": sample}, messages)
+            cached = await asyncio.to_thread(cache.get, key)
+            if cached is not None:
+                # Nothing was sent to Groq, so the replay costs no tokens
+                return cached["text"], {**cached["timings"], "prompt_tokens": 0, "completion_tokens": 0, "cached": True}
+
+        charged = await limiter.acquire(model, expected)
+        with span("llm.call", "llm", model=model, sample=sample) as current:
+            started = time.perf_counter()
+            completion = await get_client().chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=TEMPERATURE,
+                max_completion_tokens=8192,
+                top_p=1,
+                reasoning_effort="medium",
+                stream=True,
+                stop=None
+            )
+
+            parts = []
+            watcher = CodeFenceWatcher()
+            first_token = None
+            early_stop = False
+            chunks = 0
+            usage = None
+            async for chunk in completion:
+                chunks += 1
+                # Groq reports usage on the last chunk, which an early stop never reads
+                x_groq = getattr(chunk, "x_groq", None)
+                usage = getattr(x_groq, "usage", None) or getattr(chunk, "usage", None) or usage
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                if first_token is None:
+                    first_token = time.perf_counter()
+                parts.append(delta)
+                if watcher.feed(delta):
+                    # The first code block is complete, the rest is commentary
+                    early_stop = True
+                    break
+            if early_stop:
+                await completion.close()
+            current.set(chunks=chunks, early_stop=early_stop)
+        code_ready = time.perf_counter()
+
+        text = "".join(parts)
+        timings = {
+            "model": model,
+            "time_to_first_token_ms": round((first_token - started) * 1000) if first_token else None,
+            "time_to_code_ms": round((code_ready - started) * 1000),
+            "chunks": chunks,
+            "early_stop": early_stop
+        }
+        if usage is not None:
+            timings["prompt_tokens"] = usage.prompt_tokens
+            timings["completion_tokens"] = usage.completion_tokens
+            timings["tokens_estimated"] = False
+            await asyncio.to_thread(limiter.record_usage, model, charged, usage.total_tokens)
+        else:
+            # Rough estimate (~4 characters per token); hidden reasoning tokens are not counted
+            timings["prompt_tokens"] = (len(SOLVER_SYSTEM_PROMPT) + len(user_prompt)) // 4
+            timings["completion_tokens"] = len(text) // 4
+            timings["tokens_estimated"] = True
+        if cache is not None:
+            await asyncio.to_thread(cache.put, key, model, {"text": text, "timings": timings})
+        return text, timings
+
     try:
-        # Initialize Groq client
-        client = Groq(api_key=GROQ_API_KEY)
-
-        completion = client.chat.completions.create(
-            model="openai/gpt-oss-120b",
-            messages=[
-                {"role": "system", "content": SOLVER_SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=1,
-            max_completion_tokens=8192,
-            top_p=1,
-            reasoning_effort="medium",
-            stream=True,
-            stop=None
-        )
-
-        code = ""
-        for chunk in completion:
-            code += chunk.choices[0].delta.content or ""
+        # Rate limits, 5xx and dropped streams are retried; near the deadline
+        # the smaller fallback model takes over
+        text, timings = await call_with_retry(stream, MODEL, FALLBACK_MODEL, deadline, what="Solver completion")
 
         # Extract code from markdown code blocks if present
-        code = extract_code_from_markdown(code)
+        code = extract_code_from_markdown(text)
 
+        if metrics is not None:
+            metrics.update(timings)
+        logger.info(f"Code ready in {timings['time_to_code_ms']} ms (model: {timings['model']}, early stop: {timings['early_stop']})")
         logger.info(f"Generated code:\n{code}")
 
         return code
@@ -194,24 +304,81 @@ Generate the Python code to solve this question. Remember to:
         raise
 
 
-def extract_code_from_markdown(text: str) -> str:
-    """Extract Python code from markdown code blocks"""
-    # Look for ```python ... ``` blocks
-    pattern = r'```(?:python)?\s*\n(.*?)```'
-    matches = re.findall(pattern, text, re.DOTALL)
+PYTHON_FENCE_INFO = ("", "python", "py", "python3")
+# A fence opens with ``` and its info string and closes with ``` at the start of a line
+CODE_BLOCK_PATTERN = re.compile(r"```([^\n]*)\n(.*?)(?<=\n)```", re.DOTALL)
+
+
+def is_python_fence(info: str) -> bool:
+    """Whether a code fence info string (the text after ```) marks Python"""
+    return info.strip().lower() in PYTHON_FENCE_INFO
+
+
+class CodeFenceWatcher:
+    """
+    Incrementally detect when the first Python code block in a stream closes
+
+    Only the new chunk and a few carried-over characters are scanned per
+    call, so watching a long completion stays linear in its length. Fences
+    are read the same way as in :func:`extract_code_from_markdown`.
+    """
 
-    if matches:
-        # Return the first code block found
-        return matches[0].strip()
-    else:
-        # If no code blocks, return the text as-is
-        return text.strip()
+    def __init__(self):
+        self._state = "text"
+        self._info = ""
+        self._carry = ""
+
+    def feed(self, chunk: str) -> bool:
+        """Return True once a ```python block has been closed"""
+        data = self._carry + chunk
+        i = 0
+        while True:
+            if self._state == "text":
+                j = data.find("```", i)
+                if j < 0:
+                    break
+                self._state, self._info, i = "info", "", j + 3
+            elif self._state == "info":
+                j = data.find("\n", i)
+                if j < 0:
+                    self._info += data[i:]
+                    i = len(data)
+                    break
+                self._info += data[i:j]
+                self._state, i = ("code" if is_python_fence(self._info) else "other"), j
+            else:
+                j = data.find("\n```", i)
+                if j < 0:
+                    break
+                if self._state == "code":
+                    return True
+                self._state, i = "text", j + 4
+        # Keep enough unscanned characters to match a fence split across chunks
+        self._carry = data[max(i, len(data) - 3):]
+        return False
 
 
+def extract_code_from_markdown(text: str) -> str:
+    """Extract the first Python code block, skipping blocks in other languages"""
+    for match in CODE_BLOCK_PATTERN.finditer(text):
+        if is_python_fence(match.group(1)):
+            return match.group(2).strip()
+    # If no Python code block, return the text as-is
+    return text.strip()
+
+
+@traced("solver.execute", "code")
 async def execute_code(code: str, timeout: int = 120) -> Any:
     """
     Execute the generated Python code and capture output
 
+    Runs in an asyncio subprocess, so the event loop keeps serving other
+    requests. At most SOLVER_MAX_CONCURRENT_EXEC scripts run at once, output
+    is capped at SOLVER_MAX_OUTPUT_BYTES per stream, and the process is
+    killed on timeout or if the calling task is cancelled. Every run gets
+    its own scratch directory as cwd, so candidates running in parallel
+    never see each other's relative files (``data.csv`` and the like).
+
     Args:
         code: Python code to execute
         timeout: Maximum execution time in seconds
@@ -221,67 +388,269 @@ async def execute_code(code: str, timeout: int = 120) -> Any:
     """
     logger.info("Executing generated code")
 
-    import subprocess
-    import tempfile
-    import os
-
-    # Create a temporary file for the code
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False, encoding='utf-8') as f:
+    # A private scratch directory holding the script and whatever it writes
+    workdir = tempfile.mkdtemp(prefix="solver-")
+    temp_file = os.path.join(workdir, "solution.py")
+    with open(temp_file, 'w', encoding='utf-8') as f:
         f.write(code)
-        temp_file = f.name
 
     try:
-        # Execute the code in a subprocess for isolation
-        result = subprocess.run(
-            ['python', temp_file],
-            capture_output=True,
-            text=True,
-            timeout=timeout,
-            cwd=os.path.dirname(temp_file)
-        )
-
-        # Clean up temp file
-        os.unlink(temp_file)
-
-        if result.returncode != 0:
-            logger.error(f"Code execution failed: {result.stderr}")
-            raise Exception(f"Code execution error: {result.stderr}")
+        async with _exec_semaphore:
+            # Execute the code in a subprocess for isolation
+            proc = await asyncio.create_subprocess_exec(
+                sys.executable, temp_file,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=workdir
+            )
+            try:
+                stdout, stderr, _ = await asyncio.wait_for(
+                    asyncio.gather(_read_capped(proc.stdout), _read_capped(proc.stderr), proc.wait()),
+                    timeout
+                )
+            except asyncio.TimeoutError:
+                logger.error(f"Code execution timed out after {timeout} seconds")
+                await _kill(proc)
+                raise Exception("Code execution timeout")
+            except asyncio.CancelledError:
+                await _kill(proc)
+                raise
+
+        if proc.returncode != 0:
+            logger.error(f"Code execution failed: {stderr}")
+            raise Exception(f"Code execution error: {stderr}")
 
         # Get the output
-        output = result.stdout.strip()
+        output = stdout.strip()
         logger.info(f"Code output: {output}")
 
-        # Try to parse as JSON if it looks like JSON
-        if output.startswith('{') or output.startswith('['):
-            try:
-                return json.loads(output)
-            except:
-                pass
+        return parse_output(output)
 
-        # Try to parse as number
-        try:
-            # Try int first
-            return int(output)
-        except:
-            try:
-                # Try float
-                return float(output)
-            except:
-                pass
-
-        # Try to parse as boolean
-        if output.lower() in ('true', 'false'):
-            return output.lower() == 'true'
-
-        # Return as string
-        return output
-
-    except subprocess.TimeoutExpired:
-        logger.error(f"Code execution timed out after {timeout} seconds")
-        os.unlink(temp_file)
-        raise Exception("Code execution timeout")
     except Exception as e:
         logger.error(f"Error executing code: {e}")
-        if os.path.exists(temp_file):
-            os.unlink(temp_file)
         raise
+    finally:
+        await asyncio.to_thread(shutil.rmtree, workdir, True)
+
+
+def parse_output(output: str) -> Any:
+    """Turn printed output into JSON, a number, a boolean or a plain string"""
+    # Try to parse as JSON if it looks like JSON
+    if output.startswith('{') or output.startswith('['):
+        try:
+            return json.loads(output)
+        except:
+            pass
+
+    # Try to parse as number
+    try:
+        # Try int first
+        return int(output)
+    except:
+        try:
+            # Try float
+            return float(output)
+        except:
+            pass
+
+    # Try to parse as boolean
+    if output.lower() in ('true', 'false'):
+        return output.lower() == 'true'
+
+    # Return as string
+    return output
+
+
+async def _read_capped(stream, limit: int = None) -> str:
+    """Read a whole stream but keep at most ``limit`` bytes of it"""
+    limit = MAX_OUTPUT_BYTES if limit is None else limit
+    kept = bytearray()
+    dropped = 0
+    while True:
+        chunk = await stream.read(65536)
+        if not chunk:
+            break
+        room = limit - len(kept)
+        kept += chunk[:room]
+        dropped += max(0, len(chunk) - room)
+    text = kept.decode("utf-8", errors="replace")
+    if dropped:
+        text += f"\n... [output truncated: {dropped} bytes omitted]"
+    return text
+
+
+async def _kill(proc):
+    if proc.returncode is None:
+        proc.kill()
+    await proc.wait()
+
+
+@traced("solver.solve", "solve")
+async def solve_with_candidates(question: str, quiz_details: dict, feedback: str = None, k: int = None, stats: "SolverStats" = None, deadline: float = None) -> dict:
+    """
+    Generate ``k`` code candidates at once, run them in parallel and vote
+
+    Candidates are independent samples (temperature 1), so a wrong script
+    is usually outvoted by the ones that agree. As soon as one answer holds
+    a strict majority of ``k`` the remaining candidates are cancelled and
+    their processes killed.
+
+    Args:
+        question: The quiz question text
+        quiz_details: Additional context (HTML, URLs, etc.)
+        feedback: Feedback from previous failed attempt (optional)
+        k: Number of candidates (defaults to SOLVER_CANDIDATES)
+        stats: Optional SolverStats that records this question
+        deadline: time.time() by which the quiz must be answered (optional)
+
+    Returns:
+        Dict with the winning ``answer`` and its ``code``, the ``votes`` it
+        got, ``agreement`` (votes / successful candidates), ``alternatives``
+        (the other answers, most votes first, worth trying before asking
+        the LLM again), ``wall_seconds``, ``prompt_tokens``,
+        ``completion_tokens`` and per-candidate ``candidates`` details
+
+    Raises:
+        Exception: If no candidate produced an answer
+    """
+    k = max(1, k or CANDIDATES)
+    logger.info(f"Solving with {k} candidates")
+    started = time.perf_counter()
+
+    async def candidate(index: int) -> dict:
+        metrics = {}
+        info = {"index": index, "metrics": metrics}
+        try:
+            info["code"] = await solve_with_llm(question, quiz_details, feedback, metrics, deadline, index)
+            info["answer"] = await execute_code(info["code"])
+        except Exception as e:
+            info["error"] = str(e)
+        return info
+
+    tasks = [asyncio.create_task(candidate(i)) for i in range(k)]
+    finished = []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            finished.append(await next_done)
+            ranking = vote([c["answer"] for c in finished if "error" not in c])
+            if ranking and ranking[0]["votes"] > k // 2:
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    ok = [c for c in finished if "error" not in c]
+    ranking = vote([c["answer"] for c in ok])
+    result = {
+        "wall_seconds": round(time.perf_counter() - started, 3),
+        "prompt_tokens": sum(c["metrics"].get("prompt_tokens", 0) for c in finished),
+        "completion_tokens": sum(c["metrics"].get("completion_tokens", 0) for c in finished),
+        "candidates": [
+            {"index": c["index"], "answer": c.get("answer"), "error": c.get("error"), **c["metrics"]}
+            for c in finished
+        ],
+        "cancelled": k - len(finished)
+    }
+    if stats is not None:
+        stats.record_solve(result, retry=feedback is not None)
+    if not ranking:
+        errors = "; ".join(c["error"] for c in finished)
+        raise Exception(f"All {k} candidates failed: {errors}")
+
+    best = ranking[0]
+    result.update({
+        "answer": best["answer"],
+        "code": next(c["code"] for c in ok if answer_key(c["answer"]) == best["key"]),
+        "votes": best["votes"],
+        "agreement": round(best["votes"] / len(ok), 3),
+        "alternatives": [r["answer"] for r in ranking[1:]]
+    })
+    logger.info(
+        f"Picked {best['answer']!r} with {best['votes']}/{len(ok)} votes "
+        f"in {result['wall_seconds']}s ({result['cancelled']} candidates cancelled)"
+    )
+    return result
+
+
+def answer_key(answer: Any):
+    """Comparison key under which two answers count as the same vote"""
+    if isinstance(answer, bool):
+        return ("bool", answer)
+    if isinstance(answer, (int, float)):
+        # 42 and 42.0 agree; float noise beyond 6 decimals is ignored
+        return ("number", round(float(answer), 6))
+    if isinstance(answer, (dict, list)):
+        return ("json", json.dumps(answer, sort_keys=True))
+    return ("text", " ".join(str(answer).split()))
+
+
+def vote(answers: list) -> list:
+    """
+    Group equal answers and rank them
+
+    Returns:
+        List of {"key", "answer", "votes"}, most votes first; ties keep the
+        order in which the answers arrived
+    """
+    groups = {}
+    for answer in answers:
+        key = answer_key(answer)
+        if key not in groups:
+            groups[key] = {"key": key, "answer": answer, "votes": 0}
+        groups[key]["votes"] += 1
+    return sorted(groups.values(), key=lambda g: -g["votes"])
+
+
+class SolverStats:
+    """
+    Running totals for comparing single-shot and multi-candidate solving
+
+    ``record_solve`` takes the dict returned by solve_with_candidates,
+    ``record_submission`` the server's verdict and ``record_failure`` a
+    solve that produced no answer at all. Wall time and tokens are totals
+    per question, including retries; the hit rate is the share of
+    questions answered correctly on the first submission.
+    """
+
+    def __init__(self):
+        self.questions = 0
+        self.wall_seconds = 0.0
+        self.tokens = 0
+        self.submissions = 0
+        self.first_try_hits = 0
+        self.failures = 0
+        self._pending_first = False
+
+    def record_solve(self, result: dict, retry: bool = False):
+        """Add a solve's time and tokens; retries count toward the same question"""
+        if not retry:
+            self.questions += 1
+            self._pending_first = True
+        self.wall_seconds += result["wall_seconds"]
+        self.tokens += result["prompt_tokens"] + result["completion_tokens"]
+
+    def record_failure(self, retry: bool = False):
+        """Count a solve that raised; a failed first solve is a missed question"""
+        if not retry:
+            self.questions += 1
+        self.failures += 1
+        self._pending_first = False
+
+    def record_submission(self, correct: bool):
+        self.submissions += 1
+        if self._pending_first and correct:
+            self.first_try_hits += 1
+        self._pending_first = False
+
+    def summary(self) -> dict:
+        n = max(self.questions, 1)
+        return {
+            "questions": self.questions,
+            "submissions": self.submissions,
+            "failures": self.failures,
+            "avg_wall_seconds": round(self.wall_seconds / n, 3),
+            "avg_tokens": round(self.tokens / n),
+            "submissions_per_question": round(self.submissions / n, 2),
+            "hit_rate": round(self.first_try_hits / n, 3)
+        }
@@ -3,7 +3,7 @@ Answer Submission Handler
 Posts answers to the quiz submission endpoint and handles responses
 """
 
-import requests
+from http_client import async_client
 import logging
 from typing import Any, Dict
 
@@ -50,7 +50,8 @@ async def submit_answer(
     logger.info(f"Payload: {payload}")
 
     try:
-        response = requests.post(
+        # Pooled client: no blocking call on the event loop, no new handshake per answer
+        response = await async_client().post(
             submit_url,
             json=payload,
             timeout=timeout,
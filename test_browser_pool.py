@@ -0,0 +1,131 @@
+"""
+Check the shared Chromium pool against a fake Playwright: no browser
+serves more than max_pages pages at once, a browser is replaced after
+recycle_after pages, every call gets its own context, and shutdown()
+closes everything and refuses further work
+"""
+
+import asyncio
+
+import pytest
+
+import browser_pool
+from browser_pool import BrowserPool
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+        self.closed = False
+
+    async def new_page(self):
+        return self
+
+    async def close(self):
+        self.closed = True
+        self.browser.open_pages -= 1
+
+
+class FakeBrowser:
+    def __init__(self, index: int):
+        self.index = index
+        self.connected = True
+        self.contexts = []
+        self.open_pages = 0
+        self.max_open_pages = 0
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self, **options):
+        context = FakeContext(self)
+        self.contexts.append(context)
+        self.open_pages += 1
+        self.max_open_pages = max(self.max_open_pages, self.open_pages)
+        return context
+
+    async def new_browser_cdp_session(self):
+        raise RuntimeError("no CDP in the fake")
+
+    async def close(self):
+        self.connected = False
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.browsers = []
+        self.stopped = False
+        self.chromium = self
+
+    async def start(self):
+        return self
+
+    async def launch(self, headless=True):
+        browser = FakeBrowser(len(self.browsers))
+        self.browsers.append(browser)
+        return browser
+
+    async def stop(self):
+        self.stopped = True
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    playwright = FakePlaywright()
+    monkeypatch.setattr(browser_pool, "async_playwright", lambda: playwright)
+    return playwright
+
+
+async def visit(page):
+    await asyncio.sleep(0.02)
+    return page.browser.index
+
+
+def test_max_pages_per_browser(fake):
+    pool = BrowserPool(size=1, max_pages=2, recycle_after=100)
+
+    async def run():
+        return await asyncio.gather(*(pool.run(visit) for _ in range(7)))
+
+    try:
+        assert asyncio.run(run()) == [0] * 7
+    finally:
+        pool.shutdown()
+    browser = fake.browsers[0]
+    assert browser.max_open_pages == 2
+    # A fresh context per call, all closed again
+    assert len(browser.contexts) == 7 and all(c.closed for c in browser.contexts)
+
+
+def test_recycle_after_pages(fake):
+    pool = BrowserPool(size=1, max_pages=1, recycle_after=3)
+    try:
+        served_by = [pool.run_sync(visit) for _ in range(7)]
+    finally:
+        pool.shutdown()
+    assert served_by == [0, 0, 0, 1, 1, 1, 2]
+    assert [b.connected for b in fake.browsers] == [False, False, False]
+
+
+def test_shutdown(fake):
+    pool = BrowserPool(size=2, max_pages=2)
+    pool.run_sync(visit)
+    thread = pool._thread
+    pool.shutdown()
+
+    assert fake.stopped
+    assert not any(b.connected for b in fake.browsers)
+    assert not thread.is_alive()
+    with pytest.raises(RuntimeError):
+        pool.run_sync(visit)
+    # Shutting down twice is harmless
+    pool.shutdown()
+
+
+if __name__ == "__main__":
+    for test in (test_max_pages_per_browser, test_recycle_after_pages, test_shutdown):
+        with pytest.MonkeyPatch.context() as mp:
+            playwright = FakePlaywright()
+            mp.setattr(browser_pool, "async_playwright", lambda: playwright)
+            test(playwright)
+    print("Test Passed")
@@ -0,0 +1,68 @@
+"""
+Check that the download cache cannot be corrupted through the files it
+hands out: materialized files are private copies, and a blob changed on
+disk is dropped instead of being served again
+"""
+
+import os
+import tempfile
+import time
+
+from cache import ContentCache
+
+URL = "https://quiz.example.com/data.csv"
+
+
+def make_cache():
+    workdir = tempfile.mkdtemp()
+    return workdir, ContentCache(root=os.path.join(workdir, ".cache"))
+
+
+def test_materialize_is_private_copy():
+    workdir, cache = make_cache()
+    key = cache.make_key(URL)
+    entry = cache.put_bytes(key, URL, b"a,b\n1,2\n")
+    dest = os.path.join(workdir, "data.csv")
+    cache.materialize(entry, dest)
+
+    assert os.stat(dest).st_ino != os.stat(entry["path"]).st_ino
+    # Writing as the user code would must leave the cached body alone
+    with open(dest, "w") as f:
+        f.write("a,b,c\n1,2,3\n")
+    assert cache.lookup(key)["fresh"]
+    cache.materialize(cache.lookup(key), dest)
+    with open(dest) as f:
+        assert f.read() == "a,b\n1,2\n"
+
+
+def test_modified_blob_is_dropped():
+    _, cache = make_cache()
+    key = cache.make_key(URL)
+    entry = cache.put_bytes(key, URL, b"a,b\n1,2\n")
+
+    # Same size, different bytes, written after the entry was stored
+    time.sleep(0.01)
+    os.chmod(entry["path"], 0o644)
+    with open(entry["path"], "wb") as f:
+        f.write(b"x,y\n3,4\n")
+    assert cache.lookup(key) is None
+    assert not os.path.exists(entry["path"])
+
+    # Storing the same body again restores a good blob
+    cache.put_bytes(key, URL, b"a,b\n1,2\n")
+    assert cache.read_text(cache.lookup(key)) == "a,b\n1,2\n"
+
+
+def test_touched_but_intact_blob_is_kept():
+    _, cache = make_cache()
+    key = cache.make_key(URL)
+    entry = cache.put_bytes(key, URL, b"a,b\n1,2\n")
+    os.utime(entry["path"], (time.time() + 10, time.time() + 10))
+    assert cache.lookup(key) is not None
+
+
+if __name__ == "__main__":
+    test_materialize_is_private_copy()
+    test_modified_blob_is_dropped()
+    test_touched_but_intact_blob_is_kept()
+    print("Test Passed")
@@ -0,0 +1,83 @@
+"""
+Check multi-candidate solving: voting, early cancellation and stats
+
+The LLM is replaced by a fixed list of scripts, so this runs offline.
+"""
+
+import asyncio
+import os
+import time
+
+import pytest
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+import solver
+from solver import SolverStats, solve_with_candidates, vote
+
+
+def fake_llm(scripts):
+    calls = iter(scripts)
+
+    async def solve_with_llm(question, quiz_details, feedback=None, metrics=None, deadline=None, sample=0):
+        if metrics is not None:
+            metrics.update({"prompt_tokens": 100, "completion_tokens": 20})
+        return next(calls)
+    return solve_with_llm
+
+
+def test_vote():
+    ranking = vote([42, "42", 42.0, "x", 41.9999999])
+    assert ranking[0]["answer"] == 42 and ranking[0]["votes"] == 3
+    assert vote([True, 1])[0]["votes"] == 1
+    assert vote([{"a": 1, "b": 2}, {"b": 2, "a": 1}])[0]["votes"] == 2
+
+
+def test_majority_wins(monkeypatch):
+    monkeypatch.setattr(solver, "solve_with_llm", fake_llm([
+        "print(41)",
+        "import time\ntime.sleep(0.2)\nprint(42)",
+        "import time\ntime.sleep(0.2)\nprint(42.0)",
+    ]))
+    stats = SolverStats()
+    result = asyncio.run(solve_with_candidates("q", {}, k=3, stats=stats))
+    print(f"Answer {result['answer']!r}, {result['votes']} votes, alternatives {result['alternatives']}")
+    assert result["answer"] == 42
+    assert result["votes"] == 2 and result["alternatives"] == [41]
+    assert result["prompt_tokens"] == 300
+
+    stats.record_submission(True)
+    summary = stats.summary()
+    assert summary["hit_rate"] == 1.0 and summary["avg_tokens"] == 360
+
+
+def test_early_stop_cancels_slow_candidates(monkeypatch):
+    monkeypatch.setattr(solver, "solve_with_llm", fake_llm([
+        "print('yes')",
+        "print('yes')",
+        "import time\ntime.sleep(30)\nprint('no')",
+    ]))
+    started = time.perf_counter()
+    result = asyncio.run(solve_with_candidates("q", {}, k=3))
+    elapsed = time.perf_counter() - started
+    print(f"Majority after {elapsed:.2f}s, {result['cancelled']} cancelled")
+    assert result["answer"] == "yes" and result["cancelled"] == 1
+    assert elapsed < 5
+
+
+def test_all_failed(monkeypatch):
+    monkeypatch.setattr(solver, "solve_with_llm", fake_llm(["raise SystemExit(1)"] * 2))
+    try:
+        asyncio.run(solve_with_candidates("q", {}, k=2))
+    except Exception as e:
+        assert "All 2 candidates failed" in str(e)
+    else:
+        raise AssertionError("expected an exception")
+
+
+if __name__ == "__main__":
+    test_vote()
+    for test in (test_majority_wins, test_early_stop_cancels_slow_candidates, test_all_failed):
+        with pytest.MonkeyPatch.context() as mp:
+            test(mp)
+    print("Test Passed")
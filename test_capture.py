@@ -0,0 +1,140 @@
+"""
+Check render response capture: data responses are kept, page and style
+responses are not, captured bodies land in the download cache and
+get_rendered_html lists them so download_file never fetches them again
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+
+import cache
+import tools.web_scraper as web_scraper
+from capture import CAPTURE_TTL, ResponseCapture, cache_ttl, store_captures, wants
+
+
+class FakeRequest:
+    def __init__(self, resource_type):
+        self.resource_type = resource_type
+
+
+class FakeResponse:
+    def __init__(self, url, resource_type, content_type, body, status=200):
+        self.url = url
+        self.request = FakeRequest(resource_type)
+        self.headers = {"content-type": content_type, "content-length": str(len(body))}
+        self.status = status
+        self._body = body
+
+    async def body(self):
+        return self._body
+
+
+class FakePage:
+    def on(self, event, handler):
+        self.handler = handler
+
+
+RESPONSES = [
+    FakeResponse("https://quiz.example.com/q5", "document", "text/html", b"<html></html>"),
+    FakeResponse("https://quiz.example.com/api/secret", "fetch", "application/json", b'{"secret": 9001}'),
+    FakeResponse("https://quiz.example.com/demo-scrape.js", "script", "application/octet-stream", b"var code = 4242;"),
+    FakeResponse("https://quiz.example.com/data.csv", "fetch", "text/csv; charset=utf-8", b"a,b\n1,2\n"),
+    FakeResponse("https://quiz.example.com/style.css", "stylesheet", "text/css", b"body {}"),
+    FakeResponse("https://quiz.example.com/moved.json", "fetch", "application/json", b"", status=302),
+]
+
+
+def test_wants():
+    assert not wants("document", "https://quiz.example.com/q5", "text/html")
+    assert wants("xhr", "https://quiz.example.com/api", "application/json")
+    assert wants("script", "https://quiz.example.com/a.js", "")
+    assert not wants("fetch", "https://quiz.example.com/page", "text/html")
+    assert not wants("image", "https://quiz.example.com/a.png", "image/png")
+
+
+def test_capture_and_store():
+    async def run():
+        page = FakePage()
+        capture = ResponseCapture()
+        capture.attach(page)
+        for response in RESPONSES:
+            page.handler(response)
+        return await capture.collect()
+
+    items = asyncio.run(run())
+    assert [item["url"].rsplit("/", 1)[1] for item in items] == ["secret", "demo-scrape.js", "data.csv"]
+
+    workdir = tempfile.mkdtemp()
+    store = cache.ContentCache(root=os.path.join(workdir, ".cache"))
+    manifest = store_captures(items, store, directory=os.path.join(workdir, "LLMFiles"))
+    assert [m["filename"] for m in manifest] == ["secret", "demo-scrape.js", "data.csv"]
+    assert manifest[2]["content_type"] == "text/csv"
+    assert json.loads(manifest[0]["text"]) == {"secret": 9001}
+    with open(manifest[1]["path"]) as f:
+        assert f.read() == "var code = 4242;"
+
+    # download_file looks up the same key, so the captured body is a cache hit
+    entry = store.lookup(store.make_key("https://quiz.example.com/data.csv"))
+    assert entry["fresh"] and entry["size"] == len(b"a,b\n1,2\n")
+
+
+def test_cache_headers():
+    assert cache_ttl({}) == CAPTURE_TTL
+    assert cache_ttl({"Cache-Control": "public, max-age=10"}) == min(10, CAPTURE_TTL)
+    assert cache_ttl({"Cache-Control": "max-age=86400"}) == CAPTURE_TTL
+    assert cache_ttl({"cache-control": "no-store"}) is None
+    assert cache_ttl({"cache-control": "max-age=0"}) is None
+    assert cache_ttl({"pragma": "no-cache"}) is None
+
+    workdir = tempfile.mkdtemp()
+    store = cache.ContentCache(root=os.path.join(workdir, ".cache"))
+    url = "https://quiz.example.com/api/now"
+    items = [{
+        "url": url, "resource_type": "fetch", "content_type": "application/json",
+        "headers": {"content-type": "application/json", "cache-control": "no-store"}, "body": b'{"t": 1}'
+    }]
+    manifest = store_captures(items, store, directory=os.path.join(workdir, "LLMFiles"))
+    # Saved for the agent, but a later download_file must go to the network
+    assert manifest[0]["text"] == '{"t": 1}' and os.path.exists(manifest[0]["path"])
+    assert store.lookup(store.make_key(url)) is None
+
+
+def test_tool_manifest():
+    workdir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    cache._cache = cache.ContentCache(root=os.path.join(workdir, ".cache"))
+    original = web_scraper.fetch_page
+
+    async def fake_fetch_page(url, capture=False, **kwargs):
+        assert capture
+        body = b'{"rows": [1, 2, 3]}'
+        return {
+            "html": "<html><body><div id='app'>Loaded</div></body></html>",
+            "responses": [{
+                "url": "https://quiz.example.com/api/rows.json", "resource_type": "fetch",
+                "content_type": "application/json", "headers": {"content-type": "application/json"}, "body": body
+            }]
+        }
+
+    web_scraper.fetch_page = fake_fetch_page
+    try:
+        result = asyncio.run(web_scraper.get_rendered_html.ainvoke(
+            {"url": "https://quiz.example.com/q6", "capture_data": True}
+        ))
+        assert "## Captured responses" in result and '"filename": "rows.json"' in result
+        assert os.path.exists(os.path.join("LLMFiles", "rows.json"))
+    finally:
+        web_scraper.fetch_page = original
+        cache._cache = None
+        os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    test_wants()
+    test_capture_and_store()
+    test_cache_headers()
+    test_tool_manifest()
+    print("Test Passed")
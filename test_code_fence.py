@@ -0,0 +1,60 @@
+"""
+Check that the streaming code fence watcher and extract_code_from_markdown
+read fences the same way: whatever chunking the stream arrives in, the
+watcher stops right after the first Python block closes, and the text up
+to that point yields exactly that block's code
+"""
+
+import os
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+from solver import CODE_BLOCK_PATTERN, CodeFenceWatcher, extract_code_from_markdown, is_python_fence
+
+# (completion, code of its first Python block or None)
+CASES = [
+    ("Here you go:\n```python\nprint(1)\n```\nDone.", "print(1)"),
+    ("```py\nprint(3)\n```\nrest", "print(3)"),
+    ("```python3\nprint(3)\n```", "print(3)"),
+    ("```Python\nprint(3)\n```", "print(3)"),
+    ("```\nx = 1\nprint(x)\n```", "x = 1\nprint(x)"),
+    ("```bash\nls\n```\nthen\n```python\nprint(2)\n```", "print(2)"),
+    ("```json\n{\"a\": \"```\"}\n```\n```PY \nprint(4)\n```", "print(4)"),
+    ("```python\n```\n", ""),
+    ("```bash\nls\n```\nno python here", None),
+    ("print(5)", None),
+]
+
+
+def stop_point(text: str, size: int):
+    """Characters consumed when the watcher first reports a closed block"""
+    watcher = CodeFenceWatcher()
+    for start in range(0, len(text), size):
+        if watcher.feed(text[start:start + size]):
+            return start + size
+    return None
+
+
+def test_watcher_in_small_chunks():
+    for text, code in CASES:
+        for size in (1, 2, 3, len(text)):
+            stopped = stop_point(text, size)
+            if code is None:
+                assert stopped is None, (text, size)
+                continue
+            assert stopped is not None, (text, size)
+            # It stops in the chunk that completes the closing fence
+            block = next(m for m in CODE_BLOCK_PATTERN.finditer(text) if is_python_fence(m.group(1)))
+            assert block.end() <= stopped < block.end() + size, (text, size, stopped)
+            assert extract_code_from_markdown(text[:stopped]) == code, (text, size)
+
+
+def test_extractor():
+    for text, code in CASES:
+        assert extract_code_from_markdown(text) == (text.strip() if code is None else code), text
+
+
+if __name__ == "__main__":
+    test_watcher_in_small_chunks()
+    test_extractor()
+    print("Test Passed")
@@ -0,0 +1,97 @@
+"""
+Check the warm code worker pool: a run abandoned by the caller takes the
+processes it spawned down with it, and the memory limit applies to what
+the snippet allocates rather than to the preloaded libraries
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+from tools.code_pool import CodeWorkerPool
+
+SPAWNS_SLEEPER = """
+import subprocess, time
+sleeper = subprocess.Popen(["sleep", "60"])
+with open("sleeper.pid", "w") as f:
+    f.write(str(sleeper.pid))
+time.sleep(60)
+"""
+
+ALLOCATES = """
+import numpy as np
+block = np.ones({mb} * 1024 * 1024 // 8)
+print(block.nbytes // (1024 * 1024))
+"""
+
+
+def alive(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # A zombie has exited, it is only waiting to be reaped
+            return f.read().split(")")[-1].split()[0] != "Z"
+    except OSError:
+        return False
+
+
+async def run_in(pool: CodeWorkerPool, code: str, limits: dict = None) -> tuple:
+    workdir = tempfile.mkdtemp()
+    out, err = os.path.join(workdir, "out.log"), os.path.join(workdir, "err.log")
+    status = await pool.run(code, workdir, out, err, timeout=30, limits=limits)
+    with open(out) as f_out, open(err) as f_err:
+        return status, f_out.read(), f_err.read()
+
+
+def test_cancelled_run_kills_process_group():
+    async def run():
+        pool = CodeWorkerPool(size=1)
+        await pool.start()
+        workdir = tempfile.mkdtemp()
+        task = asyncio.create_task(pool.run(
+            SPAWNS_SLEEPER, workdir, os.path.join(workdir, "out.log"), os.path.join(workdir, "err.log"), timeout=30
+        ))
+        pid_file = os.path.join(workdir, "sleeper.pid")
+        while not os.path.exists(pid_file) or not os.path.getsize(pid_file):
+            await asyncio.sleep(0.05)
+        with open(pid_file) as f:
+            sleeper = int(f.read())
+        assert alive(sleeper)
+
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        deadline = time.monotonic() + 5
+        while alive(sleeper) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        gone = not alive(sleeper)
+
+        # The pool replaced the worker and keeps serving runs
+        status, out, _ = await run_in(pool, "print('still here')")
+        await pool.shutdown()
+        return gone, status, out
+
+    gone, status, out = asyncio.run(run())
+    assert gone
+    assert status["return_code"] == 0 and out == "still here\n"
+
+
+def test_memory_limit_counts_snippet_allocations():
+    async def run():
+        pool = CodeWorkerPool(size=1)
+        await pool.start()
+        # 200 MB fits a 300 MB budget even though the preloaded worker
+        # already has more than 100 MB of address space mapped
+        fits = await run_in(pool, ALLOCATES.format(mb=200), {"memory_mb": 300})
+        too_big = await run_in(pool, ALLOCATES.format(mb=400), {"memory_mb": 300})
+        await pool.shutdown()
+        return fits, too_big
+
+    (fits, out, _), (too_big, _, err) = asyncio.run(run())
+    assert fits["return_code"] == 0 and out == "200\n"
+    assert too_big["return_code"] == 1 and "MemoryError" in err
+
+
+if __name__ == "__main__":
+    test_cancelled_run_kills_process_group()
+    test_memory_limit_counts_snippet_allocations()
+    print("Test Passed")
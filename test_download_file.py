@@ -0,0 +1,89 @@
+"""
+Check download_file's failure paths: a connection that keeps dropping
+leaves no memory map behind, and every failure is reported as a dict
+with an ``error`` field, like the success result
+"""
+
+import asyncio
+import mmap
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import cache
+from tools import download_file
+
+# The package re-exports the tool under the module's name
+download_module = sys.modules["tools.download_file"]
+
+BODY = b"x" * 300_000
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == "/missing.csv":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        # Promise the whole body, send a third of it and hang up
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY[:100_000])
+        self.wfile.flush()
+        self.close_connection = True
+
+
+class TrackedMap(mmap.mmap):
+    opened = []
+
+    def __new__(cls, *args, **kwargs):
+        instance = super().__new__(cls, *args, **kwargs)
+        cls.opened.append(instance)
+        return instance
+
+
+def test_failures(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    workdir = tempfile.mkdtemp()
+    monkeypatch.chdir(workdir)
+    monkeypatch.setattr(cache, "_cache", cache.ContentCache(root=os.path.join(workdir, ".cache")))
+    monkeypatch.setattr(download_module, "USE_MMAP", True)
+    monkeypatch.setattr(download_module, "RESUME_ATTEMPTS", 1)
+    monkeypatch.setattr(download_module.mmap, "mmap", TrackedMap)
+
+    async def run():
+        return [
+            await download_file.ainvoke({"url": base + "/dropping.bin"}),
+            await download_file.ainvoke({"url": base + "/missing.csv"}),
+        ]
+
+    dropped, missing = asyncio.run(run())
+    server.shutdown()
+    print(dropped, missing, sep="\n")
+
+    assert dropped["url"] == base + "/dropping.bin" and dropped["filename"] == "dropping.bin"
+    assert dropped["error"].startswith("Error downloading file")
+    assert TrackedMap.opened and all(m.closed for m in TrackedMap.opened)
+    assert "404" in missing["error"]
+    # Nothing half-written is left in the cache's blob store
+    assert not [name for _, _, files in os.walk(os.path.join(workdir, ".cache", "blobs")) for name in files]
+
+
+if __name__ == "__main__":
+    with pytest.MonkeyPatch.context() as mp:
+        test_failures(mp)
+    print("Test Passed")
@@ -0,0 +1,90 @@
+"""
+Check that solver.execute_code runs scripts concurrently
+
+N scripts that each sleep for SLEEP seconds should finish in about
+max(t) = SLEEP, not sum(t) = N * SLEEP, and the event loop must stay
+responsive while they run.
+"""
+
+import asyncio
+import os
+import time
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+from solver import MAX_CONCURRENT_EXECUTIONS, execute_code
+
+SLEEP = 1.0
+N = min(4, MAX_CONCURRENT_EXECUTIONS)
+
+
+async def run_concurrently():
+    code = f"import time\ntime.sleep({SLEEP})\nprint(42)"
+
+    ticks = 0
+
+    async def heartbeat():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.05)
+            ticks += 1
+
+    beat = asyncio.create_task(heartbeat())
+    started = time.perf_counter()
+    results = await asyncio.gather(*(execute_code(code) for _ in range(N)))
+    elapsed = time.perf_counter() - started
+    beat.cancel()
+    return results, elapsed, ticks
+
+
+def test_concurrent_execution():
+    results, elapsed, ticks = asyncio.run(run_concurrently())
+    print(f"{N} runs of {SLEEP}s took {elapsed:.2f}s (sum would be {N * SLEEP:.1f}s), heartbeat ticks: {ticks}")
+    assert results == [42] * N
+    assert elapsed < SLEEP + (N * SLEEP - SLEEP) / 2
+    # The loop kept running while the subprocesses worked
+    assert ticks >= int(SLEEP / 0.05) // 2
+
+
+def test_timeout_kills_process():
+    async def run():
+        started = time.perf_counter()
+        try:
+            await execute_code("import time\ntime.sleep(30)", timeout=1)
+        except Exception as e:
+            return str(e), time.perf_counter() - started
+        return None, time.perf_counter() - started
+
+    error, elapsed = asyncio.run(run())
+    print(f"Timeout raised '{error}' after {elapsed:.2f}s")
+    assert error == "Code execution timeout"
+    assert elapsed < 5
+
+
+def test_runs_do_not_share_files():
+    # Each run writes, waits for the others, then reads back the same relative name
+    code = """
+import json, os, time
+with open("data.csv", "w") as f:
+    f.write("{i}")
+time.sleep(0.5)
+with open("data.csv") as f:
+    print(json.dumps({{"value": int(f.read()), "cwd": os.getcwd()}}))
+"""
+
+    async def run():
+        return await asyncio.gather(*(execute_code(code.format(i=i)) for i in range(N)))
+
+    results = asyncio.run(run())
+    print(results)
+    assert [r["value"] for r in results] == list(range(N))
+    assert len({r["cwd"] for r in results}) == N
+    # Scratch directories are removed afterwards
+    assert not any(os.path.exists(r["cwd"]) for r in results)
+
+
+if __name__ == "__main__":
+    test_concurrent_execution()
+    test_timeout_kills_process()
+    test_runs_do_not_share_files()
+    print("Test Passed")
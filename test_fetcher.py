@@ -0,0 +1,90 @@
+"""
+Check the tiered fetcher: static pages stay on plain HTTP, pages that need
+JavaScript escalate to the browser, and every fetch is logged with its tier
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import fetcher
+from fetcher import fetch_page, needs_render
+
+PAGES = {
+    "/static": "<html><body><h1>Quiz</h1><p>What is the sum of the numbers in data.csv?</p></body></html>",
+    "/script-only": '<html><body><script src="demo-scrape.js"></script></body></html>',
+    "/data.csv": "a,b\n1,2\n",
+}
+
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = PAGES[self.path].encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv" if self.path.endswith(".csv") else "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def test_heuristics():
+    assert needs_render(PAGES["/static"]) is None
+    assert needs_render(PAGES["/script-only"]) == "script-only page"
+    assert needs_render("") == "empty body"
+    assert needs_render('<div id="root"></div><script src="/main.js"></script>') == "script-only page"
+    assert needs_render('<div id="root">Loading...</div><script src="/main.js"></script>') == "app shell"
+    assert needs_render('<p>Secret below</p><script>el.innerHTML = "x"</script>') == "inline DOM writes"
+    assert needs_render("a,b\n1,2", content_type="text/csv") is None
+
+
+def test_tiers_and_stats(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    rendered = []
+
+    async def fake_render(url, wait_for=None, deadline=None, policy=None, capture=False):
+        rendered.append(url)
+        report = {"wait": "quiet", "requests": 3, "blocked": 2, "blocked_bytes_estimate": 60000}
+        return "<html><body>rendered secret</body></html>", report
+
+    monkeypatch.setattr(fetcher, "_render", fake_render)
+    monkeypatch.setattr(fetcher, "STATS_PATH", os.path.join(tempfile.mkdtemp(), "fetch_stats.jsonl"))
+
+    async def run():
+        pages = [await fetch_page(base + path) for path in ("/static", "/script-only", "/data.csv")]
+        # Only a browser can wait for a selector, even on a static page
+        return pages + [await fetch_page(base + "/static", wait_for="#result")]
+
+    static, script_only, csv, waited = asyncio.run(run())
+    server.shutdown()
+
+    assert static["tier"] == "http" and "sum of the numbers" in static["html"]
+    assert script_only["tier"] == "browser" and script_only["reason"] == "script-only page"
+    assert csv["tier"] == "http"
+    assert waited["tier"] == "browser" and waited["reason"] == "wait_for"
+    assert rendered == [base + "/script-only", base + "/static"]
+
+    with open(fetcher.STATS_PATH) as f:
+        records = [json.loads(line) for line in f]
+    assert [r["tier"] for r in records] == ["http", "browser", "http", "browser"]
+    assert all("seconds" in r for r in records) and all("http_ms" in r for r in records[:3])
+    assert "render_ms" in records[1] and records[1]["wait"] == "quiet"
+    assert records[1]["blocked"]["blocked"] == 2
+    assert fetcher.fetch_stats()["browser"]["blocked_requests"] == 4
+
+
+if __name__ == "__main__":
+    test_heuristics()
+    with pytest.MonkeyPatch.context() as mp:
+        test_tiers_and_stats(mp)
+    print("Test Passed")
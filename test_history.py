@@ -0,0 +1,154 @@
+"""
+Check message history compaction: quiz segments end after the turn that
+hands out the next URL, submissions are summarized one line each, tool
+outputs are digested, and over budget the oldest turns of the current
+quiz are squeezed and dropped while the opening and latest turns stay
+"""
+
+import json
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+import history
+from history import (
+    LATEST_TOOL_OUTPUT_MAX_CHARS,
+    SQUEEZED_TOOL_OUTPUT_MAX_CHARS,
+    TOOL_OUTPUT_MAX_CHARS,
+    advance_segment,
+    compact_messages,
+    digest,
+    segment_start,
+    summarize_segments,
+)
+
+QUIZ_1 = "https://quiz.example.com/q1"
+QUIZ_2 = "https://quiz.example.com/q2"
+SUBMIT = "https://quiz.example.com/submit"
+
+
+def turn(call_id: str, name: str, args: dict, result, extra_results: int = 0) -> list:
+    """One AI turn with its tool result, plus parallel results of other tools"""
+    calls = [{"name": name, "args": args, "id": call_id}]
+    calls += [{"name": "run_code", "args": {"code": "pass"}, "id": f"{call_id}-{i}"} for i in range(extra_results)]
+    content = result if isinstance(result, str) else json.dumps(result)
+    messages = [AIMessage(content="", tool_calls=calls), ToolMessage(content=content, name=name, tool_call_id=call_id)]
+    messages += [ToolMessage(content="ok", name="run_code", tool_call_id=f"{call_id}-{i}") for i in range(extra_results)]
+    return messages
+
+
+def submit(call_id: str, answer, result: dict, extra_results: int = 0) -> list:
+    return turn(call_id, "post_request", {"url": SUBMIT, "payload": {"answer": answer}}, result, extra_results)
+
+
+def chain() -> list:
+    """Quiz 1 (wrong then right, with a parallel result after the boundary), then quiz 2 in progress"""
+    return (
+        [HumanMessage(content=QUIZ_1)]
+        + turn("c1", "get_rendered_html", {"url": QUIZ_1}, "page one")
+        + submit("c2", 41, {"correct": False, "reason": "Off by one"})
+        + submit("c3", 42, {"correct": True, "url": QUIZ_2}, extra_results=2)
+        + [HumanMessage(content="Keep going")]
+        + turn("c4", "get_rendered_html", {"url": QUIZ_2}, "page two")
+    )
+
+
+def test_segment_boundaries():
+    messages = chain()
+    # The parallel results of the submitting turn stay with the finished quiz
+    start = segment_start(messages)
+    assert messages[start].content == "Keep going"
+    assert all(isinstance(m, ToolMessage) for m in messages[start - 3:start])
+
+    # No boundary after ``start`` leaves it where it was
+    assert segment_start(messages, start) == start
+    assert segment_start(messages[:5]) == 0
+
+    # Advancing is incremental: a later call only adds the new submissions
+    first, lines = advance_segment(messages[:5], 0, [])
+    assert first == 0 and lines == []
+    second, lines = advance_segment(messages, first, lines)
+    assert second == start and len(lines) == 2
+    assert advance_segment(messages, second, lines) == (second, lines)
+
+
+def test_summarize_segments():
+    messages = chain()
+    messages += submit("c5", {"value": [1, 2]}, "not json")
+    # A post_request result whose call is not in the slice is ignored
+    messages += [ToolMessage(content=json.dumps({"correct": True}), name="post_request", tool_call_id="elsewhere")]
+
+    assert summarize_segments(messages) == [
+        f"{SUBMIT}: answer 41 -> incorrect (Off by one)",
+        f"{SUBMIT}: answer 42 -> correct",
+        f'{SUBMIT}: answer {{"value": [1, 2]}} -> incorrect (no reason)',
+    ]
+
+
+def test_digest():
+    assert digest("short", 100) == "short"
+    text = "".join(chr(ord("a") + i % 26) for i in range(1000))
+    cut = digest(text, 100)
+    assert cut.startswith(text[:75]) and cut.endswith(text[-25:])
+    assert "[900 chars omitted]" in cut
+
+
+def test_compact_replaces_finished_segments():
+    messages = chain()
+    compacted = compact_messages(messages, budget=100_000)
+
+    summary = compacted[0]
+    assert isinstance(summary, HumanMessage)
+    assert "answer 41 -> incorrect (Off by one)" in summary.content
+    assert f"next quiz URL: {QUIZ_2}" in summary.content
+    assert compacted[1:] == messages[segment_start(messages):]
+
+    # Passing the tracked segment gives the same prompt as recomputing it
+    start, lines = advance_segment(messages, 0, [])
+    assert compact_messages(messages, 100_000, start, lines)[1:] == compacted[1:]
+    assert compact_messages(messages[:5], budget=100_000) == messages[:5]
+
+
+def test_tool_outputs_are_digested():
+    big = "x" * (LATEST_TOOL_OUTPUT_MAX_CHARS * 2)
+    messages = [HumanMessage(content=QUIZ_1)] + turn("c1", "run_code", {}, big) + turn("c2", "run_code", {}, big)
+    compacted = compact_messages(messages, budget=1_000_000)
+
+    older, latest = compacted[2], compacted[4]
+    assert len(older.content) < TOOL_OUTPUT_MAX_CHARS + 100
+    assert TOOL_OUTPUT_MAX_CHARS < len(latest.content) < LATEST_TOOL_OUTPUT_MAX_CHARS + 100
+    # The state passed in is left alone
+    assert messages[2].content == big and messages[4].content == big
+
+
+def test_budget_trimming():
+    bulky = "y" * TOOL_OUTPUT_MAX_CHARS
+    messages = [HumanMessage(content=QUIZ_1)]
+    for i in range(6):
+        messages += turn(f"c{i}", "run_code", {"code": f"step {i}"}, bulky)
+    full = sum(history.estimate_tokens(m) for m in compact_messages(messages, budget=1_000_000))
+
+    # A little over budget: older outputs are squeezed, every turn is kept
+    squeezed = compact_messages(messages, budget=full - 100)
+    assert len(squeezed) == len(messages)
+    assert all(len(m.content) < SQUEEZED_TOOL_OUTPUT_MAX_CHARS + 100 for m in squeezed[2:-2:2])
+    assert squeezed[-1].content == bulky
+
+    # Far over budget: the oldest whole turns go, the opening message and latest turn stay
+    trimmed = compact_messages(messages, budget=TOOL_OUTPUT_MAX_CHARS // 4 + 200)
+    assert trimmed[0] is messages[0]
+    assert trimmed[-2:] == messages[-2:]
+    assert len(trimmed) < len(messages) and len(trimmed) % 2 == 1
+    kept_calls = {m.tool_calls[0]["id"] for m in trimmed if isinstance(m, AIMessage)}
+    kept_results = {m.tool_call_id for m in trimmed if isinstance(m, ToolMessage)}
+    assert kept_calls == kept_results
+    assert sum(history.estimate_tokens(m) for m in trimmed) <= TOOL_OUTPUT_MAX_CHARS // 4 + 200
+
+
+if __name__ == "__main__":
+    test_segment_boundaries()
+    test_summarize_segments()
+    test_digest()
+    test_compact_replaces_finished_segments()
+    test_tool_outputs_are_digested()
+    test_budget_trimming()
+    print("Test Passed")
@@ -0,0 +1,112 @@
+"""
+Check the shared HTTP client: sequential calls reuse one keep-alive
+connection, concurrent calls respect the per-host cap, hostnames resolve
+through the DNS cache and the sync client shares the same counters
+"""
+
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import http_client
+from http_client import async_client, close_async_client, http_stats, reset_stats, sync_client
+
+active = {"now": 0, "max": 0}
+active_lock = threading.Lock()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        with active_lock:
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+        if self.path == "/slow":
+            time.sleep(0.2)
+        with active_lock:
+            active["now"] -= 1
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_POST = do_GET
+
+
+def serve():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://localhost:{server.server_address[1]}"
+
+
+def test_reuse_and_dns():
+    server, base = serve()
+    reset_stats()
+
+    async def run():
+        for _ in range(5):
+            response = await async_client().get(base + "/fast")
+            assert response.json() == {"ok": True}
+        await close_async_client()
+        # A fresh client opens a new connection but the address is cached
+        await async_client().post(base + "/fast", json={"answer": 1})
+        await close_async_client()
+
+    asyncio.run(run())
+    server.shutdown()
+
+    host = http_stats()["hosts"]["localhost"]
+    print(host)
+    assert host["requests"] == 6
+    assert host["connections"] == 2
+    assert host["dns_lookups"] == 1 and host["dns_hits"] == 1
+    assert host["reuse_ratio"] == round(1 - 2 / 6, 3)
+
+
+def test_per_host_cap():
+    server, base = serve()
+    active["max"] = 0
+    original = http_client.MAX_PER_HOST
+
+    async def run():
+        http_client.MAX_PER_HOST = 2
+        try:
+            client = async_client()
+            await asyncio.gather(*(client.get(base + "/slow") for _ in range(6)))
+        finally:
+            http_client.MAX_PER_HOST = original
+            await close_async_client()
+
+    started = time.perf_counter()
+    asyncio.run(run())
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+    assert active["max"] == 2
+    assert elapsed >= 0.55
+
+
+def test_sync_client():
+    server, base = serve()
+    reset_stats()
+    client = sync_client()
+    for _ in range(3):
+        assert client.get(base + "/fast").status_code == 200
+    assert sync_client() is client
+    http_client.close_sync_client()
+    server.shutdown()
+    host = http_stats()["hosts"]["localhost"]
+    assert host["requests"] == 3 and host["connections"] == 1
+
+
+if __name__ == "__main__":
+    test_reuse_and_dns()
+    test_per_host_cap()
+    test_sync_client()
+    print("Test Passed")
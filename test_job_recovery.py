@@ -0,0 +1,106 @@
+"""
+Check that unfinished quiz jobs survive a restart
+
+A scheduler is stopped while its chain is still running; a new scheduler
+on the same job store must pick the job up again with resume=True.
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+from jobs import Job, JobScheduler, JobStore
+
+
+def test_resume_after_restart():
+    path = os.path.join(tempfile.mkdtemp(), "jobs.sqlite3")
+    calls = []
+
+    async def slow_runner(url, job_id=None, resume=False):
+        calls.append((url, job_id, resume))
+        await asyncio.sleep(30)
+
+    async def fast_runner(url, job_id=None, resume=False):
+        calls.append((url, job_id, resume))
+
+    async def first_process():
+        scheduler = JobScheduler(slow_runner, store=JobStore(path))
+        scheduler.start()
+        job, _ = await scheduler.submit("https://example.com/quiz-1")
+        await asyncio.sleep(0.1)
+        await scheduler.stop()
+        return job.id
+
+    async def second_process():
+        scheduler = JobScheduler(fast_runner, store=JobStore(path))
+        scheduler.start()
+        await asyncio.sleep(0.1)
+        await scheduler.stop()
+        return scheduler
+
+    job_id = asyncio.run(first_process())
+    scheduler = asyncio.run(second_process())
+    print(f"Runner calls: {calls}")
+    assert calls == [
+        ("https://example.com/quiz-1", job_id, False),
+        ("https://example.com/quiz-1", job_id, True),
+    ]
+    assert asyncio.run(scheduler.get(job_id)).status == "completed"
+    # The finished job is still visible to a process that never ran it
+    assert asyncio.run(JobScheduler(fast_runner, store=JobStore(path)).get(job_id)).status == "completed"
+
+
+def test_live_jobs_are_not_stolen():
+    path = os.path.join(tempfile.mkdtemp(), "jobs.sqlite3")
+    store = JobStore(path)
+
+    async def run():
+        owner = JobScheduler(lambda *a, **k: asyncio.sleep(30), store=store)
+        owner.start()
+        await owner.submit("https://example.com/quiz-2")
+        await asyncio.sleep(0.1)
+        # A second worker process starting now must leave the job alone
+        assert JobStore(path).claim_orphans("other", stale_after=45) == []
+        await owner.stop()
+
+    asyncio.run(run())
+    assert [job.url for job in store.claim_orphans("other", stale_after=45)] == ["https://example.com/quiz-2"]
+
+
+def test_orphan_of_running_url_is_finished():
+    path = os.path.join(tempfile.mkdtemp(), "jobs.sqlite3")
+    store = JobStore(path)
+    url = "https://example.com/quiz-3"
+    # Left behind by a dead process, with its heartbeat long gone
+    orphan = Job(url)
+    orphan.status = "running"
+    store.save(orphan, "dead-process")
+    store.release([orphan.id], "dead-process")
+    calls = []
+
+    async def slow_runner(url, job_id=None, resume=False):
+        calls.append(job_id)
+        await asyncio.sleep(30)
+
+    async def run():
+        scheduler = JobScheduler(slow_runner, store=store)
+        scheduler.start()
+        job, _ = await scheduler.submit(url)
+        await asyncio.sleep(0.1)
+        await scheduler.stop()
+        return job
+
+    job = asyncio.run(run())
+    assert calls == [job.id]
+    duplicate = store.load(orphan.id)
+    assert duplicate.status == "cancelled" and job.id in duplicate.error
+    # Nobody picks the duplicate up again
+    assert [j.id for j in store.claim_orphans("other", stale_after=45)] == [job.id]
+
+
+if __name__ == "__main__":
+    test_resume_after_restart()
+    test_live_jobs_are_not_stolen()
+    test_orphan_of_running_url_is_finished()
+    print("Test Passed")
@@ -0,0 +1,63 @@
+"""
+Check the POST /quiz and GET /jobs/{id} endpoints against the job
+scheduler: a URL already in flight returns its existing job, a full queue
+answers 503, and job status is served from memory or from the job store
+"""
+
+import os
+import tempfile
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+from fastapi.testclient import TestClient
+import pytest
+
+import main
+from jobs import JobScheduler, JobStore
+
+EMAIL = "student@example.com"
+SECRET = "s3cret"
+
+
+async def never_runs(url, job_id=None, resume=False):
+    raise AssertionError("workers are not started in this test")
+
+
+def post(client: TestClient, url: str):
+    return client.post("/quiz", json={"email": EMAIL, "secret": SECRET, "url": url})
+
+
+def test_queue_dedupe_and_status(monkeypatch):
+    store = JobStore(os.path.join(tempfile.mkdtemp(), "jobs.sqlite3"))
+    # No workers are started, so the single queue slot stays taken
+    monkeypatch.setattr(main, "scheduler", JobScheduler(never_runs, queue_size=1, store=store))
+    monkeypatch.setattr(main, "EMAIL", EMAIL)
+    monkeypatch.setattr(main, "SECRET", SECRET)
+    client = TestClient(main.app)
+
+    first = post(client, "https://example.com/quiz-1")
+    assert first.status_code == 200
+    job_id = first.json()["job_id"]
+    assert first.json() == {"status": "accepted", "job_id": job_id}
+
+    again = post(client, "https://example.com/quiz-1")
+    assert again.status_code == 200
+    assert again.json() == {"status": "accepted", "job_id": job_id, "duplicate": True}
+
+    full = post(client, "https://example.com/quiz-2")
+    assert full.status_code == 503
+
+    status = client.get(f"/jobs/{job_id}")
+    assert status.status_code == 200
+    assert status.json()["url"] == "https://example.com/quiz-1" and status.json()["status"] == "queued"
+    assert client.get("/jobs/unknown").status_code == 404
+
+    # A scheduler that never saw the job (another process, or after a restart) reads the store
+    monkeypatch.setattr(main, "scheduler", JobScheduler(never_runs, store=store))
+    assert client.get(f"/jobs/{job_id}").json()["status"] == "queued"
+
+
+if __name__ == "__main__":
+    with pytest.MonkeyPatch.context() as mp:
+        test_queue_dedupe_and_status(mp)
+    print("Test Passed")
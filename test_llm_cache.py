@@ -0,0 +1,75 @@
+"""
+Check the LLM response cache: key normalization, TTL, eviction and bypass
+"""
+
+import json
+import os
+import tempfile
+import time
+
+import llm_cache
+from llm_cache import LLMCache, get_llm_cache
+
+
+def new_cache(**kwargs):
+    return LLMCache(os.path.join(tempfile.mkdtemp(), "llm.sqlite3"), **kwargs)
+
+
+def history(run_id, call_id, delay):
+    return [
+        {"role": "user", "content": "https://example.com/quiz-1"},
+        {"role": "assistant", "content": "", "id": call_id,
+         "tool_calls": [{"id": call_id, "name": "run_code", "args": {"code": "print(1)"}}]},
+        {"role": "tool", "name": "run_code", "tool_call_id": call_id,
+         "content": json.dumps({"stdout": "1\n", "return_code": 0, "run_id": run_id})},
+        {"role": "tool", "name": "post_request", "tool_call_id": call_id,
+         "content": json.dumps({"correct": True, "delay": delay})},
+    ]
+
+
+def test_replayed_run_has_same_key():
+    key_a = LLMCache.make_key("m", {"temperature": 1}, history("a1b2", "call_1", 12))
+    key_b = LLMCache.make_key("m", {"temperature": 1}, history("c3d4", "call_9", 40))
+    assert key_a == key_b
+    assert key_a != LLMCache.make_key("other", {"temperature": 1}, history("a1b2", "call_1", 12))
+    changed = history("a1b2", "call_1", 12)
+    changed[2]["content"] = json.dumps({"stdout": "2\n", "return_code": 0})
+    assert key_a != LLMCache.make_key("m", {"temperature": 1}, changed)
+
+
+def test_get_put_and_ttl():
+    cache = new_cache(ttl=0.2)
+    cache.put("k", "m", {"text": "hello"})
+    assert cache.get("k") == {"text": "hello"}
+    time.sleep(0.25)
+    assert cache.get("k") is None
+
+
+def test_size_eviction():
+    cache = new_cache(max_bytes=300)
+    for i in range(5):
+        cache.put(f"k{i}", "m", "x" * 100)
+        time.sleep(0.01)
+    assert cache.get("k0") is None
+    assert cache.get("k4") == "x" * 100
+
+
+def test_sampling_bypass():
+    llm_cache.ENABLED, llm_cache.CACHE_SAMPLED = True, False
+    llm_cache.LLM_CACHE_PATH = os.path.join(tempfile.mkdtemp(), "llm.sqlite3")
+    try:
+        assert get_llm_cache(1) is None
+        assert get_llm_cache(0) is not None
+        llm_cache.CACHE_SAMPLED = True
+        assert get_llm_cache(1) is not None
+    finally:
+        llm_cache.ENABLED, llm_cache.CACHE_SAMPLED = False, False
+        llm_cache._cache = None
+
+
+if __name__ == "__main__":
+    test_replayed_run_has_same_key()
+    test_get_put_and_ttl()
+    test_size_eviction()
+    test_sampling_bypass()
+    print("Test Passed")
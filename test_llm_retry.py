@@ -0,0 +1,85 @@
+"""
+Check the Groq retry layer: backoff, retry-after, deadlines and fallback
+"""
+
+import asyncio
+import time
+
+import pytest
+
+import llm_retry
+from llm_retry import FALLBACK_MARGIN, call_with_retry
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    # Read at call time, so this works however early llm_retry was imported
+    monkeypatch.setattr(llm_retry, "BACKOFF_BASE", 0.01)
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class FakeAPIError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = FakeResponse(status_code, headers)
+
+
+def flaky(errors):
+    calls = []
+
+    async def call(model):
+        calls.append(model)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return f"ok from {model}"
+    return call, calls
+
+
+def test_retries_429_and_5xx():
+    call, calls = flaky([FakeAPIError(429, {"retry-after": "0.3"}), FakeAPIError(503)])
+    started = time.perf_counter()
+    result = asyncio.run(call_with_retry(call, "big"))
+    elapsed = time.perf_counter() - started
+    print(f"{result} after {len(calls)} calls in {elapsed:.2f}s")
+    assert result == "ok from big" and len(calls) == 3
+    # retry-after was honoured
+    assert elapsed >= 0.3
+
+
+def test_client_errors_are_not_retried():
+    call, calls = flaky([FakeAPIError(400)])
+    try:
+        asyncio.run(call_with_retry(call, "big"))
+    except FakeAPIError:
+        pass
+    assert calls == ["big"]
+
+
+def test_fallback_near_deadline():
+    # Plenty of time, but the server wants a long pause: switch model instead of waiting
+    call, calls = flaky([FakeAPIError(429, {"retry-after": "60"})])
+    deadline = time.time() + FALLBACK_MARGIN + 30
+    started = time.perf_counter()
+    result = asyncio.run(call_with_retry(call, "big", "small", deadline))
+    assert result == "ok from small" and calls == ["big", "small"]
+    assert time.perf_counter() - started < 1
+
+    # Already inside the margin: start with the fallback
+    call, calls = flaky([])
+    asyncio.run(call_with_retry(call, "big", "small", time.time() + 5))
+    assert calls == ["small"]
+
+
+if __name__ == "__main__":
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(llm_retry, "BACKOFF_BASE", 0.01)
+        test_retries_429_and_5xx()
+        test_client_errors_are_not_retried()
+        test_fallback_near_deadline()
+    print("Test Passed")
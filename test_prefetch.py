@@ -0,0 +1,61 @@
+"""
+Check the deterministic quiz page prefetch on an atob()-encoded page
+"""
+
+import asyncio
+import base64
+import os
+import subprocess
+import sys
+
+from fetcher import needs_render
+from prefetch import summarize_quiz
+
+URL = "https://example.com/quiz-1"
+DECODED = (
+    '<p>Download <a href="/data/values.csv">this file</a>. '
+    'What is the sum of the value column?</p>'
+    '<pre>POST your answer to https://example.com/submit\n{"answer": 123}</pre>'
+)
+PAGE = (
+    '<html><body><div id="result"></div><script>'
+    'document.querySelector("#result").innerHTML = atob(`'
+    + base64.b64encode(DECODED.encode()).decode()
+    + '`);</script></body></html>'
+)
+
+
+def test_atob_page_needs_no_browser():
+    assert needs_render(PAGE) is None
+    assert needs_render(PAGE, decodes_atob=False) == "atob payload"
+
+
+def test_summary():
+    summary = asyncio.run(summarize_quiz(PAGE, URL))
+    print(summary)
+    assert "sum of the value column" in summary["question"]
+    assert summary["submit_url"] == "https://example.com/submit"
+    assert summary["data_links"] == ["https://example.com/data/values.csv"]
+
+
+def test_link_order_is_stable():
+    # A link in the raw page and one in the decoded payload, read under different hash seeds
+    page = PAGE.replace("<body>", '<body><a href="/help.html">help</a>')
+    script = (
+        "import asyncio, json, sys; from prefetch import summarize_quiz; "
+        "print(json.dumps(asyncio.run(summarize_quiz(sys.argv[1], sys.argv[2]))['data_links']))"
+    )
+    orders = set()
+    for seed in range(1, 7):
+        env = {**os.environ, "PYTHONHASHSEED": str(seed)}
+        out = subprocess.run([sys.executable, "-c", script, page, URL], env=env, capture_output=True, text=True, check=True)
+        orders.add(out.stdout.strip().splitlines()[-1])
+    print(orders)
+    assert orders == {'["https://example.com/help.html", "https://example.com/data/values.csv"]'}
+
+
+if __name__ == "__main__":
+    test_atob_page_needs_no_browser()
+    test_summary()
+    test_link_order_is_stable()
+    print("Test Passed")
@@ -0,0 +1,81 @@
+"""
+Check the shared Groq rate limiter
+
+Capacity taken in one process must be visible in another, waits must end
+as soon as the bucket has refilled, and Groq headers must adjust the state.
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from rate_limiter import GroqRateLimiter, parse_duration
+
+TPM = 6000  # refills 100 tokens per second
+
+
+def test_parse_duration():
+    assert parse_duration("2m59.56s") == 179.56
+    assert parse_duration("7.66s") == 7.66
+    assert parse_duration("120ms") == 0.12
+    assert parse_duration("3") == 3.0
+
+
+def test_shared_across_processes():
+    path = os.path.join(tempfile.mkdtemp(), "state.json")
+    # Another process spends the whole token budget
+    subprocess.run([
+        sys.executable, "-c",
+        "import asyncio, rate_limiter;"
+        f"asyncio.run(rate_limiter.GroqRateLimiter({path!r}, rpm=30, tpm={TPM}).acquire('m', {TPM}))"
+    ], check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+    limiter = GroqRateLimiter(path, rpm=30, tpm=TPM)
+    started = time.perf_counter()
+    asyncio.run(limiter.acquire("m", 50))
+    elapsed = time.perf_counter() - started
+    print(f"Waited {elapsed:.2f}s for 50 tokens after another process took {TPM}")
+    # 50 tokens at 100 tokens/s: about 0.5 s, woken without a polling delay
+    assert 0.4 < elapsed < 0.8
+
+
+def test_headers():
+    path = os.path.join(tempfile.mkdtemp(), "state.json")
+    limiter = GroqRateLimiter(path, rpm=30, tpm=TPM)
+    limiter.update_from_headers("m", 429, {"Retry-After": "0.3", "x-ratelimit-limit-tokens": "12000"})
+    started = time.perf_counter()
+    asyncio.run(limiter.acquire("m", 10))
+    elapsed = time.perf_counter() - started
+    print(f"Waited {elapsed:.2f}s after a 429 with retry-after 0.3")
+    assert 0.25 < elapsed < 0.6
+
+    limiter.update_from_headers("m", 200, {"x-ratelimit-remaining-tokens": "0"})
+    started = time.perf_counter()
+    asyncio.run(limiter.acquire("m", 200))
+    elapsed = time.perf_counter() - started
+    # The limit header raised the budget to 12000/min, i.e. 200 tokens/s
+    assert 0.8 < elapsed < 1.3
+
+
+def test_estimate_above_capacity():
+    path = os.path.join(tempfile.mkdtemp(), "state.json")
+    limiter = GroqRateLimiter(path, rpm=30, tpm=TPM)
+    # A 24000-token history estimate against a 6000 TPM budget must not wait forever
+    charged = asyncio.run(asyncio.wait_for(limiter.acquire("m", 4 * TPM), 2))
+    assert charged == TPM
+    # The real request used 500 tokens: 5500 of the full bucket come back
+    limiter.record_usage("m", charged, 500)
+    started = time.perf_counter()
+    asyncio.run(limiter.acquire("m", 5000))
+    assert time.perf_counter() - started < 0.2
+
+
+if __name__ == "__main__":
+    test_parse_duration()
+    test_shared_across_processes()
+    test_headers()
+    test_estimate_above_capacity()
+    print("Test Passed")
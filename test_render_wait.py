@@ -0,0 +1,91 @@
+"""
+Check the render wait strategies without a browser: the cap follows the
+quiz deadline, navigation never waits for networkidle, and a wait that
+times out still lets the page be read
+"""
+
+import asyncio
+import time
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+import browser
+from browser import MIN_RENDER_WAIT, RENDER_DEADLINE_RESERVE, load_page, wait_budget
+
+
+class FakePage:
+    def __init__(self, selector_appears=True):
+        self.selector_appears = selector_appears
+        self.calls = []
+
+    async def route(self, pattern, handler):
+        self.calls.append("route")
+
+    def on(self, event, handler):
+        pass
+
+    async def add_init_script(self, script):
+        self.calls.append("init_script")
+
+    async def goto(self, url, wait_until, timeout):
+        self.calls.append(("goto", wait_until, timeout))
+
+    async def wait_for_selector(self, selector, state, timeout):
+        self.calls.append(("selector", selector))
+        if not self.selector_appears:
+            raise PlaywrightTimeoutError("timeout")
+
+    async def wait_for_load_state(self, state, timeout):
+        self.calls.append(("load_state", state))
+
+    async def evaluate(self, script, args):
+        quiet_ms, max_ms, grace_ms = args
+        self.calls.append(("quiescence", quiet_ms))
+        return "quiet"
+
+
+def test_wait_budget():
+    assert wait_budget(max_wait=15) == 15
+    # Far from the deadline the cap applies, close to it the reserve wins
+    assert wait_budget(time.time() + 600, max_wait=15) == 15
+    assert abs(wait_budget(time.time() + RENDER_DEADLINE_RESERVE + 5, max_wait=15) - 5) < 0.1
+    assert wait_budget(time.time(), max_wait=15) == MIN_RENDER_WAIT
+
+
+def test_strategies():
+    async def run(page, **kwargs):
+        return await load_page(page, "http://quiz.local/q1", **kwargs)
+
+    page = FakePage()
+    report = asyncio.run(run(page, strategy="quiet"))
+    assert report["wait"] == "quiet" and report["blocked"] == 0
+    # Blocking is in place before anything loads
+    assert page.calls[:2] == ["route", "init_script"]
+    assert page.calls[2][:2] == ("goto", "domcontentloaded")
+    assert page.calls[3] == ("quiescence", browser.RENDER_QUIET_MS)
+
+    page = FakePage()
+    assert asyncio.run(run(page, strategy="networkidle", deadline=time.time() + 600))["wait"] == "networkidle"
+    assert page.calls[1][:2] == ("goto", "domcontentloaded")
+    assert page.calls[1][2] <= browser.RENDER_MAX_WAIT * 1000
+    assert page.calls[2] == ("load_state", "networkidle")
+
+    page = FakePage()
+    assert asyncio.run(run(page, wait_for="text=Submit"))["wait"] == "selector"
+    assert ("selector", "text=Submit") in page.calls and "init_script" not in page.calls
+
+    page = FakePage(selector_appears=False)
+    assert asyncio.run(run(page, wait_for="#result"))["wait"] == "cap"
+
+    try:
+        asyncio.run(run(FakePage(), strategy="sleep"))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unknown strategy accepted")
+
+
+if __name__ == "__main__":
+    test_wait_budget()
+    test_strategies()
+    print("Test Passed")
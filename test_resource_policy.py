@@ -0,0 +1,118 @@
+"""
+Check the render resource policy: images, fonts, stylesheets and trackers
+are aborted, page content is let through, per-call overrides apply and
+blocked requests are counted
+"""
+
+import asyncio
+
+from resource_policy import ALLOW_ALL, DEFAULT_BYTES, DEFAULT_POLICY, TYPICAL_BYTES, ResourcePolicy, allowing
+
+
+class FakeRequest:
+    def __init__(self, url, resource_type):
+        self.url = url
+        self.resource_type = resource_type
+
+
+class FakeRoute:
+    def __init__(self, url, resource_type):
+        self.request = FakeRequest(url, resource_type)
+        self.outcome = None
+
+    async def continue_(self):
+        self.outcome = "continued"
+
+    async def abort(self, reason):
+        self.outcome = "aborted"
+
+
+class FakeResponse:
+    def __init__(self, url, headers):
+        self.url = url
+        self.headers = headers
+
+
+class FakePage:
+    def __init__(self):
+        self.handler = None
+        self.listeners = {}
+
+    async def route(self, pattern, handler):
+        self.handler = handler
+
+    def on(self, event, handler):
+        self.listeners[event] = handler
+
+
+REQUESTS = [
+    ("https://quiz.example.com/q1", "document"),
+    ("https://quiz.example.com/app.js", "script"),
+    ("https://quiz.example.com/api/data.json", "fetch"),
+    ("https://quiz.example.com/logo.png", "image"),
+    ("https://fonts.gstatic.com/roboto.woff2", "font"),
+    ("https://quiz.example.com/style.css", "stylesheet"),
+    ("https://www.google-analytics.com/analytics.js", "script"),
+]
+
+
+def test_decisions():
+    blocked = [url for url, kind in REQUESTS if DEFAULT_POLICY.blocks(kind, url)]
+    assert blocked == [
+        "https://quiz.example.com/logo.png",
+        "https://fonts.gstatic.com/roboto.woff2",
+        "https://quiz.example.com/style.css",
+        "https://www.google-analytics.com/analytics.js",
+    ]
+    assert not any(ALLOW_ALL.blocks(kind, url) for url, kind in REQUESTS)
+
+    # A page that draws its question into an image needs images back
+    with_images = DEFAULT_POLICY.override(allow_types=["image"], block_hosts=["cdn.ads.example"])
+    assert not with_images.blocks("image", "https://quiz.example.com/logo.png")
+    assert with_images.blocks("script", "https://x.cdn.ads.example/ad.js")
+    assert with_images.blocks("font", "https://fonts.gstatic.com/roboto.woff2")
+
+    trusted = ResourcePolicy(allow_hosts=["quiz.example.com"])
+    assert not trusted.blocks("stylesheet", "https://quiz.example.com/style.css")
+    assert trusted.blocks("stylesheet", "https://other.example.com/style.css")
+
+
+def test_tool_overrides():
+    assert allowing(None) is DEFAULT_POLICY and allowing("all") is ALLOW_ALL
+    policy = allowing("Image, fonts.gstatic.com")
+    assert not policy.blocks("image", "https://quiz.example.com/logo.png")
+    assert not policy.blocks("font", "https://fonts.gstatic.com/roboto.woff2")
+    assert policy.blocks("stylesheet", "https://quiz.example.com/style.css")
+    try:
+        allowing("images")
+    except ValueError as e:
+        assert "images" in str(e)
+    else:
+        raise AssertionError("expected a ValueError")
+
+
+def test_stats():
+    async def run():
+        page = FakePage()
+        stats = await DEFAULT_POLICY.install(page)
+        routes = [FakeRoute(url, kind) for url, kind in REQUESTS]
+        for route in routes:
+            await page.handler(route)
+            if route.outcome == "continued":
+                page.listeners["response"](FakeResponse(route.request.url, {"content-length": "1000"}))
+        return stats, routes
+
+    stats, routes = asyncio.run(run())
+    assert [r.outcome for r in routes].count("aborted") == 4
+    report = stats.as_dict()
+    assert report["requests"] == 7 and report["blocked"] == 4
+    assert report["blocked_by_type"] == {"image": 1, "font": 1, "stylesheet": 1, "script": 1}
+    assert report["blocked_bytes_estimate"] == TYPICAL_BYTES["image"] + TYPICAL_BYTES["font"] + TYPICAL_BYTES["stylesheet"] + DEFAULT_BYTES
+    assert report["loaded_bytes"] == 3000
+
+
+if __name__ == "__main__":
+    test_decisions()
+    test_tool_overrides()
+    test_stats()
+    print("Test Passed")
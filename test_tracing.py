@@ -0,0 +1,169 @@
+"""
+Check span tracing: nested spans share a trace and inherit the job/quiz
+context, tools run inside spans, exported files are valid OTLP/JSON and
+rotate at their size cap, and the per-quiz breakdown adds up the time per
+category, filing a prefetch under the fetch tier it actually used
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+from langchain_core.messages import HumanMessage
+from langchain_core.tools import tool
+import pytest
+
+import agent
+import tracing
+from tracing import format_breakdown, quiz_breakdown, read_spans, span, trace_context, trace_tools
+
+TRACE_FILE = os.path.join(tempfile.mkdtemp(), "traces.jsonl")
+
+
+@tool
+async def download_file(url: str) -> str:
+    """Fake download"""
+    await asyncio.sleep(0.05)
+    if "missing" in url:
+        return "Error: 404"
+    return "saved"
+
+
+def use_trace_file():
+    # Other modules may already have started an exporter on the default path
+    tracing.flush()
+    tracing.ENABLED = True
+    tracing.TRACE_PATH = TRACE_FILE
+    tracing._exporter_instance = None
+
+
+def test_nested_spans_and_export():
+    use_trace_file()
+    with trace_context(job_id="job-1", quiz_url="https://quiz.example.com/q1", attempt=1):
+        with span("agent.turn", "turn") as turn:
+            with span("llm.call", "llm", model="m") as call:
+                time.sleep(0.02)
+            try:
+                with span("solver.execute", "code"):
+                    raise ValueError("boom")
+            except ValueError:
+                pass
+    tracing.flush()
+
+    assert call.trace_id == turn.trace_id and call.parent_id == turn.span_id
+    assert call.attributes["job_id"] == "job-1" and call.attributes["category"] == "llm"
+
+    with open(TRACE_FILE) as f:
+        request = json.loads(f.readline())
+    resource = request["resourceSpans"][0]
+    assert resource["resource"]["attributes"][0] == {"key": "service.name", "value": {"stringValue": tracing.SERVICE_NAME}}
+    exported = {s["name"]: s for s in resource["scopeSpans"][0]["spans"]}
+    assert exported["llm.call"]["parentSpanId"] == turn.span_id
+    assert exported["solver.execute"]["status"]["code"] == 2
+    assert exported["solver.execute"]["events"][0]["name"] == "exception"
+    assert {"key": "attempt", "value": {"intValue": "1"}} in exported["llm.call"]["attributes"]
+
+
+def test_trace_tools():
+    trace_tools([download_file])
+    # Wrapping twice must not nest spans
+    trace_tools([download_file])
+
+    async def run():
+        with trace_context(job_id="job-2", quiz_url="https://quiz.example.com/q2", attempt=2):
+            await download_file.ainvoke({"url": "https://quiz.example.com/data.csv"})
+            await download_file.ainvoke({"url": "https://quiz.example.com/missing.csv"})
+
+    asyncio.run(run())
+    tool_spans = [s for s in tracing._exporter().snapshot() if s.attributes.get("job_id") == "job-2"]
+    assert [s.name for s in tool_spans] == ["tool.download_file", "tool.download_file"]
+    assert tool_spans[0].attributes["tool.arg.url"] == "https://quiz.example.com/data.csv"
+    assert tool_spans[0].attributes["category"] == "download"
+    assert tool_spans[0].error is None and tool_spans[1].error == "Error: 404"
+
+
+def test_breakdown():
+    tracing.flush()
+    quizzes = quiz_breakdown(read_spans(TRACE_FILE))
+    by_job = {q["job_id"]: q for q in quizzes}
+    first = by_job["job-1"]
+    assert first["quiz_url"] == "https://quiz.example.com/q1"
+    # The turn span only contains the others, so it is not counted
+    assert set(first["seconds"]) == {"llm", "code"} and first["seconds"]["llm"] >= 0.02
+    assert first["errors"] == 1
+    second = by_job["job-2"]
+    assert second["attempts"] == 2 and second["seconds"]["download"] >= 0.1
+
+    # The in-process view agrees with the exported file
+    assert quiz_breakdown(job_id="job-2")[0]["attempts"] == 2
+    text = format_breakdown(quizzes)
+    print(text)
+    assert "https://quiz.example.com/q2" in text and "download" in text
+
+
+def test_prefetch_category(monkeypatch):
+    use_trace_file()
+
+    async def fake_prefetch(url, deadline=None):
+        await asyncio.sleep(0.02)
+        tier = "browser" if "rendered" in url else "http"
+        return {"question": "q", "submit_url": None, "data_links": [], "fetched_via": tier}
+
+    monkeypatch.setattr(agent, "prefetch_quiz", fake_prefetch)
+
+    async def run():
+        with tracing.trace_context(job_id="job-3"):
+            for url in ("https://quiz.example.com/static", "https://quiz.example.com/rendered"):
+                await agent.prefetch_node({"messages": [HumanMessage(content=url)]})
+
+    asyncio.run(run())
+    by_url = {q["quiz_url"]: q["seconds"] for q in quiz_breakdown(job_id="job-3")}
+    assert set(by_url["https://quiz.example.com/static"]) == {"fetch"}
+    assert set(by_url["https://quiz.example.com/rendered"]) == {"render"}
+
+
+def test_job_span_is_not_a_quiz():
+    use_trace_file()
+    with trace_context(job_id="job-5"), span("job", "job"):
+        for url in ("https://quiz.example.com/q5", "https://quiz.example.com/q6"):
+            with trace_context(quiz_url=url, attempt=1), span("llm.call", "llm"):
+                time.sleep(0.01)
+
+    # Only the two quizzes, no row for the job span that spans both
+    assert [q["quiz_url"] for q in quiz_breakdown(job_id="job-5")] == [
+        "https://quiz.example.com/q5", "https://quiz.example.com/q6"
+    ]
+
+
+def test_rotation(monkeypatch):
+    path = os.path.join(tempfile.mkdtemp(), "traces.jsonl")
+    monkeypatch.setattr(tracing, "MAX_TRACE_BYTES", 2000)
+    exporter = tracing._Exporter(path)
+    with trace_context(job_id="job-4"):
+        for i in range(40):
+            with span(f"step.{i}", "code") as current:
+                pass
+            exporter._export([current])
+
+    # One older generation is kept next to the live file, both under the cap
+    assert sorted(os.listdir(os.path.dirname(path))) == ["traces.jsonl", "traces.jsonl.1"]
+    assert all(os.path.getsize(p) <= 2000 for p in (path, path + ".1"))
+    names = [s["name"] for s in read_spans(path)]
+    assert names == sorted(names, key=lambda n: int(n.split(".")[1]))
+    assert names[-1] == "step.39" and len(names) > 1
+
+
+if __name__ == "__main__":
+    test_nested_spans_and_export()
+    test_trace_tools()
+    test_breakdown()
+    with pytest.MonkeyPatch.context() as mp:
+        test_prefetch_category(mp)
+    test_job_span_is_not_a_quiz()
+    with pytest.MonkeyPatch.context() as mp:
+        test_rotation(mp)
+    print("Test Passed")
@@ -0,0 +1,50 @@
+"""
+Check run_code workspaces: only registered downloads are copied in,
+databases and logs in LLMFiles are not copied, and code that rewrites an input
+changes neither the shared file nor the cached blob behind it
+"""
+
+import os
+import tempfile
+
+import cache
+from tools.workspace import create_workspace, register_input
+
+URL = "https://quiz.example.com/data.csv"
+
+
+def test_workspace_inputs():
+    workdir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        store = cache.ContentCache(root=os.path.join("LLMFiles", ".cache"))
+        key = store.make_key(URL)
+        entry = store.put_bytes(key, URL, b"a,b\n1,2\n")
+        store.materialize(entry, os.path.join("LLMFiles", "data.csv"))
+        register_input("data.csv")
+        register_input("data.csv")
+        for name in ("jobs.sqlite3", "checkpoints.sqlite3-wal", "fetch_stats.jsonl", "notes.txt"):
+            with open(os.path.join("LLMFiles", name), "w") as f:
+                f.write("private")
+        register_input("../escape.txt")
+
+        _, path = create_workspace()
+        assert sorted(os.listdir(path)) == ["data.csv"]
+        assert not os.path.islink(os.path.join(path, "data.csv"))
+
+        # What user code running as root could do
+        with open(os.path.join(path, "data.csv"), "w") as f:
+            f.write("a,b,c\n1,2,3\n")
+        with open(os.path.join("LLMFiles", "data.csv")) as f:
+            assert f.read() == "a,b\n1,2\n"
+        assert store.read_text(store.lookup(key)) == "a,b\n1,2\n"
+        with open(os.path.join("LLMFiles", ".inputs")) as f:
+            assert f.read() == "data.csv\n"
+    finally:
+        os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    test_workspace_inputs()
+    print("Test Passed")
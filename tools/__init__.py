@@ -1,5 +1,5 @@
 from .web_scraper import get_rendered_html
-from .run_code import run_code
+from .run_code import run_code, get_run_output
 from .send_request import post_request
 from .download_file import download_file
 from .add_dependencies import add_dependencies
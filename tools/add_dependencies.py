@@ -1,8 +1,8 @@
 from langchain_core.tools import tool
-import subprocess
+import asyncio
 
 @tool
-def add_dependencies(package_name: str) -> str:
+async def add_dependencies(package_name: str) -> str:
     """
     Dynamically install a Python package using uv.
 
@@ -22,17 +22,22 @@ def add_dependencies(package_name: str) -> str:
     try:
         print(f"\\nInstalling package: {package_name}")
 
-        result = subprocess.run(
-            ["uv", "add", package_name],
-            capture_output=True,
-            text=True,
-            timeout=60
+        proc = await asyncio.create_subprocess_exec(
+            "uv", "add", package_name,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
         )
+        try:
+            _, stderr = await asyncio.wait_for(proc.communicate(), timeout=60)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            return f"Error installing {package_name}: timed out after 60 seconds"
 
-        if result.returncode == 0:
+        if proc.returncode == 0:
             return f"Successfully installed {package_name}"
         else:
-            return f"Error installing {package_name}: {result.stderr}"
+            return f"Error installing {package_name}: {stderr.decode('utf-8', errors='replace')}"
 
     except Exception as e:
         return f"Error: {str(e)}"
@@ -0,0 +1,215 @@
+"""
+Warm Python Worker Pool
+Keeps pre-imported Python processes ready so run_code skips interpreter
+start-up and the pandas/numpy/matplotlib imports on every call
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+import signal
+import sys
+
+logger = logging.getLogger(__name__)
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "code_worker.py")
+POOL_SIZE = int(os.getenv("CODE_WORKERS", "2"))
+RECYCLE_AFTER_RUNS = int(os.getenv("CODE_WORKER_RECYCLE_RUNS", "200"))
+RECYCLE_RSS_MB = int(os.getenv("CODE_WORKER_RECYCLE_RSS_MB", "1024"))
+START_TIMEOUT = 120
+
+
+def available() -> bool:
+    """Forked execution needs os.fork, i.e. Linux/macOS"""
+    return hasattr(os, "fork")
+
+
+def _rss_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0.0
+
+
+class _Worker:
+    """One pre-imported Python process talking JSON lines over its pipes"""
+
+    def __init__(self):
+        self.proc = None
+        self.runs = 0
+        self.child = None
+
+    async def start(self):
+        self.proc = await asyncio.create_subprocess_exec(
+            sys.executable, WORKER_SCRIPT,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE
+        )
+        line = await asyncio.wait_for(self.proc.stdout.readline(), START_TIMEOUT)
+        if not line:
+            raise RuntimeError("Code worker exited during start-up")
+        logger.info(f"Code worker {self.proc.pid} ready")
+
+    async def execute(self, job: dict) -> dict:
+        self.proc.stdin.write((json.dumps(job) + "\n").encode("utf-8"))
+        await self.proc.stdin.drain()
+        while True:
+            line = await self.proc.stdout.readline()
+            if not line:
+                raise RuntimeError("Code worker died while running code")
+            message = json.loads(line)
+            if "child" not in message:
+                break
+            # The forked child is announced before the worker starts waiting on it
+            self.child = message["child"]
+        self.child = None
+        self.runs += 1
+        return message
+
+    def kill_child(self):
+        """Kill the snippet still running for this worker, with everything it spawned"""
+        if self.child is None:
+            return
+        child, self.child = self.child, None
+        # The child calls setsid() first thing; until then its group is the worker's
+        for kill, target in ((os.killpg, child), (os.kill, child)):
+            try:
+                kill(target, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+
+    def worn_out(self) -> bool:
+        return self.runs >= RECYCLE_AFTER_RUNS or _rss_mb(self.proc.pid) >= RECYCLE_RSS_MB
+
+    async def stop(self):
+        if self.proc is None or self.proc.returncode is not None:
+            return
+        self.proc.stdin.close()
+        try:
+            await asyncio.wait_for(self.proc.wait(), 5)
+        except asyncio.TimeoutError:
+            self.proc.kill()
+            await self.proc.wait()
+
+
+class CodeWorkerPool:
+    """
+    Fixed-size pool of warm workers
+
+    Each call takes an idle worker, which forks a child to run the snippet,
+    so runs never share state. Workers are replaced after
+    ``CODE_WORKER_RECYCLE_RUNS`` runs, when they grow past
+    ``CODE_WORKER_RECYCLE_RSS_MB``, or if they die.
+    """
+
+    def __init__(self, size: int = POOL_SIZE):
+        self.size = max(1, size)
+        self._idle = asyncio.Queue()
+        self._spawned = 0
+        self._ids = itertools.count()
+        self._workers = set()
+        self._background = set()
+
+    async def start(self):
+        """Spawn every worker up front so the first run_code call is warm"""
+        missing = self.size - self._spawned
+        self._spawned += missing
+        results = await asyncio.gather(*(self._spawn() for _ in range(missing)), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                self._spawned -= 1
+                logger.error(f"Could not start code worker: {result}")
+            else:
+                self._idle.put_nowait(result)
+
+    async def run(self, code: str, cwd: str, stdout_path: str, stderr_path: str, timeout: float = None, limits: dict = None) -> dict:
+        """
+        Execute ``code`` with ``cwd`` as working directory
+
+        Output is written to ``stdout_path`` and ``stderr_path`` as it is
+        produced. ``limits`` holds rlimits (cpu_seconds, memory_mb,
+        open_files, file_mb) applied to the child.
+
+        Returns:
+            Dict with return_code, timed_out and seconds
+        """
+        job = {
+            "id": next(self._ids),
+            "code": code,
+            "cwd": os.path.abspath(cwd),
+            "stdout_path": os.path.abspath(stdout_path),
+            "stderr_path": os.path.abspath(stderr_path),
+            "timeout": timeout,
+            "limits": limits or {}
+        }
+        worker = await self._checkout()
+        healthy = False
+        try:
+            # The worker enforces the timeout itself; this only guards against a stuck worker
+            result = await asyncio.wait_for(worker.execute(job), timeout + 30 if timeout else None)
+            healthy = True
+            if result.get("error"):
+                raise RuntimeError(result["error"])
+            return {k: result[k] for k in ("return_code", "timed_out", "seconds")}
+        finally:
+            if healthy and not worker.worn_out():
+                self._idle.put_nowait(worker)
+            else:
+                # A stuck or cancelled run must not outlive its worker: the child
+                # is in its own session, so stopping the worker would not reach it
+                worker.kill_child()
+                task = asyncio.create_task(self._replace(worker))
+                self._background.add(task)
+                task.add_done_callback(self._background.discard)
+
+    async def shutdown(self):
+        workers, self._workers = list(self._workers), set()
+        await asyncio.gather(*(w.stop() for w in workers), return_exceptions=True)
+
+    async def _checkout(self) -> _Worker:
+        if self._idle.empty() and self._spawned < self.size:
+            self._spawned += 1
+            try:
+                return await self._spawn()
+            except Exception:
+                self._spawned -= 1
+                raise
+        return await self._idle.get()
+
+    async def _spawn(self) -> _Worker:
+        worker = _Worker()
+        await worker.start()
+        self._workers.add(worker)
+        return worker
+
+    async def _replace(self, worker: _Worker):
+        logger.info(f"Recycling code worker {worker.proc.pid} after {worker.runs} runs")
+        self._workers.discard(worker)
+        await worker.stop()
+        try:
+            self._idle.put_nowait(await self._spawn())
+        except Exception as e:
+            self._spawned -= 1
+            logger.error(f"Could not restart code worker: {e}")
+
+
+_pool = None
+
+
+def get_code_pool() -> CodeWorkerPool:
+    """Return the shared worker pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        _pool = CodeWorkerPool()
+    return _pool
+
+
+async def shutdown_code_pool():
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        await pool.shutdown()
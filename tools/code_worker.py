@@ -0,0 +1,195 @@
+"""
+Warm Python worker for run_code
+
+Started by tools/code_pool.py as a plain script (not as part of the tools
+package) so it stays light. It imports the heavy data libraries once, then
+reads JSON jobs from stdin, one per line. Each job runs in a forked child
+process, so every snippet starts from the same clean, pre-imported state and
+nothing it defines or patches leaks into the next run.
+"""
+
+import builtins
+import importlib
+import json
+import os
+import signal
+import sys
+import time
+import traceback
+
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+PRELOAD = [m for m in os.getenv("CODE_WORKER_PRELOAD", "numpy,pandas,matplotlib.pyplot,requests").split(",") if m]
+
+
+def _preload():
+    for name in PRELOAD:
+        try:
+            importlib.import_module(name.strip())
+        except Exception as e:
+            print(f"code_worker: could not preload {name}: {e}", file=sys.stderr)
+
+
+def _data_bytes() -> int:
+    """Private writable memory this process already has mapped (VmData)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmData:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+def _apply_limits(limits: dict):
+    """
+    Set CPU, memory, open file and file size rlimits for this process
+
+    Memory is capped with RLIMIT_DATA (heap and private writable mappings),
+    not RLIMIT_AS: the preloaded libraries and BLAS thread pools reserve
+    address space they never touch, so an address space cap fails at
+    sizes that have nothing to do with what the snippet allocates. The cap
+    is ``memory_mb`` on top of what the worker had mapped when it forked.
+    """
+    try:
+        import resource
+    except ImportError:
+        return
+    mb = 1024 * 1024
+    for name, key, scale, base in (
+        ("RLIMIT_CPU", "cpu_seconds", 1, 0),
+        ("RLIMIT_DATA", "memory_mb", mb, _data_bytes()),
+        ("RLIMIT_NOFILE", "open_files", 1, 0),
+        ("RLIMIT_FSIZE", "file_mb", mb, 0),
+    ):
+        value = limits.get(key)
+        if not value or not hasattr(resource, name):
+            continue
+        limit = getattr(resource, name)
+        soft = int(value * scale) + base
+        _, hard = resource.getrlimit(limit)
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        try:
+            resource.setrlimit(limit, (soft, hard))
+        except (ValueError, OSError):
+            pass
+
+
+def _exec_child(job: dict, proto_fd: int):
+    """Runs inside the forked child and never returns"""
+    return_code = 0
+    try:
+        # Own process group, so a timeout also kills anything the code spawns
+        os.setsid()
+        os.close(proto_fd)
+        flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+        os.dup2(os.open(os.devnull, os.O_RDONLY), 0)
+        os.dup2(os.open(job["stdout_path"], flags, 0o644), 1)
+        os.dup2(os.open(job["stderr_path"], flags, 0o644), 2)
+        # Line buffering lets the parent follow the output while it runs
+        sys.stdout.reconfigure(line_buffering=True)
+        sys.stderr.reconfigure(line_buffering=True)
+        _apply_limits(job.get("limits") or {})
+        os.chdir(job.get("cwd") or ".")
+        sys.path[0] = os.getcwd()
+        sys.argv = ["runner.py"]
+        importlib.invalidate_caches()
+
+        namespace = {"__name__": "__main__", "__file__": "runner.py", "__builtins__": builtins}
+        exec(compile(job["code"], "runner.py", "exec"), namespace)
+    except SystemExit as e:
+        if e.code is None:
+            return_code = 0
+        elif isinstance(e.code, int):
+            return_code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            return_code = 1
+    except BaseException:
+        # Drop this module's frame so the traceback starts at the user's code
+        _, value, tb = sys.exc_info()
+        traceback.print_exception(type(value), value, tb.tb_next)
+        return_code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(return_code & 0xFF)
+
+
+def _kill_group(pid: int):
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def run_job(job: dict, proto) -> dict:
+    """
+    Execute one snippet in a forked child
+
+    Output goes straight to ``stdout_path``/``stderr_path`` so the caller can
+    read it while the code is still running. The child's pid is announced on
+    ``proto`` first, so the pool can kill its process group if this worker
+    stops responding. The child is killed with its whole process group once
+    ``timeout`` seconds have passed.
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    started = time.monotonic()
+    pid = os.fork()
+    if pid == 0:
+        _exec_child(job, proto.fileno())
+    proto.write(json.dumps({"id": job.get("id"), "child": pid}) + "\n")
+
+    timeout = job.get("timeout")
+    deadline = started + timeout if timeout else None
+    timed_out = False
+    delay = 0.002
+    while True:
+        done, status = os.waitpid(pid, os.WNOHANG)
+        if done:
+            break
+        if deadline is not None and time.monotonic() >= deadline:
+            timed_out = True
+            _kill_group(pid)
+            _, status = os.waitpid(pid, 0)
+            break
+        time.sleep(delay)
+        delay = min(delay * 2, 0.05)
+
+    # Reap anything the snippet left running in the background
+    _kill_group(pid)
+    return {
+        "id": job.get("id"),
+        "return_code": os.waitstatus_to_exitcode(status),
+        "timed_out": timed_out,
+        "seconds": round(time.monotonic() - started, 3)
+    }
+
+
+def main():
+    # Keep the real stdout for the protocol; stray prints from imports go to stderr
+    proto_fd = os.dup(1)
+    os.dup2(2, 1)
+    proto = os.fdopen(proto_fd, "w", buffering=1, encoding="utf-8")
+
+    _preload()
+    proto.write(json.dumps({"ready": True, "pid": os.getpid()}) + "\n")
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        job = json.loads(line)
+        try:
+            result = run_job(job, proto)
+        except Exception as e:
+            result = {"id": job.get("id"), "return_code": -1, "timed_out": False, "error": str(e)}
+        proto.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,61 @@
 from langchain_core.tools import tool
-import requests
+from cache import get_cache
+from http_client import async_client
+from .workspace import register_input
+import asyncio
+import hashlib
+import httpx
+import mmap
 import os
+import time
+
+CHUNK_SIZE = 256 * 1024
+MAX_DOWNLOAD_BYTES = int(os.getenv("DOWNLOAD_MAX_MB", "500")) * 1024 * 1024
+RESUME_ATTEMPTS = int(os.getenv("DOWNLOAD_RESUME_ATTEMPTS", "3"))
+USE_MMAP = os.getenv("DOWNLOAD_USE_MMAP", "0") == "1"
+PROGRESS_EVERY = 10 * 1024 * 1024
+
+
+class DownloadTooLarge(Exception):
+    """Raised when a download exceeds DOWNLOAD_MAX_MB"""
+
 
 @tool
-def download_file(url: str, filename: str = None) -> str:
+async def download_file(url: str, filename: str = None, use_cache: bool = True) -> dict:
     """
     Download a file from a URL and save it to the LLMFiles directory.
 
     Use this tool for direct file downloads (PDFs, CSVs, images, etc.).
     DO NOT use get_rendered_html for file URLs.
 
+    Files are served from a local cache when the same URL was downloaded
+    recently; each call saves a fresh private copy of the file.
+
     Parameters
     ----------
     url : str
         The URL of the file to download.
     filename : str, optional
         The name to save the file as. If not provided, extracts from URL.
+    use_cache : bool, optional
+        Set to False to force a fresh download (the cache is still updated).
 
     Returns
     -------
-    str
-        The saved filename (relative to LLMFiles directory).
+    dict
+        {
+            "filename": <saved filename, relative to LLMFiles directory>,
+            "bytes": <file size>,
+            "seconds": <time spent>,
+            "throughput_mb_s": <download speed>,
+            "resumed": <number of times a dropped connection was resumed>,
+            "source": "network" | "cache" | "revalidated"
+        }
+        On failure: {"error": <what went wrong>, "url": <url>, "filename": <name it would have had>}
     """
     try:
         print(f"\\nDownloading file from: {url}")
+        started = time.perf_counter()
 
         # Make directory if needed
         os.makedirs("LLMFiles", exist_ok=True)
@@ -31,18 +63,149 @@ def download_file(url: str, filename: str = None) -> str:
         # Get filename from URL if not provided
         if not filename:
             filename = url.split("/")[-1].split("?")[0]
+        filepath = os.path.join("LLMFiles", filename)
 
-        # Download file
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
+        cache = get_cache()
+        key = cache.make_key(url)
+        entry = await asyncio.to_thread(cache.lookup, key) if use_cache else None
 
-        # Save to LLMFiles
-        filepath = os.path.join("LLMFiles", filename)
-        with open(filepath, "wb") as f:
-            f.write(response.content)
+        if entry and entry["fresh"]:
+            await asyncio.to_thread(_save, cache, entry, filepath, filename)
+            print(f"Served from cache: {filepath}")
+            return _result(filename, entry["size"], started, 0, "cache")
+
+        # Stream the body straight to disk, revalidating a stale cache entry if we have one
+        part_path = cache.temp_path()
+        try:
+            # The shared client keeps the connection to the quiz host open between calls
+            download = await _stream_to_file(async_client(), url, cache.validators(entry), part_path)
+
+            if download["status"] == 304 and entry:
+                await asyncio.to_thread(cache.refresh, key)
+                await asyncio.to_thread(_save, cache, entry, filepath, filename)
+                print(f"Not modified, served from cache: {filepath}")
+                return _result(filename, entry["size"], started, 0, "revalidated")
+
+            # Move into the cache and copy into LLMFiles
+            entry = await asyncio.to_thread(
+                cache.put_file, key, url, part_path, download["headers"], None, download["digest"]
+            )
+        finally:
+            if os.path.exists(part_path):
+                os.unlink(part_path)
+
+        await asyncio.to_thread(_save, cache, entry, filepath, filename)
 
         print(f"Saved to: {filepath}")
-        return filename
+        return _result(filename, entry["size"], started, download["resumed"], "network")
 
     except Exception as e:
-        return f"Error downloading file: {str(e)}"
+        return {"error": f"Error downloading file: {str(e)}", "url": url, "filename": filename}
+
+
+def _save(cache, entry, filepath: str, filename: str):
+    """Copy the cached body to LLMFiles and share it with later code runs"""
+    cache.materialize(entry, filepath)
+    register_input(filename)
+
+
+def _result(filename: str, size: int, started: float, resumed: int, source: str) -> dict:
+    seconds = time.perf_counter() - started
+    return {
+        "filename": filename,
+        "bytes": size,
+        "seconds": round(seconds, 3),
+        "throughput_mb_s": round(size / seconds / 1e6, 2) if seconds > 0 else None,
+        "resumed": resumed,
+        "source": source
+    }
+
+
+async def _stream_to_file(client: httpx.AsyncClient, url: str, headers: dict, path: str) -> dict:
+    """
+    Stream ``url`` into ``path`` in chunks, resuming with Range requests
+
+    Returns:
+        Dict with the final ``status``, response ``headers``, SHA-256
+        ``digest``, ``size`` and how many times the transfer was ``resumed``
+    """
+    # Identity encoding keeps byte offsets valid for Range resumes
+    headers = {**headers, "Accept-Encoding": "identity"}
+    hasher = hashlib.sha256()
+    written = 0
+    resumed = 0
+    validator = None
+    response_headers = {}
+    mm = None
+
+    with open(path, "w+b") as f:
+        try:
+            for attempt in range(RESUME_ATTEMPTS + 1):
+                request_headers = dict(headers)
+                if written:
+                    request_headers["Range"] = f"bytes={written}-"
+                    if validator:
+                        request_headers["If-Range"] = validator
+                try:
+                    async with client.stream("GET", url, headers=request_headers) as response:
+                        if response.status_code == 304:
+                            return {"status": 304, "headers": dict(response.headers), "digest": None, "size": 0, "resumed": resumed}
+                        response.raise_for_status()
+
+                        if written and response.status_code != 206:
+                            # The server ignored the range, start over from scratch
+                            print("Server does not support resume, restarting download")
+                            written = 0
+                            hasher = hashlib.sha256()
+                            f.truncate(0)
+
+                        if not written:
+                            # Unmap before starting over, also after a drop before the first chunk
+                            if mm is not None:
+                                mm.close()
+                                mm = None
+                            response_headers = dict(response.headers)
+                            validator = response.headers.get("etag") or response.headers.get("last-modified")
+                            length = int(response.headers.get("content-length") or 0)
+                            if length > MAX_DOWNLOAD_BYTES:
+                                raise DownloadTooLarge(f"File is {length} bytes, limit is {MAX_DOWNLOAD_BYTES}")
+                            if USE_MMAP and length:
+                                f.truncate(length)
+                                mm = mmap.mmap(f.fileno(), length)
+
+                        async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                            end = written + len(chunk)
+                            if end > MAX_DOWNLOAD_BYTES:
+                                raise DownloadTooLarge(f"Download exceeded {MAX_DOWNLOAD_BYTES} bytes")
+                            if mm is not None and end <= len(mm):
+                                mm[written:end] = chunk
+                            else:
+                                f.seek(written)
+                                f.write(chunk)
+                            hasher.update(chunk)
+                            if end // PROGRESS_EVERY > written // PROGRESS_EVERY:
+                                print(f"Downloaded {end / 1e6:.1f} MB")
+                            written = end
+                    break
+
+                except httpx.TransportError as e:
+                    if attempt == RESUME_ATTEMPTS:
+                        raise
+                    resumed += 1
+                    print(f"Connection dropped after {written} bytes ({e}), resuming")
+
+            if mm is not None:
+                mm.flush()
+        finally:
+            # Also on DownloadTooLarge, HTTP errors and failed resumes
+            if mm is not None:
+                mm.close()
+        f.truncate(written)
+
+    return {
+        "status": 200,
+        "headers": response_headers,
+        "digest": hasher.hexdigest(),
+        "size": written,
+        "resumed": resumed
+    }
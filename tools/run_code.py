@@ -1,34 +1,70 @@
 from langchain_core.tools import tool
-import subprocess
+from .code_pool import available, get_code_pool
+from .workspace import create_workspace, release_workspace
+from collections import OrderedDict
+import asyncio
 import os
+import signal
+import time
+
+TIMEOUT = float(os.getenv("RUN_CODE_TIMEOUT", "120"))
+LIMITS = {
+    "cpu_seconds": int(os.getenv("RUN_CODE_CPU_SECONDS", "120")),
+    "memory_mb": int(os.getenv("RUN_CODE_MEMORY_MB", "4096")),
+    "open_files": int(os.getenv("RUN_CODE_MAX_OPEN_FILES", "256")),
+    "file_mb": int(os.getenv("RUN_CODE_MAX_FILE_MB", "512")),
+}
+MAX_OUTPUT_CHARS = int(os.getenv("RUN_CODE_MAX_OUTPUT_CHARS", "20000"))
+KEEP_FINISHED_RUNS = 50
+
+# run_id -> {"task": asyncio.Task, "stdout_path": str, "stderr_path": str, "started": float}
+_runs = OrderedDict()
 
 @tool
-def run_code(code: str) -> dict:
+async def run_code(code: str, wait_seconds: float = None) -> dict:
     """
-    Executes Python code in an isolated subprocess using uv.
+    Executes Python code in an isolated subprocess.
 
     This tool:
       1. Takes in python code as input
-      2. Writes code into a temporary .py file
-      3. Executes the file using `uv run`
-      4. Returns its output
+      2. Runs it in a warm, pre-imported Python worker (numpy, pandas,
+         matplotlib and requests are already loaded), falling back to
+         `uv run` on platforms without fork
+      3. Returns its output
+
+    Every call starts from a clean interpreter state in its own scratch
+    directory: variables from earlier calls are not available. Files
+    downloaded with download_file can be opened by name; each run works on
+    its own copy. Files you write stay in this run's workspace; a later run
+    can read them at ../<run_id>/<name>.
+
+    Code is killed after a wall-clock timeout (120 s by default) and runs with
+    CPU, memory and open-file limits. Long stdout/stderr is truncated in the
+    middle with a marker.
 
     Parameters
     ----------
     code : str
         Python source code to execute.
+    wait_seconds : float, optional
+        Return after this many seconds even if the code is still running.
+        The result then has status "running" and the output so far; call
+        get_run_output with the run_id to follow it. By default the tool
+        waits until the code finishes.
 
     Returns
     -------
     dict
         {
+            "status": "completed" | "running" | "error",
             "stdout": <program output>,
             "stderr": <errors if any>,
-            "return_code": <exit code>
+            "return_code": <exit code>,
+            "run_id": <id of this run's workspace>
         }
+        "error" means the code could not be run at all; stderr says why.
     """
     try:
-        filename = "runner.py"
         os.makedirs("LLMFiles", exist_ok=True)
 
         # Strip code fences if present
@@ -39,26 +75,137 @@ def run_code(code: str) -> dict:
             code = code.rsplit("\\n", 1)[0]
         code = code.strip()
 
-        with open(os.path.join("LLMFiles", filename), "w", encoding="utf-8") as f:
-            f.write(code)
-
-        proc = subprocess.Popen(
-            ["uv", "run", filename],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            cwd="LLMFiles"
-        )
-        stdout, stderr = proc.communicate()
-
-        return {
-            "stdout": stdout,
-            "stderr": stderr,
-            "return_code": proc.returncode
+        # Isolated scratch directory, so concurrent runs cannot clobber each other
+        run_id, workspace = await asyncio.to_thread(create_workspace)
+        run = {
+            "stdout_path": os.path.join(workspace, ".stdout.log"),
+            "stderr_path": os.path.join(workspace, ".stderr.log"),
+            "started": time.monotonic()
         }
+        run["task"] = asyncio.create_task(_execute(code, workspace, run))
+        _runs[run_id] = run
+        _forget_old_runs()
+
+        return await _report(run_id, wait_seconds)
     except Exception as e:
         return {
+            "status": "error",
             "stdout": "",
             "stderr": str(e),
             "return_code": -1
         }
+
+
+@tool
+async def get_run_output(run_id: str, wait_seconds: float = 0) -> dict:
+    """
+    Check on a run_code execution that returned with status "running".
+
+    Parameters
+    ----------
+    run_id : str
+        The run_id returned by run_code.
+    wait_seconds : float, optional
+        Wait up to this many seconds for the run to finish before reporting.
+
+    Returns
+    -------
+    dict
+        Same shape as run_code: status, stdout/stderr so far, and the
+        return_code once the run has completed.
+    """
+    if run_id not in _runs:
+        return {"status": "error", "stdout": "", "stderr": f"Unknown run_id: {run_id}", "return_code": -1}
+    return await _report(run_id, wait_seconds)
+
+
+async def _report(run_id: str, wait_seconds: float = None) -> dict:
+    run = _runs[run_id]
+    try:
+        result = await asyncio.wait_for(asyncio.shield(run["task"]), wait_seconds)
+    except asyncio.TimeoutError:
+        return {
+            "status": "running",
+            "elapsed_seconds": round(time.monotonic() - run["started"], 1),
+            "stdout": _read_capped(run["stdout_path"]),
+            "stderr": _read_capped(run["stderr_path"]),
+            "run_id": run_id
+        }
+    except Exception as e:
+        result = {"status": "error", "stdout": "", "stderr": str(e), "return_code": -1}
+    return {**result, "run_id": run_id}
+
+
+async def _execute(code: str, workspace: str, run: dict) -> dict:
+    result = None
+    try:
+        if available():
+            status = await get_code_pool().run(
+                code, workspace, run["stdout_path"], run["stderr_path"], TIMEOUT, LIMITS
+            )
+        else:
+            status = await _execute_with_uv(code, workspace, run)
+
+        result = {
+            "status": "completed",
+            "stdout": _read_capped(run["stdout_path"]),
+            "stderr": _read_capped(run["stderr_path"]),
+            "return_code": status["return_code"]
+        }
+        if status.get("timed_out"):
+            result["timed_out"] = True
+            result["stderr"] += f"\n[Execution timed out after {TIMEOUT:.0f} seconds and was killed]"
+        elif status["return_code"] == -getattr(signal, "SIGXCPU", 0):
+            result["stderr"] += f"\n[CPU time limit of {LIMITS['cpu_seconds']} seconds exceeded]"
+        return result
+    finally:
+        release_workspace(workspace, success=bool(result) and result["return_code"] == 0)
+
+
+async def _execute_with_uv(code: str, workspace: str, run: dict) -> dict:
+    """Fallback for platforms without fork: one `uv run` per snippet"""
+    filename = "runner.py"
+    with open(os.path.join(workspace, filename), "w", encoding="utf-8") as f:
+        f.write(code)
+
+    with open(run["stdout_path"], "wb") as out, open(run["stderr_path"], "wb") as err:
+        proc = await asyncio.create_subprocess_exec(
+            "uv", "run", filename,
+            stdout=out,
+            stderr=err,
+            cwd=workspace
+        )
+        try:
+            await asyncio.wait_for(proc.wait(), TIMEOUT)
+            timed_out = False
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            timed_out = True
+    return {"return_code": proc.returncode, "timed_out": timed_out}
+
+
+def _read_capped(path: str, limit: int = MAX_OUTPUT_CHARS) -> str:
+    """Read an output file, keeping its head and tail if it is too long"""
+    try:
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            if size <= limit:
+                return f.read().decode("utf-8", errors="replace")
+            head = f.read(limit * 3 // 4)
+            f.seek(size - (limit - len(head)))
+            tail = f.read()
+    except OSError:
+        return ""
+    omitted = size - len(head) - len(tail)
+    return (
+        head.decode("utf-8", errors="replace")
+        + f"\n... [output truncated: {omitted} bytes omitted] ...\n"
+        + tail.decode("utf-8", errors="replace")
+    )
+
+
+def _forget_old_runs():
+    finished = [run_id for run_id, run in _runs.items() if run["task"].done()]
+    for run_id in finished[:max(0, len(finished) - KEEP_FINISHED_RUNS)]:
+        del _runs[run_id]
@@ -1,11 +1,12 @@
 from langchain_core.tools import tool
-import requests
+from http_client import async_client
+import httpx
 import json
 import os
 from typing import Any, Dict, Optional
 
 @tool
-def post_request(url: str, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> Any:
+async def post_request(url: str, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> Any:
     """
     Send an HTTP POST request to the given URL with the provided payload.
 
@@ -16,7 +17,7 @@ def post_request(url: str, payload: Dict[str, Any], headers: Optional[Dict[str,
     IMPORTANT: This tool automatically injects the email and secret credentials
     into the payload for quiz submissions. You do not need to add these fields manually.
 
-    REMEMBER: This a blocking function so it may take a while to return. Wait for the response.
+    REMEMBER: The server may take a while to respond. Wait for the response.
 
     Args:
         url (str): The endpoint to send the POST request to.
@@ -29,8 +30,8 @@ def post_request(url: str, payload: Dict[str, Any], headers: Optional[Dict[str,
         returned. Otherwise, the raw text response is returned.
 
     Raises:
-        requests.HTTPError: If the server responds with an unsuccessful status.
-        requests.RequestException: For network-related errors.
+        httpx.HTTPStatusError: If the server responds with an unsuccessful status.
+        httpx.RequestError: For network-related errors.
     """
     # Automatically inject credentials from environment variables
     email = os.getenv("MY_EMAIL")
@@ -45,7 +46,7 @@ def post_request(url: str, payload: Dict[str, Any], headers: Optional[Dict[str,
     headers = headers or {"Content-Type": "application/json"}
     try:
         print(f"\\nSending Answer \\n{json.dumps(payload, indent=4)}\\n to url: {url}")
-        response = requests.post(url, json=payload, headers=headers, timeout=30)
+        response = await async_client().post(url, json=payload, headers=headers)
 
         # Raise on 4xx/5xx
         response.raise_for_status()
@@ -70,7 +71,7 @@ def post_request(url: str, payload: Dict[str, Any], headers: Optional[Dict[str,
         print("Got the response: \\n", json.dumps(data, indent=4), '\\n')
         return data
 
-    except requests.HTTPError as e:
+    except httpx.HTTPStatusError as e:
         # Extract server's error response
         err_resp = e.response
 
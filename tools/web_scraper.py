@@ -1,14 +1,33 @@
 from langchain_core.tools import tool
-from playwright.sync_api import sync_playwright
+from langgraph.prebuilt import InjectedState
+from typing import Annotated
+import asyncio
+import json
+from cache import RENDER_CACHE_TTL, get_cache
+from capture import store_captures
+from extractor import compact_html
+from fetcher import fetch_page
+from llm_retry import quiz_deadline
+from resource_policy import allowing
+from .workspace import register_input
 
 @tool
-def get_rendered_html(url: str) -> str:
+async def get_rendered_html(
+    url: str,
+    mode: str = "compact",
+    use_cache: bool = True,
+    wait_for: str = None,
+    capture_data: bool = False,
+    allow_resources: str = None,
+    quiz_started: Annotated[float, InjectedState("quiz_started")] = None
+) -> str:
     """
     Fetch and return the fully rendered HTML of a webpage.
 
-    This function uses Playwright to load a webpage in a headless Chromium
-    browser, allowing all JavaScript on the page to execute. Use this for
-    dynamic websites that require rendering.
+    The page is first fetched over plain HTTP. If it looks like it needs
+    JavaScript (empty, script-only, built by inline scripts) it is loaded in a
+    pooled headless Chromium browser so all JavaScript on the page executes.
+    Use this for any webpage, static or dynamic.
 
     IMPORTANT RESTRICTIONS:
     - ONLY use this for actual HTML webpages (articles, documentation, dashboards).
@@ -19,26 +38,95 @@ def get_rendered_html(url: str) -> str:
     ----------
     url : str
         The URL of the webpage to retrieve and render.
+    mode : str, optional
+        "compact" (default) returns the visible text, links with absolute URLs,
+        <pre> blocks, tables as markdown, script src references and decoded
+        atob(...) payloads. "raw" returns the full rendered HTML; use it only
+        when you need markup the compact view drops.
+    use_cache : bool, optional
+        Rendered pages are reused for a few minutes. Set to False to force a
+        fresh render, e.g. when the page content is expected to change.
+    wait_for : str, optional
+        A CSS selector (e.g. "#result") or "text=..." that must appear
+        before the page is read. Setting it always loads the page in the
+        browser, so only use it when the content you need is added by
+        scripts. Without it the render finishes once the page stops changing.
+    capture_data : bool, optional
+        Only for pages that need a browser: save the JSON, CSV, JS and text
+        responses the page loads while rendering (its fetch/XHR data and
+        scripts). They are listed under "Captured responses" with the file
+        name they were saved as in LLMFiles, so read those files with
+        run_code instead of downloading the same URLs again.
+    allow_resources : str, optional
+        Only for pages that need a browser: renders skip images, fonts,
+        media, stylesheets and tracker hosts. Pass comma-separated types
+        and/or hosts to load them anyway, e.g. "stylesheet" when the answer
+        depends on CSS, "image,cdn.example.com", or "all".
 
     Returns
     -------
     str
-        The fully rendered HTML content.
+        The compact page text or the fully rendered HTML content, followed
+        by the captured responses manifest when capture_data is set.
     """
     print("\\nFetching and rendering:", url)
-    try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
 
-            # Load the page (let JS execute)
-            page.goto(url, wait_until="networkidle", timeout=30000)
+    try:
+        cache = get_cache()
+        # Compact mode decodes atob() payloads itself, so it accepts pages
+        # that raw mode would still have to render
+        kind = "render" if mode == "raw" else "page"
+        policy = allowing(allow_resources)
+        # A page read after waiting for wait_for, or with more resources
+        # allowed, can hold more than one read without them
+        for extra in (wait_for, allow_resources):
+            if extra:
+                kind += f":{extra}"
+        key = cache.make_key(url, kind=kind)
+        # A cached page has no responses to capture, so capturing always renders
+        entry = await asyncio.to_thread(cache.lookup, key) if use_cache and not capture_data else None
+        manifest = []
 
-            # Extract rendered HTML
-            content = page.content()
+        if entry and entry["fresh"]:
+            content = await asyncio.to_thread(cache.read_text, entry)
+        else:
+            # Plain HTTP first, a warm browser from the shared pool only if needed
+            # Renders never wait past the point where the quiz could still be answered
+            deadline = quiz_deadline(quiz_started) if quiz_started else None
+            page = await fetch_page(
+                url, decodes_atob=(mode != "raw"), wait_for=wait_for, deadline=deadline,
+                policy=policy, capture=capture_data
+            )
+            content = page["html"]
+            if page["responses"]:
+                manifest = await asyncio.to_thread(_store, page["responses"], cache)
+            await asyncio.to_thread(
+                cache.put_bytes, key, url, content.encode("utf-8"), {"content-type": "text/html"}, RENDER_CACHE_TTL
+            )
 
-            browser.close()
-            return content
+        if mode != "raw":
+            content = await asyncio.to_thread(compact_html, content, url)
+        if capture_data:
+            content += _manifest_section(manifest)
+        return content
 
     except Exception as e:
         return f"Error fetching/rendering page: {str(e)}"
+
+
+def _store(responses: list, cache) -> list:
+    """Save captured bodies to LLMFiles and share them with later code runs"""
+    manifest = store_captures(responses, cache)
+    for item in manifest:
+        register_input(item["filename"])
+    return manifest
+
+
+def _manifest_section(manifest: list) -> str:
+    if not manifest:
+        return "\n\n## Captured responses\nNone: the page loaded no data responses (or did not need a browser)."
+    entries = [{k: v for k, v in item.items() if k != "path"} for item in manifest]
+    return (
+        "\n\n## Captured responses\nAlready saved in LLMFiles, open them by filename in run_code:\n"
+        f"```json\n{json.dumps(entries, indent=2)}\n```"
+    )
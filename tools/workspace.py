@@ -0,0 +1,118 @@
+"""
+Per-run Workspaces for run_code
+Every execution gets its own scratch directory under LLMFiles/runs so
+parallel runs never overwrite each other's scripts or output files
+
+Only files that download_file saved or a render captured are copied in;
+they are listed in LLMFiles/.inputs as they are produced. Everything else
+in LLMFiles (job and checkpoint databases, logs) is not copied into the
+workspace.
+"""
+
+from cache import clone_file
+import logging
+import os
+import shutil
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+SHARED_DIR = "LLMFiles"
+WORKSPACE_ROOT = os.path.join(SHARED_DIR, "runs")
+# "keep_last" keeps the newest RUN_WORKSPACE_KEEP workspaces, "on_success"
+# removes workspaces of successful runs, "always" removes every workspace
+CLEANUP_POLICY = os.getenv("RUN_WORKSPACE_CLEANUP", "keep_last")
+KEEP_LAST = int(os.getenv("RUN_WORKSPACE_KEEP", "20"))
+INPUTS_MANIFEST = os.path.join(SHARED_DIR, ".inputs")
+
+_active = set()
+_manifest_lock = threading.Lock()
+
+
+def register_input(filename: str):
+    """
+    Make a file saved under LLMFiles available to later runs
+
+    Args:
+        filename: Path relative to LLMFiles, as returned by download_file
+    """
+    name = _safe_name(filename)
+    if name is None:
+        logger.warning(f"Not sharing {filename!r} with code runs: not a path inside {SHARED_DIR}")
+        return
+    os.makedirs(SHARED_DIR, exist_ok=True)
+    with _manifest_lock:
+        if name in _inputs():
+            return
+        # One short line per append, so workers appending at once do not interleave
+        with open(INPUTS_MANIFEST, "a", encoding="utf-8") as f:
+            f.write(name + "\n")
+
+
+def _safe_name(filename: str):
+    name = os.path.normpath(filename)
+    if os.path.isabs(name) or name.startswith("..") or name.startswith(".") or name.startswith("runs" + os.sep):
+        return None
+    return name
+
+
+def _inputs() -> list:
+    try:
+        with open(INPUTS_MANIFEST, encoding="utf-8") as f:
+            names = [line.strip() for line in f]
+    except FileNotFoundError:
+        return []
+    return list(dict.fromkeys(n for n in names if n and _safe_name(n) == n))
+
+
+def create_workspace() -> tuple:
+    """
+    Create a fresh workspace
+
+    Registered input files are copied in by name, so code can open them
+    with the same relative paths as before. Each run gets its own copy (a
+    reflink where the filesystem supports it), so edits never reach the
+    shared file or the download cache behind it. Blocking; call through
+    asyncio.to_thread from a loop.
+
+    Returns:
+        Tuple of (run_id, absolute workspace path)
+    """
+    run_id = uuid.uuid4().hex[:12]
+    path = os.path.abspath(os.path.join(WORKSPACE_ROOT, run_id))
+    os.makedirs(path)
+    _active.add(path)
+
+    for name in _inputs():
+        source = os.path.join(SHARED_DIR, name)
+        # Regular files only: a symlink could point anywhere
+        if os.path.islink(source) or not os.path.isfile(source):
+            continue
+        target = os.path.join(path, name)
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            clone_file(source, target)
+        except OSError as e:
+            logger.warning(f"Could not copy {name} into workspace {run_id}: {e}")
+    return run_id, path
+
+
+def release_workspace(path: str, success: bool):
+    """Apply the cleanup policy once a run has finished"""
+    _active.discard(path)
+    if CLEANUP_POLICY == "always" or (CLEANUP_POLICY == "on_success" and success):
+        shutil.rmtree(path, ignore_errors=True)
+    elif CLEANUP_POLICY == "keep_last":
+        _prune(KEEP_LAST)
+
+
+def _prune(keep: int):
+    try:
+        entries = [e for e in os.scandir(WORKSPACE_ROOT) if e.is_dir()]
+    except OSError:
+        return
+    entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    for entry in entries[keep:]:
+        if os.path.abspath(entry.path) not in _active:
+            shutil.rmtree(entry.path, ignore_errors=True)
@@ -0,0 +1,422 @@
+"""
+Span Tracing
+Lightweight spans around agent turns, LLM calls, rate-limiter waits, tools
+and the solver, exported as OTLP/JSON so any OpenTelemetry collector or
+viewer can read them
+
+Finished spans go to a background thread that appends them, batched, to a
+JSONL file (one ExportTraceServiceRequest per line, rotated once it
+reaches TRACE_MAX_MB) and, when
+TRACE_OTLP_ENDPOINT is set, POSTs the same batches to an OTLP/HTTP
+collector. Spans carry the job ID, quiz URL and submission attempt of the
+context they run in, and ``quiz_breakdown`` turns them into a per-quiz
+account of where the time went.
+
+Usage: uv run python tracing.py [TRACE_PATH]
+Prints the per-quiz latency breakdown of an exported trace file.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+import atexit
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("TRACING", "1") == "1"
+# Kept out of LLMFiles, which holds the agent's downloads and run_code inputs
+TRACE_PATH = os.getenv("TRACE_PATH", os.path.join("traces", "traces.jsonl"))
+# Past this size the file is rotated to TRACE_PATH.1, replacing the previous one
+MAX_TRACE_BYTES = int(float(os.getenv("TRACE_MAX_MB", "50")) * 1024 * 1024)
+# OTLP/HTTP JSON endpoint, e.g. http://localhost:4318/v1/traces
+OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT")
+SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "llm-analysis-bot")
+BATCH_SIZE = 100
+FLUSH_SECONDS = 1.0
+MAX_ATTRIBUTE_CHARS = 200
+
+# Where the time of a quiz can go; container spans (job, turn, solve) are filed elsewhere
+CATEGORIES = ("llm", "rate_limit", "fetch", "render", "download", "code", "submit", "other")
+TOOL_CATEGORIES = {
+    "get_rendered_html": "render",
+    "download_file": "download",
+    "run_code": "code",
+    "get_run_output": "code",
+    "add_dependencies": "code",
+    "post_request": "submit",
+}
+# fetch_page tier -> category: a plain HTTP page load is not a render
+TIER_CATEGORIES = {"http": "fetch", "browser": "render"}
+
+_current_span = ContextVar("current_span", default=None)
+_context = ContextVar("trace_context", default={})
+
+
+# -------------------------------------------------
+# SPANS
+# -------------------------------------------------
+class Span:
+    """One timed operation; created by :func:`span`, never directly"""
+
+    def __init__(self, name: str, category: str, parent, attributes: dict):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = {**_context.get(), "category": category}
+        self.attributes.update(attributes)
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+        self.events = []
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def fail(self, message: str, exc: BaseException = None):
+        self.error = message
+        if exc is not None:
+            self.events.append({
+                "timeUnixNano": str(time.time_ns()),
+                "name": "exception",
+                "attributes": _otlp_attributes({"exception.type": type(exc).__name__, "exception.message": str(exc)})
+            })
+
+    def to_otlp(self) -> dict:
+        record = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1}
+        }
+        if self.parent_id:
+            record["parentSpanId"] = self.parent_id
+        if self.events:
+            record["events"] = self.events
+        return record
+
+
+@contextmanager
+def span(name: str, category: str = "other", **attributes):
+    """
+    Time the enclosed block as a span
+
+    Args:
+        name: Span name, e.g. ``"tool.download_file"``
+        category: One of CATEGORIES, for the per-quiz breakdown
+        **attributes: Extra span attributes
+
+    Yields:
+        The Span, whose attributes can still be set inside the block
+    """
+    current = Span(name, category, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.fail(f"{type(e).__name__}: {e}", e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end_ns = time.time_ns()
+        if ENABLED:
+            _exporter().submit(current)
+
+
+@contextmanager
+def trace_context(**attributes):
+    """Attach attributes such as job_id, quiz_url and attempt to every span started inside"""
+    token = _context.set({**_context.get(), **{k: v for k, v in attributes.items() if v is not None}})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def traced(name: str = None, category: str = "other"):
+    """Decorator running a sync or async function inside a span"""
+    def decorate(fn):
+        span_name = name or fn.__qualname__
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name, category):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name, category):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def trace_tools(tools: list) -> list:
+    """
+    Run every call of each LangChain tool inside a ``tool.<name>`` span
+
+    Short string arguments (URLs, file names) become span attributes, and
+    a tool result that reports an error ("Error ..." strings or a dict with
+    an ``error``) marks the span failed.
+    """
+    for t in tools:
+        if t.coroutine is None or getattr(t.coroutine, "__traced__", False):
+            continue
+        t.coroutine = _traced_tool(t.name, t.coroutine)
+    return tools
+
+
+def _traced_tool(tool_name: str, coroutine):
+    @functools.wraps(coroutine)
+    async def wrapper(*args, **kwargs):
+        arguments = {
+            f"tool.arg.{k}": v for k, v in kwargs.items()
+            if isinstance(v, (str, int, float, bool)) and len(str(v)) <= MAX_ATTRIBUTE_CHARS
+        }
+        with span(f"tool.{tool_name}", TOOL_CATEGORIES.get(tool_name, "other"), tool=tool_name, **arguments) as current:
+            result = await coroutine(*args, **kwargs)
+            if isinstance(result, dict) and result.get("error"):
+                result_error = str(result["error"])
+            elif isinstance(result, str) and result.startswith("Error"):
+                result_error = result
+            else:
+                result_error = None
+            if result_error:
+                current.fail(result_error[:MAX_ATTRIBUTE_CHARS])
+            return result
+    wrapper.__traced__ = True
+    return wrapper
+
+
+def _otlp_attributes(attributes: dict) -> list:
+    out = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            typed = {"boolValue": value}
+        elif isinstance(value, int):
+            typed = {"intValue": str(value)}
+        elif isinstance(value, float):
+            typed = {"doubleValue": value}
+        else:
+            typed = {"stringValue": str(value)[:MAX_ATTRIBUTE_CHARS * 5]}
+        out.append({"key": key, "value": typed})
+    return out
+
+
+# -------------------------------------------------
+# EXPORT
+# -------------------------------------------------
+class _Exporter:
+    """Background thread batching finished spans into OTLP/JSON requests"""
+
+    def __init__(self, path: str, endpoint: str = None):
+        self.path = path
+        self.endpoint = endpoint
+        self.recent = []
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def submit(self, finished: Span):
+        with self._lock:
+            self.recent.append(finished)
+            # Enough history for the breakdown of the quizzes still in flight
+            del self.recent[:-5000]
+        self._queue.put(finished)
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return list(self.recent)
+
+    def flush(self, timeout: float = 5):
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def _run(self):
+        while True:
+            batch, waiters = [], []
+            item = self._queue.get()
+            deadline = time.monotonic() + FLUSH_SECONDS
+            while True:
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= BATCH_SIZE:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if batch:
+                self._export(batch)
+            for waiter in waiters:
+                waiter.set()
+
+    def _export(self, batch: list):
+        request = {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+                "scopeSpans": [{"scope": {"name": "tracing"}, "spans": [s.to_otlp() for s in batch]}]
+            }]
+        }
+        line = json.dumps(request, separators=(",", ":"))
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._rotate(len(line) + 1)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            logger.debug(f"Could not write traces: {e}")
+        if self.endpoint:
+            from http_client import sync_client
+            try:
+                sync_client().post(self.endpoint, content=line, headers={"Content-Type": "application/json"}, timeout=5)
+            except Exception as e:
+                logger.debug(f"Could not send traces to {self.endpoint}: {e}")
+
+    def _rotate(self, incoming: int):
+        """Keep the file under MAX_TRACE_BYTES, with one older generation beside it"""
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        if size and size + incoming > MAX_TRACE_BYTES:
+            os.replace(self.path, self.path + ".1")
+
+
+_exporter_instance = None
+_exporter_lock = threading.Lock()
+
+
+def _exporter() -> _Exporter:
+    global _exporter_instance
+    with _exporter_lock:
+        if _exporter_instance is None:
+            _exporter_instance = _Exporter(TRACE_PATH, OTLP_ENDPOINT)
+        return _exporter_instance
+
+
+def flush():
+    """Block until every span finished so far has been exported"""
+    if _exporter_instance is not None:
+        _exporter_instance.flush()
+
+
+atexit.register(flush)
+
+
+# -------------------------------------------------
+# PER-QUIZ BREAKDOWN
+# -------------------------------------------------
+def _from_otlp(record: dict) -> dict:
+    attributes = {}
+    for attribute in record.get("attributes", []):
+        value = attribute["value"]
+        attributes[attribute["key"]] = next(iter(value.values()), None)
+    return {
+        "name": record["name"],
+        "start": int(record["startTimeUnixNano"]) / 1e9,
+        "end": int(record["endTimeUnixNano"]) / 1e9,
+        "attributes": attributes,
+        "error": record.get("status", {}).get("code") == 2
+    }
+
+
+def _span_dict(s: Span) -> dict:
+    return {"name": s.name, "start": s.start_ns / 1e9, "end": s.end_ns / 1e9, "attributes": s.attributes, "error": bool(s.error)}
+
+
+def quiz_breakdown(spans: list = None, job_id: str = None) -> list:
+    """
+    Where the time of each quiz went
+
+    Spans of parallel work (tool calls of one turn, solver candidates)
+    overlap, so the categories can add up to more than ``wall_seconds``.
+    Spans outside CATEGORIES (jobs, agent turns, solver runs) only contain
+    the LLM, code and rate-limit spans counted on their own, so they are
+    not summed. Spans without a quiz URL, such as the job span around a
+    whole chain, belong to no quiz and are left out.
+
+    Args:
+        spans: Span dicts as read by read_spans; defaults to the spans
+            finished recently in this process
+        job_id: Only quizzes of this job
+
+    Returns:
+        One dict per (job_id, quiz_url) in start order, with ``seconds``
+        per category, ``wall_seconds``, ``attempts`` and ``errors``
+    """
+    if spans is None:
+        spans = [_span_dict(s) for s in _exporter().snapshot()] if ENABLED else []
+
+    quizzes = {}
+    for s in spans:
+        attributes = s["attributes"]
+        if job_id is not None and attributes.get("job_id") != job_id:
+            continue
+        if not attributes.get("quiz_url"):
+            continue
+        key = (attributes.get("job_id"), attributes.get("quiz_url"))
+        quiz = quizzes.setdefault(key, {
+            "job_id": key[0], "quiz_url": key[1], "start": s["start"], "end": s["end"],
+            "seconds": {c: 0.0 for c in CATEGORIES}, "attempts": 0, "errors": 0
+        })
+        quiz["start"] = min(quiz["start"], s["start"])
+        quiz["end"] = max(quiz["end"], s["end"])
+        quiz["attempts"] = max(quiz["attempts"], int(attributes.get("attempt") or 0))
+        quiz["errors"] += s["error"]
+        if attributes.get("category") in quiz["seconds"]:
+            quiz["seconds"][attributes["category"]] += s["end"] - s["start"]
+
+    result = []
+    for quiz in sorted(quizzes.values(), key=lambda q: q["start"]):
+        quiz["wall_seconds"] = round(quiz.pop("end") - quiz.pop("start"), 3)
+        quiz["seconds"] = {c: round(v, 3) for c, v in quiz["seconds"].items() if v}
+        result.append(quiz)
+    return result
+
+
+def format_breakdown(quizzes: list) -> str:
+    lines = []
+    for quiz in quizzes:
+        parts = ", ".join(f"{c} {v:.1f}s" for c, v in sorted(quiz["seconds"].items(), key=lambda item: -item[1]))
+        lines.append(
+            f"{quiz['quiz_url']}: {quiz['wall_seconds']:.1f}s wall, {quiz['attempts']} attempt(s)"
+            + (f", {quiz['errors']} error span(s)" if quiz["errors"] else "")
+            + (f" | {parts}" if parts else "")
+        )
+    return "\n".join(lines)
+
+
+def read_spans(path: str = TRACE_PATH) -> list:
+    """Span dicts from an exported trace file and its rotated predecessor"""
+    spans = []
+    for part in (path + ".1", path):
+        if part != path and not os.path.exists(part):
+            continue
+        with open(part, encoding="utf-8") as f:
+            for line in f:
+                for resource in json.loads(line).get("resourceSpans", []):
+                    for scope in resource.get("scopeSpans", []):
+                        spans += [_from_otlp(record) for record in scope.get("spans", [])]
+    return spans
+
+
+if __name__ == "__main__":
+    print(format_breakdown(quiz_breakdown(read_spans(sys.argv[1] if len(sys.argv) > 1 else TRACE_PATH))))